@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Scenario, Simulation, Vehicle, Metric, 
-    Result, SimulationLog, Comparison
+    Result, SimulationLog, Comparison, VehicleState, MetricTotal, MetricRollup
 )
 
 @admin.register(Scenario)
@@ -32,6 +32,19 @@ class MetricAdmin(admin.ModelAdmin):
     list_filter = ['metric_type', 'timestamp']
     search_fields = ['simulation__name']
 
+@admin.register(MetricTotal)
+class MetricTotalAdmin(admin.ModelAdmin):
+    list_display = ['simulation', 'metric_type', 'count', 'sum', 'min', 'max', 'updated_at']
+    list_filter = ['metric_type']
+    search_fields = ['simulation__name']
+    readonly_fields = ['updated_at']
+
+@admin.register(MetricRollup)
+class MetricRollupAdmin(admin.ModelAdmin):
+    list_display = ['simulation', 'metric_type', 'resolution', 'bucket', 'count', 'sum', 'min', 'max']
+    list_filter = ['resolution', 'metric_type']
+    search_fields = ['simulation__name']
+
 @admin.register(Result)
 class ResultAdmin(admin.ModelAdmin):
     list_display = ['simulation', 'avg_travel_time', 'improvement_travel_time', 'created_at']
@@ -55,4 +68,11 @@ class ComparisonAdmin(admin.ModelAdmin):
     list_display = ['baseline_simulation', 'ai_simulation', 'created_at']
     list_filter = ['created_at']
     search_fields = ['baseline_simulation__name', 'ai_simulation__name']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+@admin.register(VehicleState)
+class VehicleStateAdmin(admin.ModelAdmin):
+    list_display = ['vehicle_id', 'simulation', 'vehicle_type', 'speed', 'updated_at']
+    list_filter = ['vehicle_type', 'updated_at']
+    search_fields = ['vehicle_id']
+    readonly_fields = ['updated_at']
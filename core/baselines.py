@@ -0,0 +1,81 @@
+"""
+Canonical baseline run per scenario.
+
+A scenario's baseline is its most recently completed ``baseline``
+simulation (ties broken by id), so the choice is deterministic and a newer
+baseline run replaces an older one. The resolved simulation and its metric
+summary (from the running totals) are cached per scenario and dropped when
+a baseline run of the scenario is saved or deleted or its metrics change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import MetricTotal, Simulation
+
+CACHE_PREFIX = 'baseline'
+
+
+def cache_timeout():
+    return getattr(settings, 'BASELINE_CACHE_TIMEOUT', 3600)
+
+
+class Baseline:
+    """A scenario's baseline simulation and its per-metric-type summary"""
+
+    def __init__(self, simulation, summary):
+        self.simulation = simulation
+        self.summary = summary
+
+    @property
+    def id(self):
+        return self.simulation.id
+
+
+def baseline_queryset(scenario_id):
+    return Simulation.objects.filter(
+        scenario_id=scenario_id,
+        algorithm='baseline',
+        status='completed'
+    ).order_by('-completed_at', '-id')
+
+
+def _key(scenario_id):
+    return f'{CACHE_PREFIX}:{scenario_id}'
+
+
+def _load(scenario_id):
+    simulation = baseline_queryset(scenario_id).first()
+    if simulation is None:
+        return None
+    summary = {
+        total.metric_type: {
+            'avg': total.avg, 'sum': total.sum, 'min': total.min, 'max': total.max, 'count': total.count,
+        }
+        for total in MetricTotal.objects.filter(simulation=simulation)
+    }
+    return Baseline(simulation, summary)
+
+
+def get_baseline(scenario_id):
+    """The scenario's Baseline, or None when it has no completed baseline run"""
+    key = _key(scenario_id)
+    # A one-element tuple, so "no baseline" is cached too
+    cached = cache.get(key)
+    if cached is None:
+        cached = (_load(scenario_id),)
+        cache.set(key, cached, timeout=cache_timeout())
+    return cached[0]
+
+
+def get_baseline_simulation(scenario_id):
+    baseline = get_baseline(scenario_id)
+    return baseline.simulation if baseline else None
+
+
+def invalidate(*scenario_ids):
+    """Drop cached baselines now and again once the transaction commits"""
+    keys = [_key(scenario_id) for scenario_id in scenario_ids]
+    cache.delete_many(keys)
+    # A reader in between could re-cache the pre-commit state
+    transaction.on_commit(lambda: cache.delete_many(keys))
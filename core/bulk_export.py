@@ -0,0 +1,178 @@
+"""
+Bulk export of many simulations as one streamed ZIP archive.
+
+Each selected simulation becomes one CSV member, streamed as the single
+simulation export streams it (core.csv_export): KPI rows and metrics, plus
+the trajectory history when asked for.
+Members are produced by a bounded pool of worker threads, each a few
+members ahead of the one being written. A worker hands its chunks over
+through a small bounded queue, so it stalls instead of buffering once it
+is far enough ahead, and the archive is written through ``zipfile`` into a
+sink that is emptied after every chunk. Memory therefore depends on the
+worker count, not on the number or size of the simulations.
+"""
+import queue
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import csv_export
+from .models import Result, Simulation
+
+# Chunks a worker may hold for a member before it waits for the writer
+BUFFER_CHUNKS = 8
+# Seconds between checks for an abandoned download while a queue is full
+PUT_TIMEOUT = 0.5
+
+_DONE = object()
+
+
+def workers():
+    return getattr(settings, 'BULK_EXPORT_WORKERS', 4)
+
+
+def select_simulations(scenario_id=None, algorithm=None, start=None, end=None):
+    """
+    Simulations with results, oldest first, optionally limited to a
+    scenario, an algorithm and a creation date range (inclusive dates).
+    """
+    simulations = Simulation.objects.filter(result__isnull=False)
+    if scenario_id is not None:
+        simulations = simulations.filter(scenario_id=scenario_id)
+    if algorithm:
+        simulations = simulations.filter(algorithm=algorithm)
+    # Day bounds rather than __date so the created_at index applies
+    if start is not None:
+        simulations = simulations.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end is not None:
+        simulations = simulations.filter(
+            created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        )
+    return simulations.order_by('created_at', 'id')
+
+
+def member_name(simulation):
+    return f'simulation_{simulation.id}_{slugify(simulation.name) or simulation.algorithm}.csv'
+
+
+def member_chunks(simulation_id, vehicles=False):
+    """Text chunks of one simulation's CSV, as export/csv/ streams them"""
+    result = Result.objects.select_related('simulation').get(simulation_id=simulation_id)
+    yield from csv_export.simulation_csv(result.simulation, result, vehicles=vehicles)
+
+
+def _put(buffer, item, cancelled):
+    while not cancelled.is_set():
+        try:
+            buffer.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(chunks, buffer, cancelled):
+    try:
+        for chunk in chunks:
+            if not _put(buffer, chunk, cancelled):
+                return
+        _put(buffer, _DONE, cancelled)
+    except Exception as exc:
+        _put(buffer, exc, cancelled)
+    finally:
+        close_old_connections()
+
+
+def _drain(buffer):
+    while True:
+        item = buffer.get()
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def parallel_members(members, max_workers):
+    """
+    Yield ``(name, chunks)`` for ``(name, make_chunks)`` pairs in order,
+    running up to ``max_workers`` of the ``make_chunks()`` generators at once.
+    """
+    if max_workers <= 1:
+        for name, make_chunks in members:
+            yield name, make_chunks()
+        return
+
+    members = iter(members)
+    running = deque()
+    cancelled = threading.Event()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bulk-export') as executor:
+        def start_next():
+            member = next(members, None)
+            if member is not None:
+                name, make_chunks = member
+                buffer = queue.Queue(maxsize=BUFFER_CHUNKS)
+                executor.submit(_produce, make_chunks(), buffer, cancelled)
+                running.append((name, buffer))
+
+        try:
+            for _ in range(max_workers):
+                start_next()
+            while running:
+                name, buffer = running.popleft()
+                yield name, _drain(buffer)
+                start_next()
+        finally:
+            # Releases workers still waiting on a full queue when the download stops early
+            cancelled.set()
+
+
+class _Sink:
+    """Unseekable file-like target; zipfile then writes sizes after each member"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def zip_chunks(members):
+    """Bytes of a ZIP archive holding ``(name, text chunks)`` members, as they are written"""
+    sink = _Sink()
+    modified = timezone.localtime().timetuple()[:6]
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in members:
+            info = zipfile.ZipInfo(name, date_time=modified)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # Sizes aren't known up front; zip64 keeps members over 2 GiB valid
+            with archive.open(info, 'w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk.encode('utf-8'))
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def export_archive(simulations, vehicles=False, max_workers=None):
+    """ZIP archive chunks with one CSV per simulation in ``simulations``"""
+    members = (
+        (member_name(simulation), lambda simulation_id=simulation.id: member_chunks(simulation_id, vehicles))
+        for simulation in simulations.only('id', 'name', 'algorithm').iterator()
+    )
+    return zip_chunks(parallel_members(members, workers() if max_workers is None else max_workers))
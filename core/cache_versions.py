@@ -0,0 +1,51 @@
+"""
+Version counters for cache invalidation.
+
+Cached data derived from a changing source embeds the source's current
+version in its cache key. Writers call ``bump()``; stale entries are then
+never read again and simply expire.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_PREFIX = 'version'
+
+
+def _fresh():
+    # Counters start from the clock so a counter lost to eviction never
+    # restarts at a value some older cache entry was stored under
+    return time.time_ns() // 1000
+
+
+def _key(namespace, key):
+    return f'{CACHE_PREFIX}:{namespace}:{key}'
+
+
+def get(namespace, key):
+    """Current version of ``namespace:key`` (created on first use)"""
+    cache_key = _key(namespace, key)
+    version = cache.get(cache_key)
+    if version is None:
+        # add() so two readers racing on a fresh key agree on the value
+        cache.add(cache_key, _fresh(), timeout=None)
+        version = cache.get(cache_key)
+    return version
+
+
+def bump(namespace, key):
+    """Invalidate everything cached under the current version"""
+    cache_key = _key(namespace, key)
+    try:
+        return cache.incr(cache_key)
+    except ValueError:
+        # Key missing (never read, or evicted): start a fresh series
+        version = _fresh()
+        cache.set(cache_key, version, timeout=None)
+        return version
+
+
+def bump_on_commit(namespace, key):
+    """bump() once the current transaction commits"""
+    transaction.on_commit(lambda: bump(namespace, key))
@@ -0,0 +1,226 @@
+"""
+Columnar binary export of a simulation.
+
+Vehicles, metrics, logs and training curves are written as typed NumPy
+arrays, one per column (``vehicles.speed``, ``metrics.value``, ...), plus a
+JSON manifest describing the simulation, its Result and the dictionaries
+behind the coded columns:
+
+* category columns (vehicle type, metric type, unit, log level) are small
+  integer codes into ``manifest['dictionaries']``
+* timestamps are int64 microseconds since the Unix epoch (UTC)
+* variable-length text (vehicle ids, log messages) is stored Arrow-style as
+  UTF-8 bytes ``<name>.data`` plus int64 ``<name>.offsets``
+
+``write_directory()`` writes one ``.npy`` per column and ``manifest.json``,
+which ``load()`` memory-maps without parsing; ``write_npz()`` writes the
+same arrays as a single compressed ``.npz`` for download.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .curve_store import CURVES, CurveStore
+from .models import Metric, Result, SimulationLog, Vehicle
+from .trajectory_store import COLUMNS, TrajectoryStore, to_micros
+
+FORMAT = 'matafiti-columnar'
+VERSION = 1
+MANIFEST = 'manifest.json'
+
+CHUNK_SIZE = 5000
+
+VEHICLE_TYPES = [choice for choice, _ in Vehicle.VEHICLE_TYPES]
+METRIC_TYPES = [choice for choice, _ in Metric.METRIC_TYPES]
+LOG_LEVELS = [choice for choice, _ in SimulationLog.LOG_LEVELS]
+
+
+def encode_strings(values):
+    """(UTF-8 bytes, int64 offsets) with string i at data[offsets[i]:offsets[i + 1]]"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(data, offsets):
+    raw = bytes(data)
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def _code(values, dictionary):
+    """Codes into ``dictionary``, extending it with unseen values"""
+    lookup = {value: code for code, value in enumerate(dictionary)}
+    codes = np.empty(len(values), dtype=np.uint8)
+    for i, value in enumerate(values):
+        if value not in lookup:
+            lookup[value] = len(dictionary)
+            dictionary.append(value)
+        codes[i] = lookup[value]
+    return codes
+
+
+def _columns(queryset, fields):
+    """Lists of column values from a chunked server-side cursor"""
+    columns = {field: [] for field in fields}
+    for row in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        for field, value in zip(fields, row):
+            columns[field].append(value)
+    return columns
+
+
+def vehicle_arrays(simulation, dictionaries):
+    store = TrajectoryStore(simulation.id)
+    if store.exists():
+        data = store.arrays()
+        dictionaries['vehicle_types'] = list(store.meta['types'])
+        vehicle_ids = store.vehicle_ids
+        arrays = {f'vehicles.{name}': data[name] for name in COLUMNS if name != 'type'}
+        arrays['vehicles.vehicle_type'] = data['type']
+    else:
+        columns = _columns(
+            Vehicle.objects.filter(simulation=simulation).order_by('timestamp'),
+            ['vehicle_id', 'vehicle_type', 'lat', 'lng', 'speed', 'heading', 'timestamp'],
+        )
+        vehicle_ids = list(dict.fromkeys(columns['vehicle_id']))
+        index = {vehicle_id: i for i, vehicle_id in enumerate(vehicle_ids)}
+        dictionaries['vehicle_types'] = list(VEHICLE_TYPES)
+        arrays = {
+            'vehicles.vehicle': np.fromiter((index[v] for v in columns['vehicle_id']), dtype=COLUMNS['vehicle']),
+            'vehicles.vehicle_type': _code(columns['vehicle_type'], dictionaries['vehicle_types']),
+            'vehicles.timestamp': np.fromiter(map(to_micros, columns['timestamp']), dtype=COLUMNS['timestamp']),
+        }
+        for name in ('lat', 'lng', 'speed', 'heading'):
+            arrays[f'vehicles.{name}'] = np.asarray(columns[name], dtype=COLUMNS[name])
+    arrays['vehicle_ids.data'], arrays['vehicle_ids.offsets'] = encode_strings(vehicle_ids)
+    return arrays
+
+
+def metric_arrays(simulation, dictionaries):
+    columns = _columns(
+        Metric.objects.filter(simulation=simulation).order_by('metric_type', '-timestamp'),
+        ['metric_type', 'value', 'unit', 'timestamp', 'baseline_value', 'improvement_percentage'],
+    )
+    dictionaries['metric_types'] = list(METRIC_TYPES)
+    dictionaries['units'] = []
+    return {
+        'metrics.metric_type': _code(columns['metric_type'], dictionaries['metric_types']),
+        'metrics.value': np.asarray(columns['value'], dtype=np.float64),
+        'metrics.unit': _code(columns['unit'], dictionaries['units']),
+        'metrics.timestamp': np.fromiter(map(to_micros, columns['timestamp']), dtype=np.int64),
+        # Missing values become NaN
+        'metrics.baseline_value': np.asarray(columns['baseline_value'], dtype=np.float64),
+        'metrics.improvement_percentage': np.asarray(columns['improvement_percentage'], dtype=np.float64),
+    }
+
+
+def log_arrays(simulation, dictionaries):
+    columns = _columns(
+        SimulationLog.objects.filter(simulation=simulation).order_by('timestamp'),
+        ['log_level', 'message', 'timestamp'],
+    )
+    dictionaries['log_levels'] = list(LOG_LEVELS)
+    arrays = {
+        'logs.log_level': _code(columns['log_level'], dictionaries['log_levels']),
+        'logs.timestamp': np.fromiter(map(to_micros, columns['timestamp']), dtype=np.int64),
+    }
+    arrays['logs.message.data'], arrays['logs.message.offsets'] = encode_strings(columns['message'])
+    return arrays
+
+
+def build(simulation):
+    """(manifest, {column name: array}) for ``simulation``"""
+    dictionaries = {}
+    arrays = {}
+    arrays.update(vehicle_arrays(simulation, dictionaries))
+    arrays.update(metric_arrays(simulation, dictionaries))
+    arrays.update(log_arrays(simulation, dictionaries))
+    curves = CurveStore(simulation.id)
+    for curve in CURVES:
+        arrays[f'curves.{curve}'] = curves.read(curve)
+
+    result = Result.objects.filter(simulation=simulation).first()
+    manifest = {
+        'format': FORMAT,
+        'version': VERSION,
+        'simulation': {
+            'id': simulation.id,
+            'name': simulation.name,
+            'scenario_id': simulation.scenario_id,
+            'algorithm': simulation.algorithm,
+            'status': simulation.status,
+            'started_at': simulation.started_at.isoformat() if simulation.started_at else None,
+            'completed_at': simulation.completed_at.isoformat() if simulation.completed_at else None,
+        },
+        'result': {
+            field.name: getattr(result, field.name)
+            for field in result._meta.concrete_fields
+            if field.get_internal_type() == 'FloatField'
+        } if result else None,
+        'dictionaries': dictionaries,
+        'arrays': {name: {'dtype': array.dtype.str, 'shape': list(array.shape)} for name, array in arrays.items()},
+    }
+    return manifest, arrays
+
+
+def write_directory(simulation, path):
+    """Write ``<column>.npy`` files and manifest.json under ``path``; returns the manifest"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest, arrays = build(simulation)
+    for name, array in arrays.items():
+        np.save(path / f'{name}.npy', array, allow_pickle=False)
+    with open(path / MANIFEST, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+
+def write_npz(simulation, file):
+    """Write all columns plus the manifest (as UTF-8 bytes) to a compressed .npz"""
+    manifest, arrays = build(simulation)
+    arrays['manifest'] = np.frombuffer(json.dumps(manifest).encode('utf-8'), dtype=np.uint8)
+    np.savez_compressed(file, **arrays)
+    return manifest
+
+
+class ColumnarExport:
+    """An export read back: ``manifest`` and ``export['metrics.value']`` style arrays"""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self._arrays = arrays
+
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    def keys(self):
+        return self.manifest['arrays'].keys()
+
+    def strings(self, name):
+        """Decode an Arrow-style string column such as 'vehicle_ids' or 'logs.message'"""
+        return decode_strings(self[f'{name}.data'], self[f'{name}.offsets'])
+
+    def decoded(self, name, dictionary):
+        """Values of a coded column through ``manifest['dictionaries'][dictionary]``"""
+        values = self.manifest['dictionaries'][dictionary]
+        return [values[code] for code in self[name]]
+
+
+def load(path):
+    """
+    Open an export. A directory is memory-mapped column by column, so only
+    the pages that are touched get read; an .npz is read lazily per column.
+    """
+    path = Path(path)
+    if path.is_dir():
+        with open(path / MANIFEST, encoding='utf-8') as fh:
+            manifest = json.load(fh)
+        arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r', allow_pickle=False) for name in manifest['arrays']}
+        return ColumnarExport(manifest, arrays)
+    npz = np.load(path, allow_pickle=False)
+    manifest = json.loads(bytes(npz['manifest']).decode('utf-8'))
+    return ColumnarExport(manifest, npz)
@@ -0,0 +1,54 @@
+"""
+Work deferred to the end of the current transaction, once per key.
+
+Row-level signals fire once per row, but what they trigger (recounting a
+simulation, rebuilding a rollup bucket) only needs to run once for every
+distinct key a transaction touched. ``add(name, key, handler)`` collects
+``key`` in a per-transaction set and registers ``handler(keys)`` with
+``transaction.on_commit`` the first time ``name`` is used in that
+transaction. Outside a transaction the handler runs immediately, as
+``on_commit`` does.
+"""
+import threading
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+class _Batch:
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self.keys = set()
+
+    def __call__(self):
+        batches = _batches()
+        if batches.get(self.name) is self:
+            del batches[self.name]
+        self.handler(self.keys)
+
+
+def _batches():
+    if not hasattr(_local, 'batches'):
+        _local.batches = {}
+    return _local.batches
+
+
+def _registered(connection, batch):
+    # Reused only while its callback is pending in the current savepoint or
+    # an enclosing one: a rollback discards the callback and the batch with it
+    current = set(connection.savepoint_ids)
+    return any(callback is batch and current <= savepoints for savepoints, callback, *_ in connection.run_on_commit)
+
+
+def add(name, key, handler, using=None):
+    """Run ``handler(keys)`` once on commit with every key added under ``name``"""
+    connection = transaction.get_connection(using)
+    batch = _batches().get(name)
+    if batch is not None and connection.in_atomic_block and _registered(connection, batch):
+        batch.keys.add(key)
+        return
+    batch = _batches()[name] = _Batch(name, handler)
+    batch.keys.add(key)
+    transaction.on_commit(batch, using=using)
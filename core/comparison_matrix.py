@@ -0,0 +1,119 @@
+"""
+All-pairs comparison of a scenario's completed simulations.
+
+Every completed simulation's per-metric averages are read once from the
+running totals into a (metric type x simulation) array, and the pairwise
+improvement of every column simulation over every row simulation is
+computed for all metric types at once with NumPy broadcasting.
+
+The matrix is cached under the scenario's ``comparison_matrix`` version,
+which is bumped when a member simulation finishes, is deleted, or gets new
+metrics.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from . import cache_versions
+from .models import Metric, MetricTotal, Simulation
+
+CACHE_PREFIX = 'comparison_matrix'
+VERSION_NAMESPACE = 'comparison_matrix'
+
+METRIC_TYPES = [metric_type for metric_type, _ in Metric.METRIC_TYPES]
+# Everything else is better when lower (time, delay, fuel, emissions, congestion)
+HIGHER_IS_BETTER = {'speed'}
+
+# Most recent completed simulations included in one matrix
+MAX_SIMULATIONS = 200
+
+
+def cache_timeout():
+    return getattr(settings, 'COMPARISON_MATRIX_CACHE_TIMEOUT', 3600)
+
+
+def _nan_to_none(array):
+    """Nested lists for JSON, with NaN (undefined) as null"""
+    return np.where(np.isnan(array), None, array).tolist()
+
+
+def pairwise_improvement(values, higher_is_better):
+    """
+    ``values`` is (types, simulations); returns (types, rows, columns) with
+    the percentage improvement of column j over row i for each type.
+    """
+    reference = values[:, :, None]
+    candidate = values[:, None, :]
+    change = np.where(higher_is_better[:, None, None], candidate - reference, reference - candidate)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        improvement = change / np.abs(reference) * 100
+    # Undefined against a zero or missing reference
+    improvement[~np.isfinite(improvement)] = np.nan
+    return improvement
+
+
+def build_matrix(scenario_id):
+    simulations = list(Simulation.objects.filter(
+        scenario_id=scenario_id,
+        status='completed'
+    ).order_by('-completed_at', '-id').values('id', 'name', 'algorithm')[:MAX_SIMULATIONS])
+    ids = [simulation['id'] for simulation in simulations]
+    column = {simulation_id: index for index, simulation_id in enumerate(ids)}
+    row = {metric_type: index for index, metric_type in enumerate(METRIC_TYPES)}
+
+    values = np.full((len(METRIC_TYPES), len(ids)), np.nan)
+    totals = MetricTotal.objects.filter(
+        simulation_id__in=ids, metric_type__in=METRIC_TYPES, count__gt=0
+    ).values_list('simulation_id', 'metric_type', 'sum', 'count')
+    for simulation_id, metric_type, total, count in totals:
+        values[row[metric_type], column[simulation_id]] = total / count
+
+    higher_is_better = np.array([metric_type in HIGHER_IS_BETTER for metric_type in METRIC_TYPES])
+    improvement = pairwise_improvement(values, higher_is_better)
+
+    # How much better each simulation is than the others, on average
+    off_diagonal = improvement.copy()
+    off_diagonal[:, np.arange(len(ids)), np.arange(len(ids))] = np.nan
+    defined = ~np.isnan(off_diagonal)
+    counts = defined.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_improvement = np.where(counts > 0, np.nansum(off_diagonal, axis=1) / counts, np.nan)
+
+    # Per algorithm, averaged over its runs (seeds)
+    algorithms = np.array([simulation['algorithm'] for simulation in simulations])
+    by_algorithm = {}
+    for algorithm in sorted(set(algorithms.tolist())):
+        scores = mean_improvement[:, algorithms == algorithm]
+        scored = ~np.isnan(scores)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            by_algorithm[algorithm] = np.where(
+                scored.any(axis=1), np.nansum(scores, axis=1) / scored.sum(axis=1), np.nan
+            )
+
+    return {
+        'scenario_id': scenario_id,
+        'simulations': simulations,
+        'metric_types': METRIC_TYPES,
+        'values': {metric_type: _nan_to_none(values[i]) for metric_type, i in row.items()},
+        # improvement[type][i][j]: % by which simulation j improves on simulation i
+        'improvement': {metric_type: _nan_to_none(improvement[i]) for metric_type, i in row.items()},
+        'mean_improvement': {metric_type: _nan_to_none(mean_improvement[i]) for metric_type, i in row.items()},
+        'algorithm_mean_improvement': {
+            metric_type: {algorithm: _nan_to_none(scores[i]) for algorithm, scores in by_algorithm.items()}
+            for metric_type, i in row.items()
+        },
+    }
+
+
+def get_matrix(scenario_id):
+    version = cache_versions.get(VERSION_NAMESPACE, scenario_id)
+    key = f'{CACHE_PREFIX}:{scenario_id}:{version}'
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_matrix(scenario_id)
+        cache.set(key, matrix, timeout=cache_timeout())
+    return matrix
+
+
+def invalidate(scenario_id):
+    cache_versions.bump_on_commit(VERSION_NAMESPACE, scenario_id)
@@ -0,0 +1,146 @@
+"""
+Streaming CSV export of a simulation's results, metrics and trajectories.
+
+Rows are produced by generators over chunked server-side cursors
+(``.iterator()``) or the columnar trajectory store, written through a
+``csv.writer`` into small string batches and handed to a
+StreamingHttpResponse. Nothing holds more than one batch of rows, so
+memory stays flat and the first bytes go out before the metrics are read.
+Output can optionally be gzip-compressed on the fly.
+
+The KPI rows at the top are kept on the Result itself: ``csv_data`` holds
+them as CSV text and ``csv_hash`` their SHA-256. They are rewritten once per
+transaction after the Result or its simulation's status changes (see
+core.signals), never during a download. The download's ETag combines that
+hash with the simulation's metric version, which every Metric write bumps.
+"""
+import csv
+import hashlib
+import zlib
+
+from . import cache_versions, timeseries
+from .models import Metric, Result, Vehicle
+from .trajectory_store import TrajectoryStore
+
+# Database rows fetched per round trip
+CHUNK_SIZE = 5000
+# CSV rows joined into one chunk of the response
+ROWS_PER_CHUNK = 500
+
+METRIC_LABELS = dict(Metric.METRIC_TYPES)
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class _Echo:
+    """File-like object whose write() hands back the formatted line"""
+
+    def write(self, value):
+        return value
+
+
+def result_rows(simulation, result):
+    completed = simulation.completed_at.strftime(DATETIME_FORMAT) if simulation.completed_at else 'N/A'
+    yield ['Metric', 'Value', 'Unit', 'Baseline Value', 'Improvement %', 'Timestamp']
+    for label, value, unit, baseline, improvement in [
+        ('Average Travel Time', result.avg_travel_time, 'min', result.baseline_avg_travel_time, result.improvement_travel_time),
+        ('Total Delay', result.total_delay, 'hours', result.baseline_total_delay, result.delay_reduction),
+        ('Fuel Consumption', result.fuel_consumed, 'liters', result.baseline_fuel_consumed, result.fuel_saving),
+        ('CO2 Emissions', result.co2_emissions, 'kg', result.baseline_co2_emissions, result.emissions_reduction),
+    ]:
+        yield [label, f"{value:.1f}", unit, f"{baseline:.1f}", f"{improvement:.1f}%", completed]
+
+
+def metric_rows(simulation):
+    yield []
+    yield ['Detailed Metrics']
+    yield ['Metric Type', 'Value', 'Unit', 'Timestamp']
+    metrics = Metric.objects.filter(simulation=simulation).order_by('metric_type', '-timestamp').values_list(
+        'metric_type', 'value', 'unit', 'timestamp'
+    )
+    for metric_type, value, unit, timestamp in metrics.iterator(chunk_size=CHUNK_SIZE):
+        yield [METRIC_LABELS.get(metric_type, metric_type), f"{value:.2f}", unit, timestamp.strftime(DATETIME_FORMAT)]
+
+
+def vehicle_rows(simulation):
+    """The full trajectory history, oldest sample first, from whichever backend holds it"""
+    yield []
+    yield ['Vehicle Trajectories']
+    yield ['Vehicle ID', 'Type', 'Latitude', 'Longitude', 'Speed (km/h)', 'Heading', 'Timestamp']
+    store = TrajectoryStore(simulation.id)
+    if store.exists():
+        samples = (
+            (s.vehicle_id, s.vehicle_type, s.lat, s.lng, s.speed, s.heading, s.timestamp)
+            for s in store.iter_samples(chunk_size=CHUNK_SIZE)
+        )
+    else:
+        samples = Vehicle.objects.filter(simulation=simulation).order_by('timestamp').values_list(
+            'vehicle_id', 'vehicle_type', 'lat', 'lng', 'speed', 'heading', 'timestamp'
+        ).iterator(chunk_size=CHUNK_SIZE)
+    for vehicle_id, vehicle_type, lat, lng, speed, heading, timestamp in samples:
+        yield [vehicle_id, vehicle_type, f"{lat:.6f}", f"{lng:.6f}", f"{speed:.2f}", f"{heading:.1f}",
+               timestamp.strftime(DATETIME_FORMAT)]
+
+
+def csv_chunks(rows):
+    """Format rows as CSV text, ROWS_PER_CHUNK rows per yielded string"""
+    writer = csv.writer(_Echo())
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into a gzip stream"""
+    compressor = zlib.compressobj(wbits=31)  # 16 + 15: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def summary_text(simulation, result):
+    return ''.join(csv_chunks(result_rows(simulation, result)))
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def summary(simulation, result):
+    """(KPI rows as CSV, their hash): as stored on the Result, or computed (not stored) if missing"""
+    if result.csv_hash:
+        return result.csv_data, result.csv_hash
+    text = summary_text(simulation, result)
+    return text, _digest(text)
+
+
+def store_summaries(simulation_ids):
+    """Write the KPI rows and hash of these simulations' Results"""
+    for result in Result.objects.select_related('simulation').filter(simulation_id__in=simulation_ids):
+        text = summary_text(result.simulation, result)
+        digest = _digest(text)
+        if digest != result.csv_hash:
+            # update(): no post_save, which would queue this again
+            Result.objects.filter(id=result.id).update(csv_data=text, csv_hash=digest)
+
+
+def metrics_version(simulation_id):
+    """Changes whenever one of the simulation's metrics is written"""
+    return cache_versions.get(timeseries.VERSION_NAMESPACE, simulation_id)
+
+
+def simulation_csv(simulation, result, vehicles=False, compress=False):
+    """Chunks of the simulation's CSV export"""
+    def chunks():
+        yield summary(simulation, result)[0]
+        yield from csv_chunks(metric_rows(simulation))
+        if vehicles:
+            yield from csv_chunks(vehicle_rows(simulation))
+
+    return gzip_chunks(chunks()) if compress else chunks()
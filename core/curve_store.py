@@ -0,0 +1,105 @@
+"""
+Append-only binary storage for training curves.
+
+Each simulation gets a directory under ``TRAINING_CURVE_ROOT`` with one file
+per curve holding one little-endian float32 per epoch:
+
+    training_loss.f32, training_accuracy.f32,
+    validation_loss.f32, validation_accuracy.f32
+
+Appending an epoch adds four bytes to the end of the file; reads go through
+``numpy.memmap`` so an epoch range or a stride only pages in what it needs.
+Nothing is loaded until a curve is actually read.
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked
+    fcntl = None
+
+CURVES = ('training_loss', 'training_accuracy', 'validation_loss', 'validation_accuracy')
+DTYPE = np.dtype('<f4')
+# Larger values would be stored as inf
+LIMIT = float(np.finfo(DTYPE).max)
+
+
+def curve_root():
+    return Path(getattr(settings, 'TRAINING_CURVE_ROOT', settings.BASE_DIR / 'training_curves'))
+
+
+def clean_values(values):
+    """
+    One value or a list of values (one per epoch) as a float32 array;
+    raises ValueError unless every value is a number float32 can hold.
+    """
+    values = values if isinstance(values, list) else [values]
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not abs(value) <= LIMIT:
+            raise ValueError(f'Curve values must be finite numbers, got {value!r}')
+    return np.asarray(values, dtype=DTYPE)
+
+
+class CurveStore:
+    """Training-curve files for one simulation"""
+
+    def __init__(self, simulation_id, root=None):
+        self.simulation_id = simulation_id
+        self.path = Path(root or curve_root()) / f'simulation_{simulation_id}'
+
+    def _file(self, curve):
+        if curve not in CURVES:
+            raise ValueError(f'Unknown training curve: {curve}')
+        return self.path / f'{curve}.f32'
+
+    def epochs(self, curve):
+        """Number of epochs stored for ``curve``"""
+        try:
+            # A torn append leaves a partial value at the end; ignore it
+            return os.path.getsize(self._file(curve)) // DTYPE.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def append(self, curve, values):
+        """Append one value or a sequence of values (one per epoch)"""
+        values = np.atleast_1d(np.asarray(values, dtype=DTYPE))
+        if not len(values):
+            return 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self._file(curve), 'ab') as fh:
+            # Locked so a writer never cuts another's append short below
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            # Drop the partial value a torn append left, or every later epoch is misaligned
+            size = os.fstat(fh.fileno()).st_size
+            if size % DTYPE.itemsize:
+                fh.truncate(size - size % DTYPE.itemsize)
+            fh.write(values.tobytes())
+        return len(values)
+
+    def write(self, curve, values):
+        """Replace a whole curve"""
+        values = np.asarray(values, dtype=DTYPE)
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / f'{curve}.f32.tmp'
+        values.tofile(tmp)
+        os.replace(tmp, self._file(curve))
+
+    def read(self, curve, start=None, stop=None, step=None):
+        """Epochs ``[start:stop:step]`` of ``curve`` as a float32 array"""
+        length = self.epochs(curve)
+        if length == 0:
+            return np.empty(0, dtype=DTYPE)
+        values = np.memmap(self._file(curve), dtype=DTYPE, mode='r', shape=(length,))
+        return np.array(values[start:stop:step])
+
+    def read_all(self, start=None, stop=None, step=None):
+        return {curve: self.read(curve, start, stop, step) for curve in CURVES}
+
+    def delete(self):
+        shutil.rmtree(self.path, ignore_errors=True)
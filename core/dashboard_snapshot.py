@@ -0,0 +1,203 @@
+"""
+Precomputed dashboard numbers.
+
+The dashboard is split into independent sections, each cached under its own
+key. Writes that affect a section (vehicle ingestion, new metrics or
+results, simulation status changes) drop just that section through
+``invalidate()``, and the next page load rebuilds only what is missing.
+Every section also expires after ``DASHBOARD_SNAPSHOT_MAX_AGE`` seconds,
+which bounds staleness for time-windowed numbers and for writes made by
+other processes when the cache is not shared.
+"""
+import json
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from . import metric_rollups
+from .models import Scenario, Simulation, VehicleState, Metric, Result
+from .rolling_stats import rolling_stats
+
+CACHE_PREFIX = 'dashboard_snapshot'
+
+# Rolling-stats windows behind the traffic numbers (see ROLLING_STATS_WINDOWS)
+LIVE_SPEED_WINDOW = '5m'
+RECENT_SPEED_WINDOW = '1h'
+
+
+def max_age():
+    return getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_AGE', 30)
+
+
+def build_simulations():
+    active_simulations = list(Simulation.objects.filter(status='running').order_by('-created_at')[:5])
+    recent_simulations = list(Simulation.objects.select_related('scenario').order_by('-created_at')[:10])
+    return {
+        'active_simulations': active_simulations,
+        'recent_simulations': recent_simulations,
+    }
+
+
+def build_scenarios():
+    # Get scenarios for dropdown
+    return {'scenarios': list(Scenario.objects.filter(is_active=True).order_by('-created_at'))}
+
+
+def build_speed_chart():
+    time_labels = []
+    speed_data = []
+
+    # Hourly speed over the last 6 hours, from the hourly rollups
+    six_hours_ago = timezone.now() - timedelta(hours=6)
+    metrics = metric_rollups.bucketed('speed', six_hours_ago, 'hour')[:6]
+
+    if metrics:
+        for metric in metrics:
+            time_labels.append(timezone.localtime(metric['bucket']).strftime('%H:%M'))
+            speed_data.append(float(metric['avg']))
+    else:
+        # Fallback to realistic data based on time of day
+        now = timezone.now()
+        for i in range(6, 0, -1):
+            time = now - timedelta(hours=i)
+            time_labels.append(time.strftime('%H:%M'))
+
+            # Generate realistic speed based on Kenyan traffic patterns
+            hour = time.hour
+            if 7 <= hour <= 9 or 16 <= hour <= 18:  # Peak hours
+                speed = random.uniform(15, 25)
+            elif 10 <= hour <= 15:  # Midday
+                speed = random.uniform(30, 45)
+            else:  # Off-peak
+                speed = random.uniform(45, 60)
+            speed_data.append(speed)
+
+    return {
+        'time_labels': json.dumps(time_labels),
+        'speed_data': json.dumps(speed_data),
+    }
+
+
+def build_traffic():
+    active_sim = Simulation.objects.filter(status='running').select_related('scenario').order_by('-created_at').first()
+
+    if active_sim:
+        # Vehicle count and the map extent come from the latest-state table;
+        # the map itself loads aggregated grid cells from api_vehicle_map
+        live = VehicleState.objects.filter(simulation=active_sim).aggregate(
+            count=Count('id'), south=Min('lat'), west=Min('lng'), north=Max('lat'), east=Max('lng')
+        )
+        vehicle_count = live['count']
+        live_bounds = [[live['south'], live['west']], [live['north'], live['east']]] if vehicle_count else None
+
+        # Average speed from the rolling window; other workers' samples arrive with its periodic refresh
+        avg_speed = rolling_stats.stats(active_sim.id, LIVE_SPEED_WINDOW).avg_speed or 0
+
+        # Get congestion level based on average speed and the scenario's thresholds
+        congestion_level = active_sim.scenario.congestion_level(avg_speed)
+
+        # Get latest delay from metrics
+        latest_delay = Metric.objects.filter(
+            simulation=active_sim,
+            metric_type='delay'
+        ).order_by('-timestamp').first()
+
+        avg_delay = f"{latest_delay.value:.0f} min" if latest_delay else "N/A"
+    else:
+        # Use aggregated data from recent completed simulations
+        recent = dict(VehicleState.objects.filter(
+            updated_at__gte=timezone.now() - timedelta(hours=1)
+        ).values_list('simulation_id').annotate(count=Count('id')).order_by())
+        vehicle_count = sum(recent.values())
+        live_bounds = None
+
+        avg_speed = rolling_stats.combined(recent, RECENT_SPEED_WINDOW).avg_speed or 32.5
+
+        congestion_level = 'MEDIUM'
+        avg_delay = '45 min'
+
+    return {
+        'vehicle_count': vehicle_count,
+        'avg_speed': avg_speed,
+        'congestion_level': congestion_level,
+        'avg_delay': avg_delay,
+        'live_bounds': json.dumps(live_bounds),
+        # The simulation live_bounds belongs to, from this same section
+        'live_simulation_id': active_sim.id if live_bounds else None,
+    }
+
+
+def build_key_findings():
+    key_findings = []
+
+    # Get best performing AI simulations
+    best_results = list(Result.objects.select_related('simulation').filter(
+        simulation__algorithm__in=['rl_optimized', 'ga_optimized', 'hybrid']
+    ).order_by('-improvement_travel_time')[:3])
+
+    for result in best_results:
+        if result.improvement_travel_time > 20:
+            key_findings.append({
+                'title': 'Travel Time Reduction',
+                'description': f'{result.simulation.get_algorithm_display()} reduced average travel time by {result.improvement_travel_time:.1f}%',
+                'improvement': result.improvement_travel_time
+            })
+        if result.fuel_saving > 20:
+            key_findings.append({
+                'title': 'Fuel Savings',
+                'description': f'{result.simulation.get_algorithm_display()} reduced fuel consumption by {result.fuel_saving:.1f}%',
+                'improvement': result.fuel_saving
+            })
+        if result.emissions_reduction > 20:
+            key_findings.append({
+                'title': 'Emissions Reduction',
+                'description': f'{result.simulation.get_algorithm_display()} reduced CO₂ emissions by {result.emissions_reduction:.1f}%',
+                'improvement': result.emissions_reduction
+            })
+
+    if not best_results:
+        # Fallback to default findings if no real results yet
+        key_findings = [
+            {'title': 'Travel Time Reduction', 'description': 'AI optimization reduces average travel time by 28%', 'improvement': 28},
+            {'title': 'Fuel Savings', 'description': 'Reduced fuel consumption by 29% in peak hours', 'improvement': 29},
+            {'title': 'Emissions Reduction', 'description': 'CO₂ emissions reduced by 27% through optimized routing', 'improvement': 27},
+        ]
+
+    return {'key_findings': key_findings}
+
+
+BUILDERS = {
+    'simulations': build_simulations,
+    'scenarios': build_scenarios,
+    'speed_chart': build_speed_chart,
+    'traffic': build_traffic,
+    'key_findings': build_key_findings,
+}
+
+
+def _key(section):
+    return f'{CACHE_PREFIX}:{section}'
+
+
+def get_snapshot():
+    """All dashboard numbers, rebuilding only the sections that are missing"""
+    cached = cache.get_many([_key(section) for section in BUILDERS])
+    snapshot = {}
+    rebuilt = {}
+    for section, build in BUILDERS.items():
+        data = cached.get(_key(section))
+        if data is None:
+            data = rebuilt[_key(section)] = build()
+        snapshot.update(data)
+    if rebuilt:
+        cache.set_many(rebuilt, timeout=max_age())
+    return snapshot
+
+
+def invalidate(*sections):
+    """Drop the named sections (all of them when none are given)"""
+    cache.delete_many([_key(section) for section in sections or BUILDERS])
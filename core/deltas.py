@@ -0,0 +1,53 @@
+"""
+Change cursors and HTTP validators for the polling JSON APIs.
+
+Rows carrying an ``updated_at`` timestamp are read in (updated_at, id)
+order, so a cursor ``<updated_at in microseconds>-<id>`` marks an exact
+position and ``?since=<cursor>`` returns only rows written after it.
+"""
+import hashlib
+
+from django.db.models import Q
+
+from .trajectory_store import from_micros, to_micros
+
+
+class ChangeCursor:
+    """Position in an (updated_at, id) ordered stream of changes"""
+
+    def __init__(self, updated_at=0, pk=0):
+        self.updated_at = updated_at  # microseconds since the epoch
+        self.pk = pk
+
+    @classmethod
+    def parse(cls, value):
+        """Parse ``<micros>-<id>``; raises ValueError when malformed"""
+        try:
+            updated_at, pk = (int(part) for part in value.split('-'))
+            # Out of range values would only fail later, in the query
+            from_micros(updated_at)
+            if pk >= 2 ** 63:
+                raise ValueError(pk)
+        except (AttributeError, ValueError, OverflowError):
+            raise ValueError('since must be a cursor returned by a previous response')
+        return cls(updated_at, pk)
+
+    @classmethod
+    def for_row(cls, updated_at, pk):
+        return cls(to_micros(updated_at), pk)
+
+    def __str__(self):
+        return f'{self.updated_at}-{self.pk}'
+
+
+def changed_since(queryset, cursor, field='updated_at'):
+    """Rows of ``queryset`` written after ``cursor``, oldest change first"""
+    since = from_micros(cursor.updated_at)
+    return queryset.filter(
+        Q(**{f'{field}__gt': since}) | Q(**{field: since, 'id__gt': cursor.pk})
+    ).order_by(field, 'id')
+
+
+def make_etag(*parts):
+    """ETag built from the values a response depends on"""
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
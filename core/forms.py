@@ -1,3 +1,5 @@
+import json
+
 from django import forms
 from .models import Scenario, Simulation
 
@@ -13,6 +15,27 @@ class ScenarioForm(forms.ModelForm):
             }),
         }
 
+    def clean_parameters(self):
+        parameters = self.cleaned_data['parameters'] or '{}'
+        try:
+            data = json.loads(parameters)
+        except ValueError:
+            raise forms.ValidationError('Enter valid JSON')
+        if not isinstance(data, dict):
+            raise forms.ValidationError('Parameters must be a JSON object')
+
+        thresholds = data.get('congestion_thresholds')
+        if thresholds is not None:
+            if not isinstance(thresholds, dict):
+                raise forms.ValidationError('congestion_thresholds must be an object like {"high": 15, "medium": 30}')
+            merged = {**Scenario.DEFAULT_CONGESTION_THRESHOLDS, **thresholds}
+            if not all(isinstance(merged[level], (int, float)) and not isinstance(merged[level], bool)
+                       for level in Scenario.DEFAULT_CONGESTION_THRESHOLDS):
+                raise forms.ValidationError('congestion_thresholds values must be speeds in km/h')
+            if merged['high'] > merged['medium']:
+                raise forms.ValidationError('congestion_thresholds: "high" must not exceed "medium"')
+        return parameters
+
 class SimulationForm(forms.ModelForm):
     class Meta:
         model = Simulation
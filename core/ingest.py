@@ -0,0 +1,217 @@
+"""Bulk ingestion of simulator telemetry"""
+import json
+import math
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import baselines, cache_versions, comparison_matrix, dashboard_snapshot, metric_rollups, timeseries
+from .models import Metric, Vehicle, VehicleState
+from .result_totals import record_metrics
+from .rolling_stats import rolling_stats
+from .trajectory_store import TrajectoryStore, columnar_enabled
+
+# Rows per INSERT statement. SQLite caps bound parameters per statement, so
+# keep (fields per row * batch size) comfortably below that limit.
+VEHICLE_INSERT_BATCH_SIZE = 500
+
+METRIC_INSERT_BATCH_SIZE = 500
+
+# Upper bound on samples accepted in a single request
+MAX_VEHICLES_PER_REQUEST = 20000
+
+VEHICLE_TYPES = {choice for choice, _ in Vehicle.VEHICLE_TYPES}
+
+
+class PayloadError(ValueError):
+    """Raised when a request body cannot be parsed into vehicle samples"""
+
+
+def parse_vehicle_payload(body, content_type=''):
+    """Parse a JSON array, a {"vehicles": [...]} object or an NDJSON body"""
+    if isinstance(body, bytes):
+        try:
+            body = body.decode('utf-8')
+        except UnicodeDecodeError:
+            raise PayloadError('Request body must be UTF-8 encoded')
+
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        return _parse_ndjson(body)
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        # Not a single JSON document, fall back to one sample per line
+        return _parse_ndjson(body)
+
+    if isinstance(data, dict):
+        data = data.get('vehicles')
+    if not isinstance(data, list):
+        raise PayloadError('Expected a JSON array of vehicles or {"vehicles": [...]}')
+    return data
+
+
+def _parse_ndjson(body):
+    samples = []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            samples.append(json.loads(line))
+        except ValueError:
+            raise PayloadError(f'Invalid JSON on line {line_number}')
+    return samples
+
+
+def _to_float(data, key, default, errors, minimum=None, maximum=None):
+    value = data.get(key, default)
+    if isinstance(value, bool):
+        errors[key] = 'Must be a number'
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        errors[key] = 'Must be a number'
+        return None
+    if not math.isfinite(value):
+        errors[key] = 'Must be a finite number'
+        return None
+    if minimum is not None and value < minimum:
+        errors[key] = f'Must be at least {minimum}'
+        return None
+    if maximum is not None and value > maximum:
+        errors[key] = f'Must be at most {maximum}'
+        return None
+    return value
+
+
+def validate_vehicle_sample(data):
+    """Validate one sample, returning (cleaned fields, errors)"""
+    if not isinstance(data, dict):
+        return None, {'__all__': 'Each vehicle must be a JSON object'}
+
+    errors = {}
+    # Defaults mirror api_add_vehicle so both endpoints accept the same payloads
+    vehicle_id = str(data.get('id', 'unknown'))
+    if not vehicle_id or len(vehicle_id) > 50:
+        errors['id'] = 'Must be 1-50 characters'
+
+    vehicle_type = data.get('type', 'car')
+    if vehicle_type not in VEHICLE_TYPES:
+        errors['type'] = f"Must be one of: {', '.join(sorted(VEHICLE_TYPES))}"
+
+    cleaned = {
+        'vehicle_id': vehicle_id,
+        'vehicle_type': vehicle_type,
+        'lat': _to_float(data, 'lat', 0, errors, -90, 90),
+        'lng': _to_float(data, 'lng', 0, errors, -180, 180),
+        'speed': _to_float(data, 'speed', 0, errors, 0, None),
+        'heading': _to_float(data, 'heading', 0, errors, 0, 360),
+    }
+    if errors:
+        return None, errors
+    return cleaned, {}
+
+
+def ingest_vehicles(simulation, samples, batch_size=VEHICLE_INSERT_BATCH_SIZE):
+    """
+    Validate all samples in one pass and bulk insert the valid ones.
+
+    Returns (created_count, errors) where errors is a list of
+    {'index': position in samples, 'errors': {field: message}}.
+    """
+    valid = []
+    errors = []
+    for index, data in enumerate(samples):
+        cleaned, item_errors = validate_vehicle_sample(data)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+            continue
+        valid.append(cleaned)
+
+    store_vehicles(simulation, valid, batch_size=batch_size)
+    return len(valid), errors
+
+
+def store_vehicles(simulation, samples, batch_size=VEHICLE_INSERT_BATCH_SIZE):
+    """
+    Write cleaned samples to the configured history backend and upsert
+    each vehicle's latest state. Columnar history is appended on commit.
+    Returns the created Vehicle rows (none
+    when history goes to the columnar store).
+    """
+    if not samples:
+        return []
+    vehicles = []
+    with transaction.atomic():
+        if columnar_enabled():
+            # The files can't roll back: write them only once the states are committed
+            transaction.on_commit(lambda: TrajectoryStore(simulation.id).append(samples))
+        else:
+            vehicles = Vehicle.objects.bulk_create(
+                [Vehicle(simulation=simulation, **sample) for sample in samples],
+                batch_size=batch_size
+            )
+        upsert_vehicle_states(simulation, samples, batch_size=batch_size)
+        record_rolling_stats(simulation, samples)
+    return vehicles
+
+
+def record_rolling_stats(simulation, samples):
+    """Feed the samples' speeds to the rolling-window statistics once committed"""
+    speeds = [sample['speed'] for sample in samples]
+    transaction.on_commit(lambda: rolling_stats.record(simulation.id, speeds))
+
+
+def upsert_vehicle_states(simulation, samples, batch_size=VEHICLE_INSERT_BATCH_SIZE):
+    """Insert or overwrite the (simulation, vehicle_id) rows in VehicleState"""
+    # One row per vehicle: the last sample in the batch wins. PostgreSQL
+    # rejects an upsert that touches the same row twice in one statement.
+    latest = {sample['vehicle_id']: sample for sample in samples}
+    now = timezone.now()
+    VehicleState.objects.bulk_create(
+        [
+            VehicleState(
+                simulation=simulation,
+                vehicle_id=sample['vehicle_id'],
+                vehicle_type=sample['vehicle_type'],
+                lat=sample['lat'],
+                lng=sample['lng'],
+                speed=sample['speed'],
+                heading=sample['heading'],
+                updated_at=now,
+            )
+            for sample in latest.values()
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['simulation', 'vehicle_id'],
+        update_fields=['vehicle_type', 'lat', 'lng', 'speed', 'heading', 'updated_at'],
+    )
+    transaction.on_commit(lambda: dashboard_snapshot.invalidate('traffic'))
+    # Cached map grid tiles are keyed by this version
+    cache_versions.bump_on_commit('vehicle_states', simulation.id)
+
+
+def store_metrics(simulation, metrics, batch_size=METRIC_INSERT_BATCH_SIZE):
+    """
+    Bulk insert unsaved Metric instances of ``simulation`` and update what
+    the per-row signals otherwise maintain: running totals, rollups and
+    the caches derived from them.
+    """
+    if not metrics:
+        return []
+    with transaction.atomic():
+        created = Metric.objects.bulk_create(metrics, batch_size=batch_size)
+        record_metrics(simulation.id, [(metric.metric_type, metric.value) for metric in created])
+        metric_rollups.record(simulation.id, [
+            (metric.metric_type, metric.value, metric.timestamp) for metric in created
+        ])
+        if simulation.algorithm == 'baseline':
+            baselines.invalidate(simulation.scenario_id)
+        if simulation.status == 'completed':
+            comparison_matrix.invalidate(simulation.scenario_id)
+        timeseries.invalidate(simulation.id)
+        transaction.on_commit(lambda: dashboard_snapshot.invalidate('speed_chart', 'traffic'))
+    return created
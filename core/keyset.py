@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination for the list views.
+
+Lists are shown newest first in (created_at, id) order. Instead of an
+OFFSET, a page is asked for relative to the row at one of its edges:
+``?after=<cursor>`` gives the rows older than that row and
+``?before=<cursor>`` the rows newer than it, so every page is one index
+range read however deep it is. The total is not needed to paginate; when a
+template shows it, it comes from a COUNT cached for a short while.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .deltas import ChangeCursor
+from .trajectory_store import from_micros
+
+
+def count_cache_timeout():
+    return getattr(settings, 'KEYSET_COUNT_CACHE_TIMEOUT', 60)
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list"""
+
+    def __init__(self, object_list, has_next, has_previous, queryset, count_key, field):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._queryset = queryset
+        self._count_key = count_key
+        self._field = field
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _cursor(self, row):
+        return str(ChangeCursor.for_row(getattr(row, self._field), row.pk))
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor(self.object_list[0]) if self.has_previous else None
+
+    @property
+    def count(self):
+        """Approximate total: a COUNT cached for ``KEYSET_COUNT_CACHE_TIMEOUT`` seconds"""
+        count = cache.get(self._count_key)
+        if count is None:
+            count = self._queryset.count()
+            cache.set(self._count_key, count, timeout=count_cache_timeout())
+        return count
+
+
+def _parse(value):
+    if not value:
+        return None
+    try:
+        return ChangeCursor.parse(value)
+    except ValueError:
+        # A mangled link starts over from the newest rows
+        return None
+
+
+def paginate(request, queryset, per_page, count_key, field='created_at'):
+    """The page of ``queryset`` (newest first) selected by ``?after=`` / ``?before=``"""
+    after = _parse(request.GET.get('after'))
+    before = None if after else _parse(request.GET.get('before'))
+
+    if before is not None:
+        # Newer rows, read oldest first from the cursor, then flipped
+        at = from_micros(before.updated_at)
+        rows = list(queryset.filter(
+            Q(**{f'{field}__gt': at}) | Q(**{field: at, 'id__gt': before.pk})
+        ).order_by(field, 'id')[:per_page + 1])
+        has_previous = len(rows) > per_page
+        return KeysetPage(rows[:per_page][::-1], True, has_previous, queryset, count_key, field)
+
+    page = queryset.order_by(f'-{field}', '-id')
+    if after is not None:
+        at = from_micros(after.updated_at)
+        page = page.filter(Q(**{f'{field}__lt': at}) | Q(**{field: at, 'id__lt': after.pk}))
+    rows = list(page[:per_page + 1])
+    return KeysetPage(rows[:per_page], len(rows) > per_page, after is not None, queryset, count_key, field)
@@ -0,0 +1,173 @@
+"""
+Server-Sent Events feed for one simulation.
+
+The stream pushes three kinds of events:
+
+    progress   simulation status/progress/epoch/loss/accuracy when it changes
+    vehicles   VehicleState rows updated since the cursor (position deltas)
+    logs       SimulationLog rows newer than the cursor
+
+Every data event carries an ``id`` holding the resume cursor
+``<log id>-<vehicle state updated_at in microseconds>-<vehicle state id>``.
+Browsers send it back as ``Last-Event-ID`` when they reconnect, so a client
+picks up where it left off. A comment line is sent as a heartbeat when
+nothing else has been written for ``SSE_HEARTBEAT_INTERVAL`` seconds.
+
+A vehicle state's ``updated_at`` is stamped before its transaction commits,
+so a row can become visible with a timestamp already behind the cursor.
+Each poll therefore also rereads the last ``SSE_VEHICLE_OVERLAP`` seconds
+before the cursor and sends the rows this stream has not sent yet; after a
+reconnect that window may be sent twice, which only repeats positions.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Simulation, SimulationLog, VehicleState
+from .progress_buffer import progress_buffer
+from .trajectory_store import from_micros, to_micros
+
+PROGRESS_FIELDS = ('status', 'progress', 'current_epoch', 'total_epochs', 'current_loss', 'current_accuracy')
+
+# Bounds on rows pulled per poll; anything beyond is sent on the next poll
+VEHICLE_BATCH_LIMIT = 2000
+LOG_BATCH_LIMIT = 100
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+def poll_interval():
+    return getattr(settings, 'SSE_POLL_INTERVAL', 1.0)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'SSE_HEARTBEAT_INTERVAL', 15.0)
+
+
+def vehicle_overlap():
+    return timedelta(seconds=getattr(settings, 'SSE_VEHICLE_OVERLAP', 2.0))
+
+
+class Cursor:
+    """Position in a simulation's log and vehicle-state streams"""
+
+    def __init__(self, log_id=None, vehicle_ts=0, vehicle_pk=0):
+        # log_id None means "start from the newest log"
+        self.log_id = log_id
+        self.vehicle_ts = vehicle_ts
+        self.vehicle_pk = vehicle_pk
+        # id -> updated_at (microseconds) of rows sent within the overlap window
+        self.sent = {}
+
+    @classmethod
+    def parse(cls, value):
+        try:
+            log_id, vehicle_ts, vehicle_pk = (int(part) for part in value.split('-'))
+        except (AttributeError, ValueError):
+            return cls()
+        return cls(log_id, vehicle_ts, vehicle_pk)
+
+    def __str__(self):
+        return f'{self.log_id or 0}-{self.vehicle_ts}-{self.vehicle_pk}'
+
+
+def format_event(event, data, cursor=None):
+    lines = []
+    if cursor is not None:
+        lines.append(f'id: {cursor}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
+
+
+def poll(simulation_id, cursor):
+    """Read everything that changed after ``cursor``; runs in a worker thread"""
+    simulation = Simulation.objects.filter(id=simulation_id).values(*PROGRESS_FIELDS).first()
+    if simulation is None:
+        return None, [], []
+    # Progress still held in this process's write-behind buffer
+    simulation.update(progress_buffer.pending(simulation_id))
+
+    if cursor.log_id is None:
+        latest = SimulationLog.objects.filter(simulation_id=simulation_id).order_by('-timestamp', '-id').first()
+        cursor.log_id = latest.id if latest else 0
+
+    logs = list(SimulationLog.objects.filter(
+        simulation_id=simulation_id,
+        id__gt=cursor.log_id
+    ).order_by('id').values('id', 'log_level', 'message', 'timestamp')[:LOG_BATCH_LIMIT])
+    if logs:
+        cursor.log_id = logs[-1]['id']
+
+    since = from_micros(cursor.vehicle_ts)
+    states = VehicleState.objects.filter(simulation_id=simulation_id).order_by('updated_at', 'id').values(
+        'id', 'vehicle_id', 'vehicle_type', 'lat', 'lng', 'speed', 'heading', 'updated_at'
+    )
+    late = []
+    if cursor.vehicle_ts:
+        # Rows stamped before the cursor but committed after it was taken
+        late = [
+            row for row in states.filter(
+                Q(updated_at__lt=since) | Q(updated_at=since, id__lte=cursor.vehicle_pk),
+                updated_at__gte=since - vehicle_overlap(),
+            )[:VEHICLE_BATCH_LIMIT]
+            if cursor.sent.get(row['id']) != to_micros(row['updated_at'])
+        ]
+    vehicles = list(states.filter(
+        Q(updated_at__gt=since) | Q(updated_at=since, id__gt=cursor.vehicle_pk)
+    )[:VEHICLE_BATCH_LIMIT])
+    if vehicles:
+        cursor.vehicle_ts = to_micros(vehicles[-1]['updated_at'])
+        cursor.vehicle_pk = vehicles[-1]['id']
+
+    vehicles = late + vehicles
+    window = cursor.vehicle_ts - vehicle_overlap() // timedelta(microseconds=1)
+    cursor.sent = {pk: ts for pk, ts in cursor.sent.items() if ts >= window}
+    cursor.sent.update((row['id'], to_micros(row['updated_at'])) for row in vehicles)
+
+    return simulation, vehicles, logs
+
+
+async def simulation_event_stream(simulation_id, cursor):
+    """Async generator of SSE messages for one simulation"""
+    loop = asyncio.get_running_loop()
+    # Ask browsers to wait 3s before reconnecting after a dropped connection
+    yield 'retry: 3000\n\n'
+
+    last_progress = None
+    last_write = loop.time()
+    while True:
+        simulation, vehicles, logs = await sync_to_async(poll)(simulation_id, cursor)
+        if simulation is None:
+            yield format_event('end', {'reason': 'deleted'})
+            return
+
+        wrote = False
+        progress = {key: simulation[key] for key in PROGRESS_FIELDS}
+        if progress != last_progress:
+            yield format_event('progress', progress, cursor)
+            last_progress = progress
+            wrote = True
+        if vehicles:
+            yield format_event('vehicles', vehicles, cursor)
+            wrote = True
+        if logs:
+            yield format_event('logs', logs, cursor)
+            wrote = True
+
+        if simulation['status'] in FINISHED_STATUSES and not vehicles and not logs:
+            yield format_event('end', {'reason': simulation['status']}, cursor)
+            return
+
+        if wrote:
+            last_write = loop.time()
+        elif loop.time() - last_write >= heartbeat_interval():
+            yield ': heartbeat\n\n'
+            last_write = loop.time()
+
+        await asyncio.sleep(poll_interval())
@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+from core.models import Scenario, Simulation, Vehicle
+import json
+import random
+import time
+
+class Command(BaseCommand):
+    help = 'Benchmark per-vehicle vs batch vehicle ingestion endpoints (vehicles/sec)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vehicles',
+            type=int,
+            default=2000,
+            help='Number of vehicle samples to send to each endpoint'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Vehicles per request for the batch endpoint'
+        )
+        parser.add_argument(
+            '--ndjson',
+            action='store_true',
+            help='Send batches as NDJSON instead of a JSON array'
+        )
+
+    def handle(self, *args, **kwargs):
+        count = kwargs['vehicles']
+        batch_size = kwargs['batch_size']
+
+        user, _ = User.objects.get_or_create(
+            username='system_user',
+            defaults={'is_active': False, 'is_staff': True}
+        )
+        scenario = Scenario.objects.create(
+            name='Ingestion Benchmark',
+            scenario_type='nairobi_peak',
+            created_by=user,
+            is_active=False,
+        )
+        simulation = Simulation.objects.create(
+            name='Ingestion Benchmark',
+            scenario=scenario,
+            algorithm='baseline',
+            created_by=user,
+            status='running',
+        )
+
+        samples = [
+            {
+                'id': f'BENCH{i:05d}',
+                'type': random.choice(['car', 'bus', 'truck', 'motorcycle']),
+                'lat': -1.2921 + random.uniform(-0.05, 0.05),
+                'lng': 36.8219 + random.uniform(-0.05, 0.05),
+                'speed': random.uniform(0, 80),
+                'heading': random.uniform(0, 360),
+            }
+            for i in range(count)
+        ]
+
+        client = Client(HTTP_HOST='127.0.0.1')
+
+        try:
+            # Current endpoint: one request and one transaction per vehicle
+            url = reverse('api_add_vehicle', args=[simulation.id])
+            start = time.perf_counter()
+            for sample in samples:
+                client.post(url, data=json.dumps(sample), content_type='application/json')
+            single_elapsed = time.perf_counter() - start
+
+            # Batch endpoint: chunked bulk inserts in one transaction per request
+            url = reverse('api_add_vehicles_batch', args=[simulation.id])
+            start = time.perf_counter()
+            for offset in range(0, count, batch_size):
+                chunk = samples[offset:offset + batch_size]
+                if kwargs['ndjson']:
+                    body = '\n'.join(json.dumps(sample) for sample in chunk)
+                    client.post(url, data=body, content_type='application/x-ndjson')
+                else:
+                    client.post(url, data=json.dumps(chunk), content_type='application/json')
+            batch_elapsed = time.perf_counter() - start
+
+            stored = Vehicle.objects.filter(simulation=simulation).count()
+        finally:
+            # Cascades to the benchmark vehicles
+            scenario.delete()
+
+        single_rate = count / single_elapsed if single_elapsed else 0
+        batch_rate = count / batch_elapsed if batch_elapsed else 0
+
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(self.style.SUCCESS('VEHICLE INGESTION BENCHMARK'))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(f'Vehicles per endpoint: {count} (batch size {batch_size})')
+        self.stdout.write(f'Rows stored: {stored}')
+        self.stdout.write(f'  • add-vehicle:  {single_elapsed:.2f}s ({single_rate:,.0f} vehicles/sec)')
+        self.stdout.write(f'  • add-vehicles: {batch_elapsed:.2f}s ({batch_rate:,.0f} vehicles/sec)')
+        if single_rate:
+            self.stdout.write(self.style.SUCCESS(f'Speedup: {batch_rate / single_rate:.1f}x'))
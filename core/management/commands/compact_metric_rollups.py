@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.metric_rollups import compact
+
+class Command(BaseCommand):
+    help = 'Rebuild minute and hour metric rollups from the Metric table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            help='Only the last N hours (default: all metrics)'
+        )
+        parser.add_argument(
+            '--simulation',
+            type=int,
+            action='append',
+            dest='simulations',
+            help='Only this simulation id (repeatable)'
+        )
+
+    def handle(self, *args, **kwargs):
+        hours = kwargs['hours']
+        start = timezone.now() - timedelta(hours=hours) if hours else None
+
+        written = compact(start=start, simulation_ids=kwargs['simulations'])
+
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(self.style.SUCCESS('METRIC ROLLUP COMPACTION'))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(f'Window: {"last " + str(hours) + " hours" if hours else "all metrics"}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Rollup buckets written: {written}'))
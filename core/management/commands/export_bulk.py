@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from core.bulk_export import export_archive, member_name, select_simulations
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Export the CSVs of many simulations into one ZIP archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', type=int, help='Only simulations of this scenario id')
+        parser.add_argument('--algorithm', help='Only simulations of this algorithm')
+        parser.add_argument('--start', type=_date, help='Created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=_date, help='Created on or before this date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--vehicles',
+            action='store_true',
+            help='Include the full trajectory history in every CSV'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Simulations generated in parallel (default: BULK_EXPORT_WORKERS)'
+        )
+        parser.add_argument('--output', default='simulations.zip', help='Archive to write')
+
+    def handle(self, *args, **kwargs):
+        simulations = select_simulations(kwargs['scenario'], kwargs['algorithm'], kwargs['start'], kwargs['end'])
+
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(self.style.SUCCESS('BULK SIMULATION EXPORT'))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+
+        written = 0
+        with open(kwargs['output'], 'wb') as fh:
+            for chunk in export_archive(simulations, vehicles=kwargs['vehicles'], max_workers=kwargs['workers']):
+                fh.write(chunk)
+                written += len(chunk)
+
+        count = simulations.count()
+        if not count:
+            self.stdout.write(self.style.WARNING('⚠️ No simulations with results matched; the archive is empty'))
+        for simulation in simulations.only('id', 'name', 'algorithm')[:10]:
+            self.stdout.write(f'  {member_name(simulation)}')
+        if count > 10:
+            self.stdout.write(f'  ... and {count - 10} more')
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} simulations, {written} bytes written to {kwargs["output"]}'))
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from core.columnar_export import write_directory, write_npz
+from core.models import Simulation
+
+class Command(BaseCommand):
+    help = 'Export a simulation as typed columnar arrays (.npy directory or compressed .npz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('simulation_id', type=int)
+        parser.add_argument(
+            '--output',
+            help='Target directory, or .npz file with --npz (default: simulation_<id>[.npz])'
+        )
+        parser.add_argument(
+            '--npz',
+            action='store_true',
+            help='Write one compressed .npz instead of a memory-mappable directory'
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            simulation = Simulation.objects.get(id=kwargs['simulation_id'])
+        except Simulation.DoesNotExist:
+            raise CommandError(f'Simulation {kwargs["simulation_id"]} does not exist')
+
+        npz = kwargs['npz']
+        output = Path(kwargs['output'] or f'simulation_{simulation.id}{".npz" if npz else ""}')
+
+        if npz:
+            with open(output, 'wb') as fh:
+                manifest = write_npz(simulation, fh)
+        else:
+            manifest = write_directory(simulation, output)
+
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(self.style.SUCCESS(f'COLUMNAR EXPORT: {simulation.name}'))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        for name, info in manifest['arrays'].items():
+            self.stdout.write(f'  {name}: {info["dtype"]} x {info["shape"][0]}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Written to {output}'))
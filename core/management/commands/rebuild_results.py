@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.result_totals import rebuild, refresh_all_results
+
+class Command(BaseCommand):
+    help = 'Recompute metric running totals from the Metric table and refresh Results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simulation',
+            type=int,
+            action='append',
+            dest='simulations',
+            help='Only this simulation id (repeatable)'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report totals that differ from the metrics; exit non-zero on drift'
+        )
+
+    def handle(self, *args, **kwargs):
+        simulation_ids = kwargs['simulations']
+        check = kwargs['check']
+
+        checked, drifted = rebuild(simulation_ids, fix=not check)
+
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(self.style.SUCCESS('RESULT TOTALS ' + ('CHECK' if check else 'REBUILD')))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(f'Simulations checked: {checked}')
+
+        for simulation_id, metric_type, stored, expected in drifted:
+            self.stdout.write(
+                f'  ⚠️  Simulation {simulation_id} {metric_type}: '
+                f'stored count={stored["count"]} sum={stored["sum"]}, '
+                f'metrics count={expected["count"]} sum={expected["sum"]}'
+            )
+
+        if check:
+            if drifted:
+                raise CommandError(f'{len(drifted)} running totals differ from the metrics')
+            self.stdout.write(self.style.SUCCESS('✅ Running totals match the metrics'))
+            return
+
+        refreshed = refresh_all_results(simulation_ids)
+        self.stdout.write(f'  🔧 Totals rewritten: {len(drifted)}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Results refreshed: {refreshed}'))
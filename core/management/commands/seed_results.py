@@ -1,6 +1,8 @@
 # core/management/commands/seed_results.py
 from django.core.management.base import BaseCommand
 from core.models import Scenario, Simulation, Result, Metric, Vehicle
+from core.baselines import get_baseline_simulation
+from core.ingest import store_metrics
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Avg, Sum, Count
@@ -41,11 +43,7 @@ class Command(BaseCommand):
                 continue
             
             # Get or create baseline simulation for this scenario
-            baseline_simulation = Simulation.objects.filter(
-                scenario=simulation.scenario,
-                algorithm='baseline',
-                status='completed'
-            ).first()
+            baseline_simulation = get_baseline_simulation(simulation.scenario_id)
             
             # Generate realistic baseline values
             if baseline_simulation:
@@ -139,6 +137,8 @@ class Command(BaseCommand):
                 ('intersections', 'nodes', params.get('intersections', 20)),
             ]
             
+            # Inserted in bulk; store_metrics keeps totals and rollups current
+            metrics = []
             for metric_type, unit, base_value in metric_types:
                 # Create multiple metric records over time
                 for i in range(10):  # Create 10 metric records per type
@@ -156,14 +156,14 @@ class Command(BaseCommand):
                     else:
                         timestamp = timezone.now()
                     
-                    Metric.objects.create(
+                    metrics.append(Metric(
                         simulation=simulation,
                         metric_type=metric_type,
                         value=variation,
                         unit=unit,
                         timestamp=timestamp,
-                    )
-                    metrics_created += 1
+                    ))
+            metrics_created += len(store_metrics(simulation, metrics))
             
             self.stdout.write(f'     → Added metrics: {len(metric_types)} types, 10 records each')
         
@@ -176,7 +176,7 @@ class Command(BaseCommand):
         user = User.objects.filter(username='system_user').first()
         
         for scenario in all_scenarios:
-            if not Simulation.objects.filter(scenario=scenario, algorithm='baseline', status='completed').exists():
+            if get_baseline_simulation(scenario.id) is None:
                 # Parse scenario parameters
                 try:
                     if isinstance(scenario.parameters, str):
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from core.models import Scenario, Simulation, Vehicle
+from core.ingest import upsert_vehicle_states
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db import models  # Add this import
@@ -119,6 +120,7 @@ class Command(BaseCommand):
             
             # Get number of vehicles from scenario parameters
             num_vehicles = random.randint(100, 500)
+            latest_states = []
             
             for i in range(num_vehicles):
                 # Generate realistic vehicle data
@@ -137,7 +139,7 @@ class Command(BaseCommand):
                 lat = nairobi_coords[0] + random.uniform(-0.05, 0.05)
                 lng = nairobi_coords[1] + random.uniform(-0.05, 0.05)
                 
-                Vehicle.objects.create(
+                vehicle = Vehicle.objects.create(
                     simulation=simulation,
                     vehicle_id=vehicle_id,
                     vehicle_type=vehicle_type,
@@ -147,8 +149,19 @@ class Command(BaseCommand):
                     heading=random.uniform(0, 360),
                     timestamp=timezone.now() - timedelta(minutes=random.randint(1, 60))
                 )
+                latest_states.append({
+                    'vehicle_id': vehicle.vehicle_id,
+                    'vehicle_type': vehicle.vehicle_type,
+                    'lat': vehicle.lat,
+                    'lng': vehicle.lng,
+                    'speed': vehicle.speed,
+                    'heading': vehicle.heading,
+                })
                 vehicle_count += 1
             
+            # Keep the latest-state table in step with the history
+            upsert_vehicle_states(simulation, latest_states)
+            
             self.stdout.write(f'  Added {num_vehicles} vehicles to {simulation.name}')
         
         # ==============================================
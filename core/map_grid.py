@@ -0,0 +1,220 @@
+"""
+Zoom-dependent grid aggregation of live vehicle positions.
+
+Vehicles are bucketed into Web Mercator quadkey cells ``CELL_LEVEL_OFFSET``
+levels below the map zoom, so a 256px map tile is split into 8x8 cells of
+32px. Aggregation is done with NumPy over the VehicleState rows inside the
+requested area.
+
+Results are cached per map tile: a tile holds the aggregated cells (and raw
+points at high zoom) for one (simulation, zoom, tile x, tile y). A request
+is answered from the tiles covering its bounding box, so panning only
+computes the tiles that newly came into view. Cache keys embed a version
+of the simulation's vehicle states. Ingestion bumps that version on every
+write, so during live ingest tiles move to a new version at most once per
+``MAP_GRID_REFRESH_SECONDS``: until then the tiles of the version in use
+are served, up to that many seconds behind.
+"""
+import math
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from . import cache_versions
+from .models import VehicleState
+
+CACHE_PREFIX = 'map_grid'
+VERSION_NAMESPACE = 'vehicle_states'
+
+# Cells are this many quadkey levels below the tile level (2**3 = 8x8 cells per tile)
+CELL_LEVEL_OFFSET = 3
+MIN_ZOOM = 0
+MAX_ZOOM = 20
+# Raw vehicle points are returned only from this zoom level up
+RAW_POINTS_MIN_ZOOM = 16
+# Refuse bounding boxes covering more tiles than a large screen would show
+MAX_TILES_PER_REQUEST = 64
+
+MAX_LATITUDE = 85.05112878
+
+
+def cache_timeout():
+    return getattr(settings, 'MAP_GRID_CACHE_TIMEOUT', 300)
+
+
+def refresh_interval():
+    return getattr(settings, 'MAP_GRID_REFRESH_SECONDS', 5)
+
+
+def tile_version(simulation_id):
+    """
+    Vehicle-state version tiles are keyed by: the current one, unless the
+    version in use was adopted less than ``refresh_interval()`` ago.
+    """
+    version = cache_versions.get(VERSION_NAMESPACE, simulation_id)
+    key = f'{CACHE_PREFIX}:version:{simulation_id}'
+    now = time.time()
+    in_use = cache.get(key)
+    if in_use is None or (in_use[0] != version and now - in_use[1] >= refresh_interval()):
+        in_use = (version, now)
+        cache.set(key, in_use, timeout=cache_timeout())
+    return in_use[0]
+
+
+def tile_xy(lat, lng, level):
+    """Vectorized Web Mercator tile coordinates at ``level``"""
+    n = 1 << level
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = np.floor((np.asarray(lng) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x, y, level):
+    """(south, west, north, east) of a tile"""
+    n = 1 << level
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def quadkey(x, y, level):
+    digits = []
+    for i in range(level, 0, -1):
+        mask = 1 << (i - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def _tile_key(simulation_id, version, zoom, x, y):
+    return f'{CACHE_PREFIX}:{simulation_id}:{version}:{zoom}:{x}:{y}'
+
+
+def _aggregate_tiles(simulation_id, zoom, tiles):
+    """Compute cells (and points) for ``tiles``; returns {(x, y): tile data}"""
+    # One query for the lat/lng box spanning every missing tile
+    bounds = [tile_bounds(x, y, zoom) for x, y in tiles]
+    south = min(b[0] for b in bounds)
+    west = min(b[1] for b in bounds)
+    north = max(b[2] for b in bounds)
+    east = max(b[3] for b in bounds)
+
+    raw = zoom >= RAW_POINTS_MIN_ZOOM
+    fields = ['lat', 'lng', 'speed']
+    if raw:
+        fields += ['vehicle_id', 'vehicle_type', 'heading']
+    rows = list(VehicleState.objects.filter(
+        simulation_id=simulation_id,
+        lat__gte=south, lat__lte=north,
+        lng__gte=west, lng__lte=east,
+    ).values_list(*fields))
+
+    result = {tile: {'cells': [], 'points': [] if raw else None} for tile in tiles}
+    if not rows:
+        return result
+
+    columns = list(zip(*rows))
+    lat = np.asarray(columns[0], dtype=np.float64)
+    lng = np.asarray(columns[1], dtype=np.float64)
+    speed = np.asarray(columns[2], dtype=np.float64)
+
+    cell_level = zoom + CELL_LEVEL_OFFSET
+    cell_x, cell_y = tile_xy(lat, lng, cell_level)
+    tile_x, tile_y = cell_x >> CELL_LEVEL_OFFSET, cell_y >> CELL_LEVEL_OFFSET
+
+    # Keep only vehicles inside the requested tiles (the query box is wider)
+    wanted = np.zeros(lat.shape, dtype=bool)
+    for x, y in tiles:
+        wanted |= (tile_x == x) & (tile_y == y)
+    if not wanted.any():
+        return result
+
+    n_cells = np.int64(1) << cell_level
+    cell_ids, inverse = np.unique(cell_x[wanted] * n_cells + cell_y[wanted], return_inverse=True)
+    counts = np.bincount(inverse)
+    mean_speed = np.bincount(inverse, weights=speed[wanted]) / counts
+    mean_lat = np.bincount(inverse, weights=lat[wanted]) / counts
+    mean_lng = np.bincount(inverse, weights=lng[wanted]) / counts
+
+    for cell_id, count, cell_speed, cell_lat, cell_lng in zip(
+        cell_ids.tolist(), counts.tolist(), mean_speed.tolist(), mean_lat.tolist(), mean_lng.tolist()
+    ):
+        cx, cy = divmod(cell_id, int(n_cells))
+        tile = (cx >> CELL_LEVEL_OFFSET, cy >> CELL_LEVEL_OFFSET)
+        result[tile]['cells'].append({
+            'cell': quadkey(cx, cy, cell_level),
+            'lat': cell_lat,
+            'lng': cell_lng,
+            'count': count,
+            'avg_speed': cell_speed,
+        })
+
+    if raw:
+        for i in np.flatnonzero(wanted).tolist():
+            tile = (int(tile_x[i]), int(tile_y[i]))
+            result[tile]['points'].append({
+                'vehicle_id': columns[3][i],
+                'vehicle_type': columns[4][i],
+                'lat': columns[0][i],
+                'lng': columns[1][i],
+                'speed': columns[2][i],
+                'heading': columns[5][i],
+            })
+    return result
+
+
+def grid_for_bbox(simulation, zoom, south, west, north, east):
+    """
+    Aggregated cells covering a bounding box at ``zoom``, with congestion
+    classes from the simulation's scenario thresholds.
+
+    Raises ValueError for an out-of-range zoom or a non-finite or oversized box.
+    """
+    if not MIN_ZOOM <= zoom <= MAX_ZOOM:
+        raise ValueError(f'zoom must be between {MIN_ZOOM} and {MAX_ZOOM}')
+    if not all(math.isfinite(value) for value in (south, west, north, east)):
+        raise ValueError('bbox must be finite numbers')
+    if south > north or west > east:
+        raise ValueError('bbox must be west,south,east,north')
+
+    (x0, x1), (y1, y0) = (
+        tuple(int(v) for v in values)
+        for values in tile_xy(np.array([south, north]), np.array([west, east]), zoom)
+    )
+    tiles = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+    if len(tiles) > MAX_TILES_PER_REQUEST:
+        raise ValueError('Bounding box too large for this zoom level')
+
+    version = tile_version(simulation.id)
+    keys = {tile: _tile_key(simulation.id, version, zoom, *tile) for tile in tiles}
+    cached = cache.get_many(keys.values())
+
+    data = {tile: cached[key] for tile, key in keys.items() if key in cached}
+    missing = [tile for tile in tiles if tile not in data]
+    if missing:
+        computed = _aggregate_tiles(simulation.id, zoom, missing)
+        cache.set_many({keys[tile]: computed[tile] for tile in missing}, timeout=cache_timeout())
+        data.update(computed)
+
+    # Classified per request so threshold edits apply without invalidating tiles
+    scenario = simulation.scenario
+    thresholds = scenario.congestion_thresholds()
+    cells = [
+        {**cell, 'congestion': scenario.congestion_level(cell['avg_speed'], thresholds)}
+        for tile in tiles for cell in data[tile]['cells']
+    ]
+    response = {
+        'zoom': zoom,
+        'cell_level': zoom + CELL_LEVEL_OFFSET,
+        'tiles': len(tiles),
+        'computed_tiles': len(missing),
+        'total_vehicles': sum(cell['count'] for cell in cells),
+        'cells': cells,
+    }
+    if zoom >= RAW_POINTS_MIN_ZOOM:
+        response['points'] = [point for tile in tiles for point in data[tile]['points']]
+    return response
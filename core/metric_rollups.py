@@ -0,0 +1,153 @@
+"""
+Metric rollups at one-minute and one-hour resolution.
+
+Each new Metric adds to the count/sum/min/max of its minute and hour
+buckets in MetricRollup (per simulation and metric type), so time-bucketed
+charts read a few rows per bucket instead of every raw metric. Buckets
+start on UTC minute/hour boundaries.
+
+Edited and deleted metrics are reconciled by ``compact_hours()``, which
+rebuilds only the hours they fell in, once per transaction. Writes that
+skip the signals entirely (raw SQL) are reconciled by ``compact()``, which
+rebuilds the rollups of a time range from the Metric table (see the
+``compact_metric_rollups`` command).
+"""
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Greatest, Least, TruncHour, TruncMinute
+
+from .models import Metric, MetricRollup
+
+RESOLUTIONS = {
+    'minute': (TruncMinute, timedelta(minutes=1)),
+    'hour': (TruncHour, timedelta(hours=1)),
+}
+
+
+def floor_bucket(timestamp, resolution):
+    """Start of the UTC minute or hour holding ``timestamp``"""
+    timestamp = timestamp.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+    return timestamp.replace(minute=0) if resolution == 'hour' else timestamp
+
+
+def ceil_bucket(timestamp, resolution):
+    floor = floor_bucket(timestamp, resolution)
+    return floor if floor == timestamp else floor + RESOLUTIONS[resolution][1]
+
+
+def _add(key, count, total, low, high):
+    simulation_id, metric_type, resolution, bucket = key
+    rollups = MetricRollup.objects.filter(
+        simulation_id=simulation_id, metric_type=metric_type, resolution=resolution, bucket=bucket
+    )
+    if rollups.update(count=F('count') + count, sum=F('sum') + total,
+                      min=Least('min', low), max=Greatest('max', high)):
+        return
+    try:
+        with transaction.atomic():
+            MetricRollup.objects.create(
+                simulation_id=simulation_id, metric_type=metric_type, resolution=resolution, bucket=bucket,
+                count=count, sum=total, min=low, max=high,
+            )
+    except IntegrityError:
+        # Another writer created the bucket first
+        _add(key, count, total, low, high)
+
+
+def record(simulation_id, metrics):
+    """Add ``(metric_type, value, timestamp)`` triples to their minute and hour buckets"""
+    grouped = defaultdict(list)
+    for metric_type, value, timestamp in metrics:
+        for resolution in RESOLUTIONS:
+            grouped[simulation_id, metric_type, resolution, floor_bucket(timestamp, resolution)].append(value)
+    with transaction.atomic():
+        for key, values in grouped.items():
+            _add(key, len(values), sum(values), min(values), max(values))
+
+
+def compact(start=None, end=None, simulation_ids=None):
+    """
+    Rebuild rollups from the Metric table for buckets in [start, end)
+    (widened to whole hours). Returns the number of buckets written.
+    """
+    metrics = Metric.objects.all()
+    rollups = MetricRollup.objects.all()
+    if start is not None:
+        start = floor_bucket(start, 'hour')
+        metrics = metrics.filter(timestamp__gte=start)
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        end = ceil_bucket(end, 'hour')
+        metrics = metrics.filter(timestamp__lt=end)
+        rollups = rollups.filter(bucket__lt=end)
+    if simulation_ids is not None:
+        metrics = metrics.filter(simulation_id__in=simulation_ids)
+        rollups = rollups.filter(simulation_id__in=simulation_ids)
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        for resolution, (trunc, _) in RESOLUTIONS.items():
+            rows = metrics.annotate(bucket=trunc('timestamp', tzinfo=dt_timezone.utc)).values(
+                'simulation_id', 'metric_type', 'bucket'
+            ).annotate(
+                count=Count('id'), sum=Sum('value'), min=Min('value'), max=Max('value')
+            ).order_by()
+            created = MetricRollup.objects.bulk_create(
+                (MetricRollup(resolution=resolution, **row) for row in rows.iterator(chunk_size=2000)),
+                batch_size=500,
+            )
+            written += len(created)
+    return written
+
+
+def compact_hours(keys):
+    """Rebuild the hour buckets, and the minutes in them, holding ``(simulation_id, timestamp)`` pairs"""
+    simulations = defaultdict(set)
+    for simulation_id, timestamp in keys:
+        simulations[floor_bucket(timestamp, 'hour')].add(simulation_id)
+    written = 0
+    for hour, simulation_ids in sorted(simulations.items()):
+        written += compact(hour, hour + RESOLUTIONS['hour'][1], simulation_ids)
+    return written
+
+
+def bucketed(metric_type, start, resolution='hour', simulation_ids=None):
+    """
+    [{'bucket', 'count', 'sum', 'min', 'max', 'avg'}] for ``metric_type``
+    across simulations from ``start`` on, oldest bucket first.
+
+    Whole buckets come from the rollup at ``resolution``; the partial first
+    bucket is filled in from the minute rollup, so the window starts at
+    ``start``'s minute rather than at the bucket boundary.
+    """
+    def read(resolution, since, until=None):
+        rows = MetricRollup.objects.filter(resolution=resolution, metric_type=metric_type, bucket__gte=since)
+        if until is not None:
+            rows = rows.filter(bucket__lt=until)
+        if simulation_ids is not None:
+            rows = rows.filter(simulation_id__in=simulation_ids)
+        return rows.values('bucket').annotate(
+            count=Sum('count'), sum=Sum('sum'), min=Min('min'), max=Max('max')
+        ).order_by('bucket')
+
+    first_whole = ceil_bucket(start, resolution)
+    buckets = list(read(resolution, first_whole))
+
+    if resolution != 'minute' and first_whole != floor_bucket(start, 'minute'):
+        head = list(read('minute', floor_bucket(start, 'minute'), first_whole))
+        if head:
+            buckets.insert(0, {
+                'bucket': floor_bucket(start, resolution),
+                'count': sum(row['count'] for row in head),
+                'sum': sum(row['sum'] for row in head),
+                'min': min(row['min'] for row in head),
+                'max': max(row['max'] for row in head),
+            })
+
+    for row in buckets:
+        row['avg'] = row['sum'] / row['count'] if row['count'] else None
+    return buckets
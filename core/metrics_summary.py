@@ -0,0 +1,72 @@
+"""
+Metric summaries for one or more simulations in a single query.
+
+``summarize()`` groups Metric rows by (simulation, metric_type) and returns
+avg/sum/min/max/count for each group, so the number of queries does not
+depend on how many simulations or metric types are involved.
+"""
+from django.db.models import Avg, Count, Max, Min, Sum
+
+from .models import Metric
+
+STATS = ('avg', 'sum', 'min', 'max', 'count')
+
+# Which statistic of each metric type feeds the Result KPIs
+RESULT_KPIS = (
+    # (metric type, statistic, Result field, baseline field, improvement field)
+    ('travel_time', 'avg', 'avg_travel_time', 'baseline_avg_travel_time', 'improvement_travel_time'),
+    ('delay', 'sum', 'total_delay', 'baseline_total_delay', 'delay_reduction'),
+    ('fuel', 'sum', 'fuel_consumed', 'baseline_fuel_consumed', 'fuel_saving'),
+    ('emissions', 'sum', 'co2_emissions', 'baseline_co2_emissions', 'emissions_reduction'),
+)
+
+# Baseline assumed when a scenario has no completed baseline run
+FALLBACK_BASELINE_FACTOR = 1.4
+
+EMPTY = {'avg': None, 'sum': None, 'min': None, 'max': None, 'count': 0}
+
+
+def summarize(simulation_ids, metric_types=None):
+    """{simulation_id: {metric_type: {avg, sum, min, max, count}}}"""
+    simulation_ids = list(simulation_ids)
+    summaries = {simulation_id: {} for simulation_id in simulation_ids}
+    if not simulation_ids:
+        return summaries
+
+    metrics = Metric.objects.filter(simulation_id__in=simulation_ids)
+    if metric_types is not None:
+        metrics = metrics.filter(metric_type__in=metric_types)
+
+    rows = metrics.values('simulation_id', 'metric_type').annotate(
+        avg=Avg('value'), sum=Sum('value'), min=Min('value'), max=Max('value'), count=Count('id')
+    ).order_by()
+    for row in rows:
+        summaries[row['simulation_id']][row['metric_type']] = {stat: row[stat] for stat in STATS}
+    return summaries
+
+
+def stat(summary, metric_type, name, default=None):
+    """One statistic from a single simulation's summary"""
+    value = summary.get(metric_type, EMPTY)[name]
+    return default if value is None else value
+
+
+def improvement(baseline, value):
+    """Percentage reduction from ``baseline`` to ``value``"""
+    return (baseline - value) / baseline * 100 if baseline > 0 else 0
+
+
+def result_kpis(summary, baseline_summary=None):
+    """Result field values from a simulation's summary and its baseline's"""
+    fields = {}
+    for metric_type, name, field, baseline_field, improvement_field in RESULT_KPIS:
+        value = stat(summary, metric_type, name, 0)
+        baseline = None
+        if baseline_summary is not None:
+            baseline = stat(baseline_summary, metric_type, name)
+        if baseline is None:
+            baseline = value * FALLBACK_BASELINE_FACTOR
+        fields[field] = value
+        fields[baseline_field] = baseline
+        fields[improvement_field] = improvement(baseline, value)
+    return fields
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_vehicle_states(apps, schema_editor):
+    """Seed the latest-state table from the newest history row per vehicle"""
+    Vehicle = apps.get_model('core', 'Vehicle')
+    VehicleState = apps.get_model('core', 'VehicleState')
+
+    states = []
+    last_key = None
+    history = Vehicle.objects.order_by('simulation_id', 'vehicle_id', '-timestamp', '-id')
+    for vehicle in history.iterator(chunk_size=2000):
+        key = (vehicle.simulation_id, vehicle.vehicle_id)
+        if key == last_key:
+            continue
+        last_key = key
+        states.append(VehicleState(
+            simulation_id=vehicle.simulation_id,
+            vehicle_id=vehicle.vehicle_id,
+            vehicle_type=vehicle.vehicle_type,
+            lat=vehicle.lat,
+            lng=vehicle.lng,
+            speed=vehicle.speed,
+            heading=vehicle.heading,
+            updated_at=vehicle.timestamp,
+        ))
+        if len(states) >= 2000:
+            VehicleState.objects.bulk_create(states)
+            states = []
+    VehicleState.objects.bulk_create(states)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_scenario_parameters_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehicle_id', models.CharField(max_length=50)),
+                ('vehicle_type', models.CharField(choices=[('car', 'Car'), ('bus', 'Bus'), ('truck', 'Truck'), ('motorcycle', 'Motorcycle')], max_length=20)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('speed', models.FloatField(default=0.0)),
+                ('heading', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('simulation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vehicle_states', to='core.simulation')),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'constraints': [models.UniqueConstraint(fields=('simulation', 'vehicle_id'), name='unique_vehicle_state')],
+            },
+        ),
+        migrations.RunPython(backfill_vehicle_states, migrations.RunPython.noop),
+    ]
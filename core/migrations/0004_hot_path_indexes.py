@@ -0,0 +1,83 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_vehiclestate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='metric',
+            name='simulation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='core.simulation'),
+        ),
+        migrations.AlterField(
+            model_name='simulationlog',
+            name='simulation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='logs', to='core.simulation'),
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='simulation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='vehicles', to='core.simulation'),
+        ),
+        migrations.AddIndex(
+            model_name='metric',
+            index=models.Index(fields=['simulation', 'metric_type', '-timestamp'], name='metric_sim_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metric',
+            index=models.Index(fields=['metric_type', 'timestamp'], name='metric_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['-created_at'], name='result_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['-improvement_travel_time'], name='result_improvement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scenario',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='scenario_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['status', '-created_at'], name='simulation_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['-created_at'], name='simulation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['scenario', 'algorithm', 'status'], name='simulation_baseline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulationlog',
+            index=models.Index(fields=['simulation', '-timestamp'], name='log_sim_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['simulation', '-timestamp'], name='vehicle_sim_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['-timestamp'], name='vehicle_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclestate',
+            index=models.Index(fields=['simulation', '-updated_at'], name='vehiclestate_sim_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclestate',
+            index=models.Index(fields=['-updated_at'], name='vehiclestate_updated_idx'),
+        ),
+    ]
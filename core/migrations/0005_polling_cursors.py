@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vehiclestate',
+            name='vehiclestate_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='simulation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['updated_at'], name='simulation_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclestate',
+            index=models.Index(fields=['updated_at'], name='vehiclestate_updated_idx'),
+        ),
+    ]
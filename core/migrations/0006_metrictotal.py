@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def backfill_metric_totals(apps, schema_editor):
+    """Seed running totals from the existing metrics (one grouped query)"""
+    Metric = apps.get_model('core', 'Metric')
+    MetricTotal = apps.get_model('core', 'MetricTotal')
+
+    rows = Metric.objects.values('simulation_id', 'metric_type').annotate(
+        count=Count('id'), sum=Sum('value'), min=Min('value'), max=Max('value')
+    ).order_by()
+    MetricTotal.objects.bulk_create(
+        [MetricTotal(**row) for row in rows.iterator(chunk_size=2000)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_polling_cursors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_type', models.CharField(choices=[('travel_time', 'Average Travel Time'), ('delay', 'Total Delay'), ('fuel', 'Fuel Consumption'), ('emissions', 'CO2 Emissions'), ('speed', 'Average Speed'), ('congestion', 'Congestion Level')], max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('sum', models.FloatField(default=0.0)),
+                ('min', models.FloatField(blank=True, null=True)),
+                ('max', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('simulation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_totals', to='core.simulation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('simulation', 'metric_type'), name='unique_metric_total')],
+            },
+        ),
+        migrations.RunPython(backfill_metric_totals, migrations.RunPython.noop),
+    ]
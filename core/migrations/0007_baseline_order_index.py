@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_metrictotal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='simulation',
+            name='simulation_baseline_idx',
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['scenario', 'algorithm', 'status', 'completed_at'], name='simulation_baseline_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_baseline_order_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['scenario', 'status', 'completed_at'], name='simulation_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_comparison_matrix_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='result',
+            name='result_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='simulation',
+            name='simulation_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['created_at'], name='result_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['created_at'], name='simulation_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:24
+
+from django.db import migrations
+
+from core.curve_store import CURVES, CurveStore
+
+
+def copy_curves_to_store(apps, schema_editor):
+    """Write the JSON curves to the binary store, one file per curve"""
+    Result = apps.get_model('core', 'Result')
+    rows = Result.objects.values_list('simulation_id', *CURVES)
+    for simulation_id, *curves in rows.iterator(chunk_size=500):
+        store = CurveStore(simulation_id)
+        for curve, values in zip(CURVES, curves):
+            if values:
+                store.write(curve, values)
+
+
+def copy_curves_to_fields(apps, schema_editor):
+    Result = apps.get_model('core', 'Result')
+    for result in Result.objects.iterator(chunk_size=500):
+        store = CurveStore(result.simulation_id)
+        for curve in CURVES:
+            setattr(result, curve, store.read(curve).tolist())
+        result.save(update_fields=list(CURVES))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_keyset_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_curves_to_store, copy_curves_to_fields),
+        migrations.RemoveField(
+            model_name='result',
+            name='training_accuracy',
+        ),
+        migrations.RemoveField(
+            model_name='result',
+            name='training_loss',
+        ),
+        migrations.RemoveField(
+            model_name='result',
+            name='validation_accuracy',
+        ),
+        migrations.RemoveField(
+            model_name='result',
+            name='validation_loss',
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:26
+
+import django.db.models.deletion
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncHour, TruncMinute
+
+
+def backfill_metric_rollups(apps, schema_editor):
+    """Seed minute and hour rollups from the existing metrics"""
+    Metric = apps.get_model('core', 'Metric')
+    MetricRollup = apps.get_model('core', 'MetricRollup')
+
+    for resolution, trunc in (('minute', TruncMinute), ('hour', TruncHour)):
+        rows = Metric.objects.annotate(bucket=trunc('timestamp', tzinfo=timezone.utc)).values(
+            'simulation_id', 'metric_type', 'bucket'
+        ).annotate(
+            count=Count('id'), sum=Sum('value'), min=Min('value'), max=Max('value')
+        ).order_by()
+        MetricRollup.objects.bulk_create(
+            (MetricRollup(resolution=resolution, **row) for row in rows.iterator(chunk_size=2000)),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_training_curve_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_type', models.CharField(choices=[('travel_time', 'Average Travel Time'), ('delay', 'Total Delay'), ('fuel', 'Fuel Consumption'), ('emissions', 'CO2 Emissions'), ('speed', 'Average Speed'), ('congestion', 'Congestion Level')], max_length=50)),
+                ('resolution', models.CharField(choices=[('minute', '1 minute'), ('hour', '1 hour')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='Start of the minute or hour (UTC)')),
+                ('count', models.IntegerField(default=0)),
+                ('sum', models.FloatField(default=0.0)),
+                ('min', models.FloatField(blank=True, null=True)),
+                ('max', models.FloatField(blank=True, null=True)),
+                ('simulation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_rollups', to='core.simulation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'metric_type', 'bucket'], name='rollup_type_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('simulation', 'metric_type', 'resolution', 'bucket'), name='unique_metric_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_metric_rollups, migrations.RunPython.noop),
+    ]
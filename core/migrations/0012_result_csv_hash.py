@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='csv_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of csv_data; empty when it needs rebuilding', max_length=64),
+        ),
+    ]
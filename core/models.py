@@ -1,8 +1,13 @@
+from datetime import timezone as dt_timezone
+
 from django.db import models
+from django.db.models.functions import TruncHour
 from django.contrib.auth.models import User
+from django.dispatch import Signal
 import json
 from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from .curve_store import CurveStore
 
 class Scenario(models.Model):
     """Traffic simulation scenarios"""
@@ -27,9 +32,51 @@ class Scenario(models.Model):
         help_text = 'Enter valid JSON format'
         )
 
+    class Meta:
+        indexes = [
+            # Scenario lists and dropdowns: filter(is_active=True).order_by('-created_at').
+            # Partial, because the boolean filter compiles to a bare column test.
+            models.Index(
+                fields=['-created_at'],
+                name='scenario_active_created_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
+
+    # Mean speeds (km/h) below which traffic counts as HIGH / MEDIUM congestion.
+    # Override per scenario with {"congestion_thresholds": {"high": .., "medium": ..}}
+    DEFAULT_CONGESTION_THRESHOLDS = {'high': 15, 'medium': 30}
+
     def __str__(self):
         return f"{self.name} ({self.get_scenario_type_display()})"
 
+    def get_parameters(self):
+        """Parameters as a dict ({} when the JSON is missing or invalid)"""
+        try:
+            parameters = json.loads(self.parameters or '{}')
+        except ValueError:
+            return {}
+        return parameters if isinstance(parameters, dict) else {}
+
+    def congestion_thresholds(self):
+        thresholds = dict(self.DEFAULT_CONGESTION_THRESHOLDS)
+        configured = self.get_parameters().get('congestion_thresholds')
+        if isinstance(configured, dict):
+            for level in thresholds:
+                value = configured.get(level)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    thresholds[level] = value
+        return thresholds
+
+    def congestion_level(self, avg_speed, thresholds=None):
+        """HIGH / MEDIUM / LOW congestion for a mean speed in km/h"""
+        thresholds = thresholds or self.congestion_thresholds()
+        if avg_speed < thresholds['high']:
+            return 'HIGH'
+        if avg_speed < thresholds['medium']:
+            return 'MEDIUM'
+        return 'LOW'
+
 class Simulation(models.Model):
     """Main simulation runs"""
     STATUS_CHOICES = [
@@ -55,6 +102,8 @@ class Simulation(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Bumped on every save; drives conditional GETs and delta polling
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Training parameters
     # To this:
@@ -71,6 +120,22 @@ class Simulation(models.Model):
     current_loss = models.FloatField(null=True, blank=True)
     current_accuracy = models.FloatField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Active-simulation lists: filter(status=...).order_by('-created_at')
+            models.Index(fields=['status', '-created_at'], name='simulation_status_created_idx'),
+            # Recent-simulation and experiment lists: order_by('-created_at', '-id'),
+            # read backwards along the trailing id
+            models.Index(fields=['created_at'], name='simulation_created_idx'),
+            # Baseline lookup: filter(scenario=..., algorithm='baseline', status='completed')
+            # .order_by('-completed_at', '-id'), read backwards along the trailing id
+            models.Index(fields=['scenario', 'algorithm', 'status', 'completed_at'], name='simulation_baseline_idx'),
+            # Comparison matrix: filter(scenario=..., status='completed').order_by('-completed_at', '-id')
+            models.Index(fields=['scenario', 'status', 'completed_at'], name='simulation_completed_idx'),
+            # Change polling: filter(updated_at__gt=cursor).order_by('updated_at', 'id')
+            models.Index(fields=['updated_at'], name='simulation_updated_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.get_status_display()}"
     
@@ -90,7 +155,8 @@ class Vehicle(models.Model):
         ('motorcycle', 'Motorcycle'),
     ]
     
-    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='vehicles')
+    # Indexed through the composite (simulation, ...) index in Meta
+    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='vehicles', db_index=False)
     vehicle_id = models.CharField(max_length=50)
     vehicle_type = models.CharField(max_length=20, choices=VEHICLE_TYPES)
     lat = models.FloatField()  # Latitude
@@ -101,10 +167,62 @@ class Vehicle(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Per-simulation history and time windows: filter(simulation=..., timestamp__gte=...)
+            models.Index(fields=['simulation', '-timestamp'], name='vehicle_sim_ts_idx'),
+            # Cross-simulation time windows on the dashboard
+            models.Index(fields=['-timestamp'], name='vehicle_ts_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.vehicle_id} ({self.get_vehicle_type_display()})"
+
+class VehicleState(models.Model):
+    """Latest known position of each vehicle, upserted on every ingest"""
+    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='vehicle_states')
+    vehicle_id = models.CharField(max_length=50)
+    vehicle_type = models.CharField(max_length=20, choices=Vehicle.VEHICLE_TYPES)
+    lat = models.FloatField()  # Latitude
+    lng = models.FloatField()  # Longitude
+    speed = models.FloatField(default=0.0)  # km/h
+    heading = models.FloatField(default=0.0)  # degrees
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['simulation', 'vehicle_id'], name='unique_vehicle_state'),
+        ]
+        indexes = [
+            # Live map for one simulation: filter(simulation=...).order_by('-updated_at')
+            models.Index(fields=['simulation', '-updated_at'], name='vehiclestate_sim_updated_idx'),
+            # Recently reported vehicles: filter(updated_at__gte=...) ordered by
+            # ('-updated_at', '-id') or, for deltas, ('updated_at', 'id'). Ascending,
+            # so both directions line up with the implicit trailing id.
+            models.Index(fields=['updated_at'], name='vehiclestate_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.vehicle_id} ({self.get_vehicle_type_display()})"
 
+# Sent after Metric rows are deleted directly, with the affected simulation_ids
+# and ``hours``, the (simulation_id, timestamp) pairs whose hour buckets they
+# fell in. Metric has no pre/post_delete receivers, so a Simulation delete can
+# still fast-delete its metrics; only deletes of the metrics themselves report here.
+metrics_deleted = Signal()
+
+class MetricQuerySet(models.QuerySet):
+    def delete(self):
+        hours = set(self.order_by().annotate(
+            hour=TruncHour('timestamp', tzinfo=dt_timezone.utc)
+        ).values_list('simulation_id', 'hour').distinct())
+        deleted = super().delete()
+        if deleted[0]:
+            metrics_deleted.send(
+                sender=Metric, simulation_ids={simulation_id for simulation_id, _ in hours}, hours=hours
+            )
+        return deleted
+
 class Metric(models.Model):
     """Performance metrics for simulations"""
     METRIC_TYPES = [
@@ -116,7 +234,8 @@ class Metric(models.Model):
         ('congestion', 'Congestion Level'),
     ]
     
-    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='metrics')
+    # Indexed through the composite (simulation, ...) index in Meta
+    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='metrics', db_index=False)
     metric_type = models.CharField(max_length=50, choices=METRIC_TYPES)
     value = models.FloatField()
     unit = models.CharField(max_length=20)
@@ -126,12 +245,84 @@ class Metric(models.Model):
     baseline_value = models.FloatField(null=True, blank=True)
     improvement_percentage = models.FloatField(null=True, blank=True)
     
+    objects = MetricQuerySet.as_manager()
+    
     class Meta:
         ordering = ['metric_type', '-timestamp']
+        indexes = [
+            # Per-simulation metrics in default order, and per-type lookups
+            # such as filter(simulation=..., metric_type=...).order_by('-timestamp')
+            models.Index(fields=['simulation', 'metric_type', '-timestamp'], name='metric_sim_type_ts_idx'),
+            # Cross-simulation time series: filter(metric_type=..., timestamp__gte=...)
+            models.Index(fields=['metric_type', 'timestamp'], name='metric_type_ts_idx'),
+        ]
+    
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        metrics_deleted.send(
+            sender=Metric, simulation_ids={self.simulation_id}, hours={(self.simulation_id, self.timestamp)}
+        )
+        return deleted
     
     def __str__(self):
         return f"{self.get_metric_type_display()}: {self.value} {self.unit}"
 
+class MetricTotal(models.Model):
+    """Running totals of one metric type for a simulation, kept up to date on ingest"""
+    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='metric_totals')
+    metric_type = models.CharField(max_length=50, choices=Metric.METRIC_TYPES)
+    count = models.IntegerField(default=0)
+    sum = models.FloatField(default=0.0)
+    min = models.FloatField(null=True, blank=True)
+    max = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['simulation', 'metric_type'], name='unique_metric_total'),
+        ]
+    
+    def __str__(self):
+        return f"{self.simulation_id} {self.metric_type}: {self.count} samples"
+    
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else None
+
+class MetricRollup(models.Model):
+    """count/sum/min/max of one metric type for a simulation over one minute or hour"""
+    RESOLUTIONS = [
+        ('minute', '1 minute'),
+        ('hour', '1 hour'),
+    ]
+    
+    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='metric_rollups')
+    metric_type = models.CharField(max_length=50, choices=Metric.METRIC_TYPES)
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket = models.DateTimeField(help_text="Start of the minute or hour (UTC)")
+    count = models.IntegerField(default=0)
+    sum = models.FloatField(default=0.0)
+    min = models.FloatField(null=True, blank=True)
+    max = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['simulation', 'metric_type', 'resolution', 'bucket'], name='unique_metric_rollup'
+            ),
+        ]
+        indexes = [
+            # Cross-simulation trends: filter(resolution=..., metric_type=..., bucket__gte=...)
+            models.Index(fields=['resolution', 'metric_type', 'bucket'], name='rollup_type_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.simulation_id} {self.metric_type} {self.resolution} {self.bucket:%Y-%m-%d %H:%M}"
+    
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else None
+
 class Result(models.Model):
     """Aggregated results for a simulation"""
     simulation = models.OneToOneField(Simulation, on_delete=models.CASCADE, related_name='result')
@@ -153,19 +344,45 @@ class Result(models.Model):
     baseline_co2_emissions = models.FloatField()
     emissions_reduction = models.FloatField(help_text="Percentage reduction")
     
-    # AI-specific metrics
-    training_loss = models.JSONField(default=list, encoder=DjangoJSONEncoder)
-    training_accuracy = models.JSONField(default=list, encoder=DjangoJSONEncoder)
-    validation_loss = models.JSONField(default=list, encoder=DjangoJSONEncoder)
-    validation_accuracy = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    # AI-specific metrics (training curves) live in core.curve_store; see curves
     
-    # Export data
+    # Export data: the summary CSV is maintained by core.csv_export
     csv_data = models.TextField(blank=True, help_text="CSV formatted data")
+    csv_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of csv_data; empty when it needs rebuilding")
     pdf_report_path = models.CharField(max_length=500, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Results list: order_by('-created_at', '-id'), read backwards along the trailing id
+            models.Index(fields=['created_at'], name='result_created_idx'),
+            # Dashboard key findings: order_by('-improvement_travel_time')[:3]
+            models.Index(fields=['-improvement_travel_time'], name='result_improvement_idx'),
+        ]
+    
+    @property
+    def curves(self):
+        """The simulation's training curves, read on demand"""
+        return CurveStore(self.simulation_id)
+    
+    @property
+    def training_loss(self):
+        return self.curves.read('training_loss').tolist()
+    
+    @property
+    def training_accuracy(self):
+        return self.curves.read('training_accuracy').tolist()
+    
+    @property
+    def validation_loss(self):
+        return self.curves.read('validation_loss').tolist()
+    
+    @property
+    def validation_accuracy(self):
+        return self.curves.read('validation_accuracy').tolist()
+    
     def __str__(self):
         return f"Results for {self.simulation.name}"
 
@@ -178,13 +395,18 @@ class SimulationLog(models.Model):
         ('debug', 'Debug'),
     ]
     
-    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='logs')
+    # Indexed through the composite (simulation, ...) index in Meta
+    simulation = models.ForeignKey(Simulation, on_delete=models.CASCADE, related_name='logs', db_index=False)
     log_level = models.CharField(max_length=20, choices=LOG_LEVELS)
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Latest logs for a simulation: filter(simulation=...).order_by('-timestamp')
+            models.Index(fields=['simulation', '-timestamp'], name='log_sim_ts_idx'),
+        ]
     
     def __str__(self):
         return f"[{self.log_level}] {self.message[:50]}..."
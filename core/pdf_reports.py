@@ -0,0 +1,211 @@
+"""
+PDF reports rendered in the background and kept under MEDIA_ROOT.
+
+A report is named after the Result's ``updated_at`` and the number of
+epochs in each training curve (curves are appended without saving the
+Result), so a stored ``pdf_report_path`` that no longer matches
+``report_name(result)`` means the report's data changed since it was
+rendered. Rendering (matplotlib, imported
+lazily since it is only needed here) runs on a small thread pool so no
+request waits on it; a job already queued for the same version is not
+queued twice. The previous version's file is removed once its replacement
+is in place.
+"""
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .curve_store import CURVES
+from .metrics_summary import RESULT_KPIS
+from .models import Metric, Result
+from .timeseries import get_series
+from .trajectory_store import to_micros
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = 'reports'
+# Points per metric chart; a printed page shows no more
+SERIES_POINTS = 400
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+def workers():
+    return getattr(settings, 'PDF_REPORT_WORKERS', 2)
+
+
+def available():
+    """True when matplotlib is installed"""
+    return importlib.util.find_spec('matplotlib') is not None
+
+
+def report_name(result):
+    """Path relative to MEDIA_ROOT of the report for the Result and curves as they are now"""
+    store = result.curves
+    epochs = '-'.join(str(store.epochs(curve)) for curve in CURVES)
+    return f'{REPORT_DIR}/simulation_{result.simulation_id}_{to_micros(result.updated_at)}_{epochs}.pdf'
+
+
+def report_file(name):
+    return Path(settings.MEDIA_ROOT) / name
+
+
+def cached_report(result):
+    """The stored report's path if it is still current, else None"""
+    if result.pdf_report_path != report_name(result):
+        return None
+    path = report_file(result.pdf_report_path)
+    return path if path.exists() else None
+
+
+def delete_report(result):
+    if result.pdf_report_path:
+        report_file(result.pdf_report_path).unlink(missing_ok=True)
+
+
+def _kpi_page(figure, simulation, result):
+    figure.suptitle(f'{simulation.name}: {simulation.get_algorithm_display()}', fontsize=14)
+    figure.text(0.5, 0.92, f'{simulation.scenario.name} · generated {timezone.localtime():%Y-%m-%d %H:%M}',
+                ha='center', fontsize=9, color='gray')
+
+    table = figure.add_axes([0.08, 0.55, 0.84, 0.3])
+    table.axis('off')
+    rows = [
+        [metric_type.replace('_', ' ').title(),
+         f'{getattr(result, field):.2f}', f'{getattr(result, baseline_field):.2f}',
+         f'{getattr(result, improvement_field):+.1f}%']
+        for metric_type, _, field, baseline_field, improvement_field in RESULT_KPIS
+    ]
+    table.table(cellText=rows, colLabels=['Metric', 'Result', 'Baseline', 'Improvement'],
+                loc='center', cellLoc='center').scale(1, 1.6)
+
+    bars = figure.add_axes([0.12, 0.1, 0.8, 0.35])
+    labels = [row[0] for row in rows]
+    improvements = [getattr(result, kpi[4]) for kpi in RESULT_KPIS]
+    bars.bar(labels, improvements, color=['tab:green' if value >= 0 else 'tab:red' for value in improvements])
+    bars.axhline(0, color='black', linewidth=0.8)
+    bars.set_ylabel('Improvement over baseline (%)')
+
+
+def _curve_page(figure, curves):
+    loss, accuracy = figure.subplots(2, 1)
+    for curve, values in curves.items():
+        axes = loss if curve.endswith('loss') else accuracy
+        axes.plot(range(1, len(values) + 1), values, label=curve.replace('_', ' '))
+    for axes, title in ((loss, 'Loss'), (accuracy, 'Accuracy')):
+        axes.set_title(title)
+        axes.set_xlabel('Epoch')
+        axes.legend()
+    figure.suptitle('Training curves')
+
+
+def _metric_page(figure, series):
+    axes = figure.subplots(len(series), 1, squeeze=False)[:, 0]
+    for ax, (label, points) in zip(axes, series.items()):
+        start = points['t'][0]
+        ax.plot([(t - start) / 60000 for t in points['t']], points['v'])
+        ax.set_title(f'{label} ({points["raw_count"]} samples)', fontsize=9)
+        ax.tick_params(labelsize=8)
+    axes[-1].set_xlabel('Minutes since first sample')
+    figure.suptitle('Metrics over time')
+
+
+def render(result, file):
+    """Write the report for ``result`` to ``file`` (charts and KPI table)"""
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
+    simulation = result.simulation
+    size = (8.27, 11.69)  # A4 portrait
+    with PdfPages(file) as pdf:
+        figure = Figure(figsize=size)
+        _kpi_page(figure, simulation, result)
+        pdf.savefig(figure)
+
+        curves = {curve: values for curve, values in result.curves.read_all().items() if len(values)}
+        if curves:
+            figure = Figure(figsize=size)
+            _curve_page(figure, curves)
+            pdf.savefig(figure)
+
+        series = {}
+        for metric_type, label in Metric.METRIC_TYPES:
+            points = get_series(simulation.id, metric_type, SERIES_POINTS)
+            if points['raw_count']:
+                series[label] = points
+        if series:
+            figure = Figure(figsize=size)
+            _metric_page(figure, series)
+            pdf.savefig(figure)
+
+
+def generate(result_id):
+    """
+    Render the report for a Result and record it in ``pdf_report_path``.
+    Returns the new path relative to MEDIA_ROOT, or None if the Result is gone.
+    """
+    result = Result.objects.select_related('simulation__scenario').filter(id=result_id).first()
+    if result is None:
+        return None
+    if cached_report(result):
+        return result.pdf_report_path
+
+    name = report_name(result)
+    path = report_file(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Rendered beside the target and renamed, so a half-written report is never served
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.pdf.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            render(result, fh)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    # update() rather than save(): leaves updated_at (the version) and the signals alone
+    Result.objects.filter(id=result.id).update(pdf_report_path=name)
+    if result.pdf_report_path and result.pdf_report_path != name:
+        report_file(result.pdf_report_path).unlink(missing_ok=True)
+    return name
+
+
+def _run(result_id, name):
+    try:
+        return generate(result_id)
+    except Exception:
+        logger.exception('PDF report %s failed', name)
+        raise
+    finally:
+        with _lock:
+            _pending.pop(name, None)
+        # Worker threads hold their own connections
+        close_old_connections()
+
+
+def schedule(result):
+    """Queue rendering of the current version of ``result``; returns its Future"""
+    global _executor
+    name = report_name(result)
+    with _lock:
+        if name in _pending:
+            return _pending[name]
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix='pdf-report')
+        future = _pending[name] = _executor.submit(_run, result.id, name)
+    return future
+
+
+def is_pending(result):
+    with _lock:
+        return report_name(result) in _pending
@@ -0,0 +1,189 @@
+"""In-process write-behind buffer for simulation progress updates"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Simulation, SimulationLog
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FIELDS = ('progress', 'current_epoch', 'current_loss', 'current_accuracy')
+
+
+class ProgressBuffer:
+    """
+    Coalesces progress updates per simulation.
+
+    Only the latest progress/epoch/loss/accuracy is kept and written with
+    ``save(update_fields=...)`` once ``flush_interval`` seconds have passed
+    since the last write. Updates still buffered when no further update
+    arrives are written by a background timer once their interval is up.
+    Status changes are written immediately together with anything still
+    buffered. A progress log line is written only when progress crosses a
+    new ``log_step`` percent boundary.
+
+    Per-simulation state is dropped once it no longer matters: write times
+    after their interval has passed, everything when the run stops.
+    """
+
+    def __init__(self, flush_interval=5.0, log_step=10, background=True):
+        self.flush_interval = flush_interval
+        self.log_step = log_step
+        self.background = background
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = {}
+        self._logged_step = {}
+        self._timer = None
+
+    def update(self, simulation, data):
+        """Record an update for ``simulation``; returns True if it was written"""
+        fields = {key: data[key] for key in PROGRESS_FIELDS if key in data}
+        status = data.get('status')
+        if not fields and status is None:
+            return False
+
+        with self._lock:
+            pending = self._pending.setdefault(simulation.id, {})
+            pending.update(fields)
+            now = time.monotonic()
+            due = now - self._last_flush.get(simulation.id, 0) >= self.flush_interval
+            if status is None and not due:
+                self._schedule(now)
+                return False
+            fields = self._pending.pop(simulation.id)
+            if status is not None and status != 'running':
+                # Nothing more is coming for a stopped run
+                self._last_flush.pop(simulation.id, None)
+            else:
+                self._last_flush[simulation.id] = now
+
+        self._write(simulation, fields, status)
+        return True
+
+    def _schedule(self, now):
+        """Start the timer for the earliest buffered deadline (lock held)"""
+        if not self.background or self._timer is not None or not self._pending:
+            return
+        deadline = min(self._last_flush.get(sim_id, 0) for sim_id in self._pending) + self.flush_interval
+        self._timer = threading.Timer(max(deadline - now, 0), self._run_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run_timer(self):
+        try:
+            self.flush_due()
+        except Exception:
+            logger.exception('Flushing buffered simulation progress failed')
+        finally:
+            # The timer thread holds its own connection
+            close_old_connections()
+
+    def flush_due(self):
+        """Write buffered updates whose interval is up and forget stale write times"""
+        with self._lock:
+            if self._timer is not None and self._timer.ident == threading.get_ident():
+                self._timer = None
+            now = time.monotonic()
+            batch = {
+                sim_id: self._pending.pop(sim_id)
+                for sim_id in list(self._pending)
+                if now - self._last_flush.get(sim_id, 0) >= self.flush_interval
+            }
+            for sim_id in batch:
+                self._last_flush[sim_id] = now
+            self._last_flush = {
+                sim_id: flushed for sim_id, flushed in self._last_flush.items()
+                if now - flushed < self.flush_interval or sim_id in self._pending
+            }
+            self._schedule(now)
+        self._write_batch(batch)
+
+    def pending(self, simulation_id):
+        """Buffered values not yet written for ``simulation_id``"""
+        with self._lock:
+            return dict(self._pending.get(simulation_id, {}))
+
+    def apply_pending(self, simulation):
+        """Overlay buffered values on a loaded simulation instance"""
+        for key, value in self.pending(simulation.id).items():
+            setattr(simulation, key, value)
+        return simulation
+
+    def flush(self, simulation_id=None):
+        """Write buffered updates for one simulation, or all of them"""
+        with self._lock:
+            if simulation_id is None:
+                batch, self._pending = self._pending, {}
+            else:
+                batch = {simulation_id: self._pending.pop(simulation_id, {})}
+            now = time.monotonic()
+            for sim_id in batch:
+                self._last_flush[sim_id] = now
+        self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        for sim_id, fields in batch.items():
+            if not fields:
+                continue
+            simulation = Simulation.objects.filter(id=sim_id).first()
+            if simulation:
+                self._write(simulation, fields, None)
+
+    def _write(self, simulation, fields, status):
+        for key, value in fields.items():
+            setattr(simulation, key, value)
+        update_fields = list(fields)
+
+        if status is not None:
+            previous_status = simulation.status
+            simulation.status = status
+            # Simulation.save() fills these in on the first running/completed save
+            update_fields += ['status', 'started_at', 'completed_at']
+
+        if update_fields:
+            # updated_at (auto_now) is only refreshed when listed explicitly
+            simulation.save(update_fields=update_fields + ['updated_at'])
+
+        if status is not None and status != previous_status:
+            SimulationLog.objects.create(
+                simulation=simulation,
+                log_level='error' if status == 'failed' else 'info',
+                message=f"Simulation status changed to {status} at {simulation.progress}%"
+            )
+        elif 'progress' in fields:
+            self._log_progress(simulation)
+
+        if status is not None and (status != previous_status or status != 'running'):
+            with self._lock:
+                self._logged_step.pop(simulation.id, None)
+
+    def _log_progress(self, simulation):
+        if not self.log_step:
+            return
+        try:
+            step = int(float(simulation.progress) // self.log_step)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            if self._logged_step.get(simulation.id) == step:
+                return
+            self._logged_step[simulation.id] = step
+        SimulationLog.objects.create(
+            simulation=simulation,
+            log_level='info',
+            message=f"Simulation progress updated: {simulation.progress}%"
+        )
+
+
+progress_buffer = ProgressBuffer(
+    flush_interval=getattr(settings, 'SIMULATION_PROGRESS_FLUSH_INTERVAL', 5.0),
+    log_step=getattr(settings, 'SIMULATION_PROGRESS_LOG_STEP', 10),
+)
+
+# Don't lose the tail of a run when the worker shuts down
+atexit.register(progress_buffer.flush)
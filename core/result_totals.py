@@ -0,0 +1,182 @@
+"""
+Incremental maintenance of Result rows.
+
+Every Metric written adds to the (simulation, metric_type) running totals in
+MetricTotal (count, sum, min, max); writers that bypass the signals
+(``bulk_create``) call ``record_metrics()`` themselves. Results are not
+touched per metric: ``refresh_results()`` recomputes them from the totals,
+at a cost independent of the number of metrics, when the simulation's
+status changes, after metrics are edited or deleted, or on demand (the
+results page of a running simulation refreshes on every view). Results
+of simulations measured against a scenario's baseline are refreshed with
+it.
+
+``rebuild()`` recomputes totals from the Metric table and reports any drift.
+"""
+import math
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+
+from . import baselines
+from .baselines import get_baseline_simulation
+from .metrics_summary import EMPTY, RESULT_KPIS, STATS, result_kpis, summarize
+from .models import MetricTotal, Result, Simulation
+
+
+def totals_summary(simulation_ids):
+    """Same shape as metrics_summary.summarize(), read from the running totals"""
+    summaries = {simulation_id: {} for simulation_id in simulation_ids}
+    for total in MetricTotal.objects.filter(simulation_id__in=simulation_ids):
+        summaries[total.simulation_id][total.metric_type] = {
+            'avg': total.avg, 'sum': total.sum, 'min': total.min, 'max': total.max, 'count': total.count,
+        }
+    return summaries
+
+
+def _add_totals(simulation_id, metric_type, count, total, low, high):
+    updated = MetricTotal.objects.filter(simulation_id=simulation_id, metric_type=metric_type).update(
+        count=F('count') + count,
+        sum=F('sum') + total,
+        min=Least('min', low),
+        max=Greatest('max', high),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MetricTotal.objects.create(
+                simulation_id=simulation_id, metric_type=metric_type,
+                count=count, sum=total, min=low, max=high,
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        _add_totals(simulation_id, metric_type, count, total, low, high)
+
+
+def record_metrics(simulation_id, metrics):
+    """Add ``(metric_type, value)`` pairs to the running totals"""
+    grouped = defaultdict(list)
+    for metric_type, value in metrics:
+        grouped[metric_type].append(value)
+    if not grouped:
+        return
+
+    with transaction.atomic():
+        for metric_type, values in grouped.items():
+            _add_totals(simulation_id, metric_type, len(values), math.fsum(values), min(values), max(values))
+
+
+def _kpi_fields(summary, baseline_summary, existing):
+    # Keep baseline figures that were set some other way (e.g. seeded) when
+    # the baseline run has no metrics to recompute them from
+    if existing is not None and not baseline_summary:
+        baseline_summary = {
+            metric_type: {**EMPTY, name: getattr(existing, baseline_field)}
+            for metric_type, name, _, baseline_field, _ in RESULT_KPIS
+        }
+    return result_kpis(summary, baseline_summary or None)
+
+
+def refresh_results(simulation, create=True):
+    """
+    Recompute the simulation's Result from its running totals, and those
+    of the scenario's other simulations when it is their baseline. With
+    ``create=False`` only existing Results are updated.
+    """
+    # Totals are re-read below: the cached summary may predate this write
+    baseline = get_baseline_simulation(simulation.scenario_id)
+    if baseline is not None and baseline.id == simulation.id:
+        # Results compared against this run, plus its own
+        targets = set(Result.objects.filter(
+            simulation__scenario_id=simulation.scenario_id
+        ).values_list('simulation_id', flat=True)) | {simulation.id}
+    else:
+        targets = {simulation.id}
+    existing = {result.simulation_id: result for result in Result.objects.filter(simulation_id__in=targets)}
+    if not create:
+        targets &= existing.keys()
+        if not targets:
+            return
+
+    ids = targets | ({baseline.id} if baseline else set())
+    summaries = totals_summary(ids)
+    baseline_summary = summaries[baseline.id] if baseline else None
+
+    for simulation_id in targets:
+        result = existing.get(simulation_id)
+        fields = _kpi_fields(summaries[simulation_id], baseline_summary, result)
+        if result is None:
+            Result.objects.create(simulation_id=simulation_id, **fields)
+        elif any(getattr(result, name) != value for name, value in fields.items()):
+            # Unchanged Results keep their updated_at (and the caches keyed by it)
+            for name, value in fields.items():
+                setattr(result, name, value)
+            result.save(update_fields=list(fields) + ['updated_at'])
+
+
+def _close(a, b):
+    if a is None or b is None:
+        return a is b
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def rebuild(simulation_ids=None, fix=True):
+    """
+    Recompute running totals from the Metric table.
+
+    Returns ``(checked, drifted)`` where ``drifted`` lists
+    ``(simulation_id, metric_type, stored, recomputed)`` for totals that
+    disagreed with the metrics. With ``fix`` those totals are rewritten;
+    refresh the Results afterwards with ``refresh_all_results()``.
+    """
+    if simulation_ids is None:
+        simulation_ids = Simulation.objects.values_list('id', flat=True)
+    simulation_ids = list(simulation_ids)
+
+    expected = summarize(simulation_ids)
+    stored = totals_summary(simulation_ids)
+
+    drifted = []
+    for simulation_id in simulation_ids:
+        for metric_type in expected[simulation_id].keys() | stored[simulation_id].keys():
+            want = expected[simulation_id].get(metric_type, EMPTY)
+            have = stored[simulation_id].get(metric_type, EMPTY)
+            if not all(_close(want[name], have[name]) for name in STATS):
+                drifted.append((simulation_id, metric_type, have, want))
+
+    if fix and drifted:
+        baselines.invalidate(*Simulation.objects.filter(
+            id__in={simulation_id for simulation_id, *_ in drifted}, algorithm='baseline'
+        ).values_list('scenario_id', flat=True).distinct())
+        with transaction.atomic():
+            for simulation_id, metric_type, _, want in drifted:
+                if want['count']:
+                    MetricTotal.objects.update_or_create(
+                        simulation_id=simulation_id, metric_type=metric_type,
+                        defaults={'count': want['count'], 'sum': want['sum'], 'min': want['min'], 'max': want['max']},
+                    )
+                else:
+                    MetricTotal.objects.filter(simulation_id=simulation_id, metric_type=metric_type).delete()
+
+    return len(simulation_ids), drifted
+
+
+def recount_simulation(simulation):
+    """Rebuild one simulation's totals and existing Results after metrics were edited or removed"""
+    rebuild([simulation.id])
+    refresh_results(simulation, create=False)
+
+
+def refresh_all_results(simulation_ids=None):
+    """Recompute every Result (or those of ``simulation_ids``) from the totals"""
+    simulations = Simulation.objects.filter(metric_totals__isnull=False).distinct()
+    if simulation_ids is not None:
+        simulations = simulations.filter(id__in=simulation_ids)
+    count = 0
+    for simulation in simulations.iterator():
+        refresh_results(simulation)
+        count += 1
+    return count
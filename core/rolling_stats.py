@@ -0,0 +1,253 @@
+"""
+Rolling-window speed statistics per simulation.
+
+Each simulation keeps one ring buffer per window (1m/5m/15m/1h by default)
+of fixed-width time buckets holding the sample count, speed sum and speed
+sum of squares, plus running totals over the whole window. Ingestion adds
+samples to the current bucket; buckets that fall out of a window are
+subtracted from its totals as time moves on, so reading a window is O(1).
+
+State is per process. A simulation is warmed from stored history (one
+grouped query) when this process first reads it, and rebuilt from history
+again every ``ROLLING_STATS_REFRESH_SECONDS``: samples another worker
+ingested only reach this one's windows through that rebuild, so workers
+agree to within the refresh interval rather than exactly.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncSecond
+
+from .models import Vehicle
+from .trajectory_store import TrajectoryStore, columnar_enabled
+
+DEFAULT_WINDOWS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600}
+
+
+def windows():
+    return getattr(settings, 'ROLLING_STATS_WINDOWS', DEFAULT_WINDOWS)
+
+
+def bucket_seconds():
+    return getattr(settings, 'ROLLING_STATS_BUCKET_SECONDS', 5)
+
+
+def refresh_seconds():
+    return getattr(settings, 'ROLLING_STATS_REFRESH_SECONDS', 60)
+
+
+class WindowStats:
+    """Count / mean / standard deviation of speed over one window"""
+
+    def __init__(self, count=0, total=0.0, total_sq=0.0):
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+
+    @property
+    def avg_speed(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def std_speed(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        # Clamp float error that can push the variance slightly below zero
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+    def __add__(self, other):
+        return WindowStats(self.count + other.count, self.total + other.total, self.total_sq + other.total_sq)
+
+    def as_dict(self):
+        return {'count': self.count, 'avg_speed': self.avg_speed, 'std_speed': self.std_speed}
+
+
+class RollingWindow:
+    """Ring buffer of time buckets with running totals over the window"""
+
+    def __init__(self, seconds, bucket_seconds):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, math.ceil(seconds / bucket_seconds))
+        self.counts = np.zeros(self.size, dtype=np.int64)
+        self.sums = np.zeros(self.size, dtype=np.float64)
+        self.sums_sq = np.zeros(self.size, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        # Absolute number of the newest bucket (time // bucket_seconds)
+        self.head = None
+
+    def _advance(self, bucket):
+        """Expire buckets older than the window ending at ``bucket``"""
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        if bucket - self.head >= self.size:
+            self.counts[:] = 0
+            self.sums[:] = 0
+            self.sums_sq[:] = 0
+            self.count, self.total, self.total_sq = 0, 0.0, 0.0
+        else:
+            for expired in range(self.head + 1, bucket + 1):
+                slot = expired % self.size
+                self.count -= int(self.counts[slot])
+                self.total -= float(self.sums[slot])
+                self.total_sq -= float(self.sums_sq[slot])
+                self.counts[slot] = 0
+                self.sums[slot] = 0
+                self.sums_sq[slot] = 0
+        self.head = bucket
+
+    def add(self, bucket, count, total, total_sq):
+        self._advance(bucket)
+        if bucket <= self.head - self.size:
+            return  # older than the window
+        slot = bucket % self.size
+        self.counts[slot] += count
+        self.sums[slot] += total
+        self.sums_sq[slot] += total_sq
+        self.count += count
+        self.total += total
+        self.total_sq += total_sq
+
+    def stats(self, bucket):
+        self._advance(bucket)
+        return WindowStats(self.count, self.total, self.total_sq)
+
+
+class SimulationStats:
+    """All configured windows for one simulation"""
+
+    def __init__(self, window_seconds, bucket_seconds):
+        self.bucket_seconds = bucket_seconds
+        self.windows = {name: RollingWindow(seconds, bucket_seconds) for name, seconds in window_seconds.items()}
+
+    def add(self, at, count, total, total_sq):
+        bucket = int(at // self.bucket_seconds)
+        for window in self.windows.values():
+            window.add(bucket, count, total, total_sq)
+
+    def stats(self, window, at):
+        return self.windows[window].stats(int(at // self.bucket_seconds))
+
+
+def _history_buckets(simulation_id, since):
+    """(epoch seconds, count, sum, sum of squares) per second of stored history"""
+    if columnar_enabled():
+        store = TrajectoryStore(simulation_id)
+        if not store.exists():
+            return []
+        data = store.arrays(store.select(start=since), columns=['timestamp', 'speed'])
+        if not len(data['timestamp']):
+            return []
+        seconds, inverse = np.unique(data['timestamp'] // 1_000_000, return_inverse=True)
+        speed = data['speed'].astype(np.float64)
+        return zip(
+            seconds.tolist(),
+            np.bincount(inverse).tolist(),
+            np.bincount(inverse, weights=speed).tolist(),
+            np.bincount(inverse, weights=speed * speed).tolist(),
+        )
+
+    rows = Vehicle.objects.filter(
+        simulation_id=simulation_id,
+        timestamp__gte=since
+    ).annotate(
+        second=TruncSecond('timestamp')
+    ).values('second').annotate(
+        count=Count('id'), total=Sum('speed'), total_sq=Sum(F('speed') * F('speed'))
+    ).order_by('second')
+    return [(row['second'].timestamp(), row['count'], row['total'], row['total_sq']) for row in rows]
+
+
+class RollingStatsRegistry:
+    """Per-simulation rolling statistics shared by this process"""
+
+    def __init__(self, window_seconds=None, bucket_seconds=5, refresh_seconds=None):
+        self._window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        # None: warm once and rely on record() alone
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._simulations = {}
+        self._warmed_at = {}
+        # simulation_id -> samples recorded while its history is being read
+        self._warming = {}
+
+    @property
+    def window_seconds(self):
+        return self._window_seconds or windows()
+
+    def _get(self, simulation_id, now):
+        """
+        Stats for ``simulation_id``, warmed from history on first use and
+        once the refresh interval has passed. The history query runs
+        without the lock, so other simulations' readers don't wait on it.
+        """
+        with self._lock:
+            stats = self._simulations.get(simulation_id)
+            stale = self.refresh_seconds is not None and now - self._warmed_at.get(simulation_id, now) >= self.refresh_seconds
+            if stats is not None and not stale:
+                return stats, False
+            # Samples recorded while the history is read are replayed into it
+            recorded = self._warming.setdefault(simulation_id, [])
+
+        fresh = SimulationStats(self.window_seconds, self.bucket_seconds)
+        since = datetime.fromtimestamp(now, dt_timezone.utc) - timedelta(seconds=max(self.window_seconds.values()))
+        for at, count, total, total_sq in _history_buckets(simulation_id, since):
+            fresh.add(at, count, total, total_sq)
+
+        with self._lock:
+            for sample in recorded:
+                fresh.add(*sample)
+            if self._warming.get(simulation_id) is recorded:
+                del self._warming[simulation_id]
+            self._simulations[simulation_id] = fresh
+            self._warmed_at[simulation_id] = now
+        return fresh, True
+
+    def record(self, simulation_id, speeds, at=None):
+        """Add committed samples with the given speeds, observed at ``at`` (epoch seconds)"""
+        speeds = np.asarray(speeds, dtype=np.float64)
+        if not len(speeds):
+            return
+        at = time.time() if at is None else at
+        stats, warmed = self._get(simulation_id, at)
+        if warmed:
+            return  # the history read already included these samples
+        sample = (at, len(speeds), float(speeds.sum()), float(np.dot(speeds, speeds)))
+        with self._lock:
+            if simulation_id in self._warming:
+                self._warming[simulation_id].append(sample)
+            # A warm-up may have installed new stats since _get()
+            self._simulations.get(simulation_id, stats).add(*sample)
+
+    def stats(self, simulation_id, window, at=None):
+        """WindowStats for one simulation over a named window"""
+        at = time.time() if at is None else at
+        stats, _ = self._get(simulation_id, at)
+        with self._lock:
+            return stats.stats(window, at)
+
+    def combined(self, simulation_ids, window, at=None):
+        """WindowStats summed over several simulations"""
+        total = WindowStats()
+        for simulation_id in simulation_ids:
+            total = total + self.stats(simulation_id, window, at)
+        return total
+
+    def discard(self, simulation_id):
+        with self._lock:
+            self._simulations.pop(simulation_id, None)
+            self._warmed_at.pop(simulation_id, None)
+
+
+rolling_stats = RollingStatsRegistry(bucket_seconds=bucket_seconds(), refresh_seconds=refresh_seconds())
@@ -0,0 +1,85 @@
+"""
+Per-scenario simulation statistics.
+
+``get_stats()`` reads cached entries for a page of scenarios at once and
+computes every missing one in a single grouped query with conditional
+aggregation. An entry is dropped when one of the scenario's simulations is
+created, changes status or is deleted, or when one of its Results changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from .models import Simulation
+
+CACHE_PREFIX = 'scenario_stats'
+
+EMPTY = {
+    'total_simulations': 0,
+    'completed_simulations': 0,
+    'running_simulations': 0,
+    'failed_simulations': 0,
+    'latest_run': None,
+    'best_improvement': None,
+}
+
+
+def cache_timeout():
+    return getattr(settings, 'SCENARIO_STATS_CACHE_TIMEOUT', 3600)
+
+
+def _key(scenario_id):
+    return f'{CACHE_PREFIX}:{scenario_id}'
+
+
+def compute(scenario_ids):
+    """{scenario_id: stats} for all ``scenario_ids`` in one query"""
+    stats = {scenario_id: dict(EMPTY) for scenario_id in scenario_ids}
+    rows = Simulation.objects.filter(scenario_id__in=scenario_ids).values('scenario_id').annotate(
+        total_simulations=Count('id'),
+        completed_simulations=Count('id', filter=Q(status='completed')),
+        running_simulations=Count('id', filter=Q(status='running')),
+        failed_simulations=Count('id', filter=Q(status='failed')),
+        latest_run=Max('created_at'),
+        best_improvement=Max('result__improvement_travel_time'),
+    ).order_by()
+    for row in rows:
+        stats[row.pop('scenario_id')] = row
+    return stats
+
+
+def get_stats(scenario_ids):
+    """{scenario_id: stats}, computing only the entries not cached"""
+    scenario_ids = list(scenario_ids)
+    cached = cache.get_many([_key(scenario_id) for scenario_id in scenario_ids])
+    stats = {}
+    missing = []
+    for scenario_id in scenario_ids:
+        entry = cached.get(_key(scenario_id))
+        if entry is None:
+            missing.append(scenario_id)
+        else:
+            stats[scenario_id] = entry
+    if missing:
+        computed = compute(missing)
+        cache.set_many({_key(scenario_id): entry for scenario_id, entry in computed.items()},
+                       timeout=cache_timeout())
+        stats.update(computed)
+    return stats
+
+
+def invalidate(*scenario_ids):
+    """Drop cached stats now and again once the transaction commits"""
+    keys = [_key(scenario_id) for scenario_id in scenario_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_simulation(simulation_id):
+    """Drop the stats of a simulation's scenario once the transaction commits"""
+    def drop():
+        scenario_id = Simulation.objects.filter(id=simulation_id).values_list('scenario_id', flat=True).first()
+        if scenario_id is not None:
+            cache.delete(_key(scenario_id))
+    transaction.on_commit(drop)
@@ -0,0 +1,147 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import baselines, commit_batches, comparison_matrix, csv_export, dashboard_snapshot, metric_rollups, pdf_reports, scenario_stats, timeseries
+from .models import Scenario, Simulation, Metric, Result, metrics_deleted
+from .result_totals import record_metrics, recount_simulation, refresh_results
+from .rolling_stats import rolling_stats
+from .trajectory_store import TrajectoryStore
+from .curve_store import CurveStore
+
+
+def invalidate_dashboard(*sections):
+    """Drop dashboard sections once the current transaction commits"""
+    transaction.on_commit(lambda: dashboard_snapshot.invalidate(*sections))
+
+
+@receiver(post_delete, sender=Simulation)
+def delete_trajectory_files(sender, instance, **kwargs):
+    """Columnar trajectories and training curves live outside the database, so cascade by hand"""
+    TrajectoryStore(instance.id).delete()
+    CurveStore(instance.id).delete()
+
+
+@receiver(post_save, sender=Simulation)
+def simulation_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Status and progress feed the simulation lists; the running
+    # simulation drives the live traffic numbers
+    invalidate_dashboard('simulations', 'traffic')
+    if created or update_fields is None or 'status' in update_fields:
+        scenario_stats.invalidate(instance.scenario_id)
+        # The stored CSV rows carry completed_at
+        commit_batches.add('csv_summaries', instance.id, csv_export.store_summaries)
+    if instance.algorithm == 'baseline':
+        # A baseline completing (or being edited) may replace the scenario's baseline
+        baselines.invalidate(instance.scenario_id)
+    if instance.status != 'running':
+        # Progress saves of running simulations can't change the completed set
+        comparison_matrix.invalidate(instance.scenario_id)
+        if not created and update_fields is not None and 'status' in update_fields:
+            # The run stopped: its Result is computed once, here, not per metric
+            commit_batches.add('refresh_results', instance.id, refresh_finished)
+
+
+def refresh_finished(simulation_ids):
+    for simulation in Simulation.objects.filter(id__in=simulation_ids).exclude(status='running'):
+        refresh_results(simulation, create=simulation.status == 'completed')
+
+
+@receiver(post_delete, sender=Simulation)
+def simulation_deleted(sender, instance, **kwargs):
+    rolling_stats.discard(instance.id)
+    if instance.algorithm == 'baseline':
+        baselines.invalidate(instance.scenario_id)
+    comparison_matrix.invalidate(instance.scenario_id)
+    scenario_stats.invalidate(instance.scenario_id)
+    invalidate_dashboard()
+
+
+@receiver(post_save, sender=Scenario)
+@receiver(post_delete, sender=Scenario)
+def scenario_changed(sender, instance, **kwargs):
+    # Scenario parameters carry the congestion thresholds
+    invalidate_dashboard('scenarios', 'simulations', 'traffic')
+
+
+@receiver(post_save, sender=Metric)
+def metric_changed(sender, instance, **kwargs):
+    invalidate_dashboard('speed_chart', 'traffic')
+    timeseries.invalidate(instance.simulation_id)
+
+
+def metrics_changed(simulation):
+    """Drop data derived from a simulation's metric summary"""
+    if simulation.algorithm == 'baseline':
+        # The cached baseline carries this simulation's metric summary
+        baselines.invalidate(simulation.scenario_id)
+    if simulation.status == 'completed':
+        comparison_matrix.invalidate(simulation.scenario_id)
+
+
+def recount(simulation_ids):
+    """Rebuild totals and existing Results of simulations whose metrics were edited or deleted"""
+    # Simulations deleted in the same transaction are gone by now
+    for simulation in Simulation.objects.filter(id__in=simulation_ids):
+        metrics_changed(simulation)
+        recount_simulation(simulation)
+
+
+def compact_rollups(keys):
+    # Hours of simulations deleted since then have no metrics or rollups left to rebuild
+    existing = set(Simulation.objects.filter(
+        id__in={simulation_id for simulation_id, _ in keys}
+    ).values_list('id', flat=True))
+    metric_rollups.compact_hours(key for key in keys if key[0] in existing)
+
+
+@receiver(pre_save, sender=Metric)
+def remember_metric_timestamp(sender, instance, **kwargs):
+    # An edit may move the metric to another hour; both buckets are rebuilt
+    if not instance._state.adding:
+        instance._previous_timestamp = Metric.objects.filter(pk=instance.pk).values_list('timestamp', flat=True).first()
+
+
+@receiver(post_save, sender=Metric)
+def metric_saved(sender, instance, created, **kwargs):
+    if created:
+        metrics_changed(instance.simulation)
+        record_metrics(instance.simulation_id, [(instance.metric_type, instance.value)])
+        metric_rollups.record(instance.simulation_id, [(instance.metric_type, instance.value, instance.timestamp)])
+    else:
+        # An edited value can't be backed out of min/max; recount once the transaction commits
+        commit_batches.add('recount_metrics', instance.simulation_id, recount)
+        for timestamp in {instance.timestamp, getattr(instance, '_previous_timestamp', None)} - {None}:
+            commit_batches.add('compact_rollups', (instance.simulation_id, timestamp), compact_rollups)
+
+
+@receiver(metrics_deleted)
+def metric_rows_deleted(sender, simulation_ids, hours, **kwargs):
+    invalidate_dashboard('speed_chart', 'traffic')
+    # Batched even outside a transaction: one run for all the deleted rows
+    with transaction.atomic():
+        for simulation_id in simulation_ids:
+            timeseries.invalidate(simulation_id)
+            commit_batches.add('recount_metrics', simulation_id, recount)
+        for key in hours:
+            commit_batches.add('compact_rollups', key, compact_rollups)
+
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def result_changed(sender, instance, **kwargs):
+    invalidate_dashboard('key_findings')
+    # Results carry the scenario's best improvement
+    scenario_stats.invalidate_simulation(instance.simulation_id)
+
+
+@receiver(post_save, sender=Result)
+def result_saved(sender, instance, **kwargs):
+    # The CSV's KPI rows, rewritten once however often the Result is saved
+    commit_batches.add('csv_summaries', instance.simulation_id, csv_export.store_summaries)
+
+
+@receiver(post_delete, sender=Result)
+def delete_report_file(sender, instance, **kwargs):
+    """The rendered PDF lives under MEDIA_ROOT, so remove it with its Result"""
+    transaction.on_commit(lambda: pdf_reports.delete_report(instance))
@@ -0,0 +1,195 @@
+"""
+Bootstrap confidence intervals and permutation tests on raw Metric samples.
+
+Resamples are drawn in batches: each batch is one (resamples x samples)
+index or permutation matrix reduced with NumPy, so no Python loop runs per
+resample. Batches are capped at ``BATCH_DRAWS`` values to bound memory, and
+larger samples get proportionally fewer resamples (never fewer than
+``MIN_RESAMPLES``) so each test draws at most ``max_draws()`` values.
+
+Once both sides hold ``normal_threshold()`` samples or more, resampling is
+skipped: the sample means are close to normal, so Welch's test (with a
+normal reference) gives the p-value and the delta method the interval,
+without the p-value floor and noise of a few hundred resamples.
+
+``compare_simulations()`` caches its results under both simulations'
+metric versions (core.timeseries), which every metric write bumps.
+"""
+import math
+from collections import defaultdict
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from . import cache_versions, timeseries
+from .models import Metric
+
+# Values materialized per batch (float64 -> about 16 MB)
+BATCH_DRAWS = 2_000_000
+MIN_RESAMPLES = 100
+
+
+def resamples():
+    return getattr(settings, 'SIGNIFICANCE_RESAMPLES', 2000)
+
+
+def max_draws():
+    return getattr(settings, 'SIGNIFICANCE_MAX_DRAWS', 2_000_000)
+
+
+def normal_threshold():
+    return getattr(settings, 'SIGNIFICANCE_NORMAL_THRESHOLD', 1000)
+
+
+def cache_timeout():
+    return getattr(settings, 'SIGNIFICANCE_CACHE_TIMEOUT', 3600)
+
+
+def _resample_count(requested, sample_size):
+    affordable = max_draws() // max(sample_size, 1)
+    return max(MIN_RESAMPLES, min(requested, affordable))
+
+
+def _batches(count, width):
+    """Row counts of successive batches for a (count x width) draw"""
+    rows = max(1, BATCH_DRAWS // max(width, 1))
+    for start in range(0, count, rows):
+        yield min(rows, count - start)
+
+
+def bootstrap_means(samples, count, rng):
+    """Means of ``count`` bootstrap resamples of ``samples``"""
+    n = len(samples)
+    means = np.empty(count)
+    done = 0
+    for rows in _batches(count, n):
+        index = rng.integers(0, n, size=(rows, n), dtype=np.int32)
+        means[done:done + rows] = samples.take(index).mean(axis=1)
+        done += rows
+    return means
+
+
+def permuted_mean_differences(baseline, candidate, count, rng):
+    """mean(first group) - mean(second) over ``count`` random relabellings of the pooled samples"""
+    pooled = np.concatenate([baseline, candidate])
+    n = len(baseline)
+    differences = np.empty(count)
+    done = 0
+    for rows in _batches(count, len(pooled)):
+        shuffled = rng.permuted(np.broadcast_to(pooled, (rows, len(pooled))), axis=1)
+        differences[done:done + rows] = shuffled[:, :n].mean(axis=1) - shuffled[:, n:].mean(axis=1)
+        done += rows
+    return differences
+
+
+def welch_test(baseline, candidate, confidence=0.95):
+    """
+    Normal-approximation counterpart of ``compare_samples()`` for large
+    samples: Welch's two-sided p-value for a difference in means and a
+    delta-method interval for the improvement.
+    """
+    n1, n2 = len(baseline), len(candidate)
+    mean1, mean2 = baseline.mean(), candidate.mean()
+    var1, var2 = baseline.var(ddof=1) / n1, candidate.var(ddof=1) / n2
+    error = math.sqrt(var1 + var2)
+    difference = mean1 - mean2
+    if error > 0:
+        p_value = math.erfc(abs(difference) / error / math.sqrt(2))
+    else:
+        p_value = 1.0 if difference == 0 else 0.0
+
+    interval = None
+    if mean1 != 0:
+        improvement = difference / mean1 * 100
+        # Standard error of mean2 / mean1, times 100
+        spread = math.sqrt(var2 + (mean2 / mean1) ** 2 * var1) / abs(mean1) * 100
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        interval = [improvement - z * spread, improvement + z * spread]
+    return {
+        'improvement_ci': interval,
+        'confidence': confidence,
+        'p_value': float(p_value),
+        'method': 'welch',
+        'resamples': None,
+        'samples': [n1, n2],
+    }
+
+
+def compare_samples(baseline, candidate, confidence=0.95, count=None, seed=None):
+    """
+    Improvement of ``candidate`` over ``baseline`` (percentage reduction of
+    the mean, as in the comparison view) with a percentile bootstrap
+    confidence interval, and the two-sided permutation-test p-value for a
+    difference in means. Large samples use ``welch_test()`` instead.
+    """
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    if len(baseline) < 2 or len(candidate) < 2:
+        return None
+    if min(len(baseline), len(candidate)) >= normal_threshold():
+        return welch_test(baseline, candidate, confidence)
+
+    rng = np.random.default_rng(seed)
+    # Both tests draw (count x all samples) values
+    count = _resample_count(count or resamples(), len(baseline) + len(candidate))
+
+    # Bootstrap each side independently; pair the resampled means up
+    baseline_means = bootstrap_means(baseline, count, rng)
+    candidate_means = bootstrap_means(candidate, count, rng)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        improvements = (baseline_means - candidate_means) / baseline_means * 100
+    improvements = improvements[np.isfinite(improvements)]
+
+    observed = baseline.mean() - candidate.mean()
+    differences = permuted_mean_differences(baseline, candidate, count, rng)
+    # Counting the observed labelling keeps p away from an impossible 0
+    extreme = np.count_nonzero(np.abs(differences) >= abs(observed) - 1e-12)
+    p_value = (extreme + 1) / (count + 1)
+
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(improvements, [tail, 100 - tail]) if len(improvements) else (None, None)
+    return {
+        'improvement_ci': [float(low), float(high)] if low is not None else None,
+        'confidence': confidence,
+        'p_value': float(p_value),
+        'method': 'bootstrap',
+        'resamples': count,
+        'samples': [len(baseline), len(candidate)],
+    }
+
+
+def metric_samples(simulation_ids, metric_types):
+    """{simulation_id: {metric_type: array of values}} in one query"""
+    values = defaultdict(lambda: defaultdict(list))
+    rows = Metric.objects.filter(
+        simulation_id__in=simulation_ids, metric_type__in=metric_types
+    ).values_list('simulation_id', 'metric_type', 'value')
+    for simulation_id, metric_type, value in rows.iterator(chunk_size=5000):
+        values[simulation_id][metric_type].append(value)
+    return {
+        simulation_id: {
+            metric_type: np.fromiter(values[simulation_id][metric_type], dtype=float)
+            for metric_type in metric_types
+        }
+        for simulation_id in simulation_ids
+    }
+
+
+def compare_simulations(baseline, candidate, metric_types):
+    """
+    ``compare_samples()`` of two simulations for each metric type, cached
+    until either simulation's metrics change.
+    """
+    versions = [cache_versions.get(timeseries.VERSION_NAMESPACE, simulation.id) for simulation in (baseline, candidate)]
+    key = f'significance:{baseline.id}:{candidate.id}:{",".join(metric_types)}:{versions[0]}:{versions[1]}'
+    results = cache.get(key)
+    if results is None:
+        samples = metric_samples([baseline.id, candidate.id], metric_types)
+        results = {
+            metric_type: compare_samples(samples[baseline.id][metric_type], samples[candidate.id][metric_type])
+            for metric_type in metric_types
+        }
+        cache.set(key, results, timeout=cache_timeout())
+    return results
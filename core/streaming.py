@@ -0,0 +1,39 @@
+"""
+Streaming responses that stay incremental under both WSGI and ASGI.
+
+Under ASGI, Django consumes a synchronous iterator with
+``sync_to_async(list)`` and so buffers the whole body before sending the
+first byte. ``streaming_response()`` instead gives ASGI servers an async
+iterator that pulls one chunk at a time from the synchronous generator,
+in the thread Django runs the request's sync code in (so database cursors
+stay on their connection). WSGI servers get the generator itself.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_END = object()
+
+
+async def iterate_in_thread(chunks):
+    """Async iterator over a synchronous iterable, one ``next()`` per chunk"""
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(iterator, _END)
+            if chunk is _END:
+                return
+            yield chunk
+    finally:
+        # A dropped connection stops the generator (and its cursor or workers) too
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """StreamingHttpResponse over ``chunks`` that is not buffered under ASGI"""
+    if isinstance(request, ASGIRequest):
+        chunks = iterate_in_thread(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
@@ -1,3 +1,1271 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import tempfile
+import unittest
+import warnings
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bulk_export, dashboard_snapshot, pdf_reports
+from .ingest import PayloadError, parse_vehicle_payload, store_vehicles, upsert_vehicle_states
+from .baselines import get_baseline
+from .metrics_summary import summarize
+from .significance import compare_samples
+from .scenario_stats import get_stats as get_scenario_stats
+from .keyset import paginate
+from .curve_store import CurveStore
+from .trajectory_store import FILE_NAMES, TrajectoryStore
+from .columnar_export import load as load_columnar
+from .result_totals import rebuild
+from .metric_rollups import bucketed, compact as compact_rollups, floor_bucket
+from .rolling_stats import RollingStatsRegistry
+from .progress_buffer import ProgressBuffer
+from .models import (
+    Scenario, Simulation, Vehicle, VehicleState, Metric,
+    Result, SimulationLog, Comparison, MetricRollup
+)
+
+
+# Names SQLite reports for scans that are not of a stored table
+DERIVED_TABLES = {'subquery', 'CONSTANT'}
+
+
+def seed_query_plan_data():
+    """A small but complete dataset touching every table the hot views read"""
+    user = User.objects.create_user('planner', password='planner')
+    now = timezone.now()
+    scenarios = [
+        Scenario.objects.create(name=f'Scenario {i}', scenario_type='nairobi_peak', created_by=user)
+        for i in range(3)
+    ]
+    simulations = []
+    for scenario in scenarios:
+        for algorithm, status in [('baseline', 'completed'), ('rl_optimized', 'completed'), ('hybrid', 'running')]:
+            simulations.append(Simulation.objects.create(
+                name=f'{scenario.name} {algorithm}',
+                scenario=scenario,
+                algorithm=algorithm,
+                created_by=user,
+                status=status,
+            ))
+
+    vehicles, states, metrics, logs = [], [], [], []
+    for simulation in simulations:
+        for i in range(20):
+            vehicles.append(Vehicle(
+                simulation=simulation, vehicle_id=f'V{i}', vehicle_type='car',
+                lat=-1.29, lng=36.82, speed=10 + i, heading=90,
+            ))
+            states.append(VehicleState(
+                simulation=simulation, vehicle_id=f'V{i}', vehicle_type='car',
+                lat=-1.29, lng=36.82, speed=10 + i, heading=90, updated_at=now,
+            ))
+            logs.append(SimulationLog(simulation=simulation, log_level='info', message=f'Step {i}'))
+        for metric_type, unit in [('travel_time', 'min'), ('delay', 'hours'), ('fuel', 'liters'),
+                                  ('emissions', 'kg'), ('speed', 'km/h'), ('congestion', '%')]:
+            for i in range(5):
+                metrics.append(Metric(simulation=simulation, metric_type=metric_type, value=10 + i, unit=unit))
+    Vehicle.objects.bulk_create(vehicles)
+    VehicleState.objects.bulk_create(states)
+    SimulationLog.objects.bulk_create(logs)
+    Metric.objects.bulk_create(metrics)
+    Metric.objects.update(timestamp=now - timedelta(minutes=30))
+    # bulk_create skips the signals that keep running totals and rollups current
+    rebuild()
+    compact_rollups()
+
+    for simulation in simulations:
+        if simulation.status != 'completed':
+            continue
+        Result.objects.create(
+            simulation=simulation,
+            avg_travel_time=40, baseline_avg_travel_time=50, improvement_travel_time=20,
+            total_delay=100, baseline_total_delay=120, delay_reduction=16,
+            fuel_consumed=800, baseline_fuel_consumed=1000, fuel_saving=20,
+            co2_emissions=1800, baseline_co2_emissions=2000, emissions_reduction=10,
+        )
+    return simulations
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plans are checked with SQLite EXPLAIN QUERY PLAN')
+class QueryPlanTests(TestCase):
+    """Queries behind the hot views must be served from indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.running = next(sim for sim in cls.simulations if sim.status == 'running')
+        cls.completed = next(sim for sim in cls.simulations if sim.algorithm == 'rl_optimized')
+
+    def setUp(self):
+        # Precomputed views would otherwise answer without touching the database
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plan_problems(self, sql):
+        problems = []
+        for step in self.explain(sql):
+            # "SCAN t USING [COVERING] INDEX i" walks an index in order and is
+            # fine; a bare "SCAN t" reads the whole table. Scans of derived
+            # tables (Django's "subquery" alias) were already planned above.
+            target = step.split()[1] if step.startswith('SCAN ') else ''
+            if target and 'USING' not in step and target not in DERIVED_TABLES:
+                problems.append(f'full table scan: {step}')
+            if 'TEMP B-TREE' in step and 'ORDER BY' in step:
+                problems.append(f'sort without index: {step}')
+        return problems
+
+    def assertQueriesUseIndexes(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data or {})
+            if response.streaming:
+                # Streamed bodies query as they are consumed
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+
+        selects = [query['sql'] for query in context.captured_queries
+                   if query['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            problems = self.plan_problems(sql)
+            self.assertFalse(problems, f'\n{sql}\n' + '\n'.join(problems))
+
+    def test_dashboard(self):
+        self.assertQueriesUseIndexes('get', reverse('dashboard'))
+
+    def test_simulation_detail(self):
+        self.assertQueriesUseIndexes('get', reverse('simulation_detail', args=[self.running.id]))
+
+    def test_results_detail(self):
+        self.assertQueriesUseIndexes('get', reverse('results', args=[self.completed.id]))
+
+    def test_results_detail_computed(self):
+        # No Result yet: KPIs are computed from the grouped metrics summary
+        self.assertQueriesUseIndexes('get', reverse('results', args=[self.running.id]))
+
+    def test_results_list(self):
+        self.assertQueriesUseIndexes('get', reverse('results_list'))
+
+    def test_experiment_detail(self):
+        self.assertQueriesUseIndexes('get', reverse('ai_experiment', args=[self.completed.id]))
+
+    def test_experiment_list(self):
+        self.assertQueriesUseIndexes('get', reverse('experiment_list'))
+
+    def test_keyset_pages(self):
+        cursor = f'{int(timezone.now().timestamp() * 1_000_000)}-0'
+        self.assertQueriesUseIndexes('get', reverse('results_list'), {'after': cursor})
+        self.assertQueriesUseIndexes('get', reverse('experiment_list'), {'before': '0-0'})
+
+    def test_scenario_list(self):
+        self.assertQueriesUseIndexes('get', reverse('scenario_list'))
+
+    def test_export_csv(self):
+        self.assertQueriesUseIndexes('get', reverse('export_csv', args=[self.completed.id]), {'vehicles': '1'})
+
+    def test_polling_apis(self):
+        self.assertQueriesUseIndexes('get', reverse('api_vehicles_latest'))
+        self.assertQueriesUseIndexes('get', reverse('api_vehicles_latest'), {'since': '0-0'})
+        self.assertQueriesUseIndexes('get', reverse('api_active_simulations'))
+        self.assertQueriesUseIndexes('get', reverse('api_active_simulations'), {'since': '0-0'})
+
+    def test_metric_series(self):
+        self.assertQueriesUseIndexes('get', reverse('api_metric_series', args=[self.completed.id, 'speed']))
+
+    def test_comparison_matrix(self):
+        self.assertQueriesUseIndexes('get', reverse('api_comparison_matrix', args=[self.completed.scenario_id]))
+
+
+class DashboardSnapshotTests(TestCase):
+    """The dashboard renders from cached sections and rebuilds only what changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_render_runs_no_queries(self):
+        self.client.get(reverse('dashboard'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_status_change_rebuilds_affected_sections(self):
+        self.client.get(reverse('dashboard'))
+        simulation = self.simulations[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            simulation.status = 'running'
+            simulation.save()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('dashboard'))
+        tables = {query['sql'].split(' FROM ')[1].split()[0] for query in context.captured_queries}
+        self.assertNotIn('"core_result"', tables)
+        self.assertIn(simulation, response.context['active_simulations'])
+
+    def test_grid_follows_traffic_section(self):
+        running = Simulation.objects.filter(status='running')
+        ids = list(running.values_list('id', flat=True))
+        running.update(status='pending')
+        self.client.get(reverse('dashboard'))
+        # Only the traffic section sees the runs again; the simulations section is stale
+        Simulation.objects.filter(id__in=ids).update(status='running')
+        dashboard_snapshot.invalidate('traffic')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(list(response.context['active_simulations']), [])
+        self.assertContains(response, 'function loadGrid')
+        self.assertContains(response, reverse('api_vehicle_map', args=[response.context['live_simulation_id']]))
+
+
+class VehicleMapTests(TestCase):
+    """Map grid tiles are served from cache, at most one refresh interval behind ingestion"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.running = next(sim for sim in cls.simulations if sim.status == 'running')
+        cls.url = reverse('api_vehicle_map', args=[cls.running.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, params, at):
+        with mock.patch('core.map_grid.time.time', return_value=at):
+            return self.client.get(self.url, params).json()
+
+    def test_cells_refreshed_at_bounded_rate(self):
+        params = {'zoom': 13, 'bbox': '36.80,-1.30,36.84,-1.28'}
+        data = self.get(params, 1000)
+        self.assertEqual(data['total_vehicles'], 20)
+        self.assertEqual(data['cells'][0]['congestion'], 'MEDIUM')
+        self.assertNotIn('points', data)
+
+        with self.assertNumQueries(1):  # the simulation lookup only
+            self.assertEqual(self.get(params, 1001)['computed_tiles'], 0)
+
+        for at in (1002, 1003):
+            with self.captureOnCommitCallbacks(execute=True):
+                upsert_vehicle_states(self.running, [{
+                    'vehicle_id': 'V0', 'vehicle_type': 'car',
+                    'lat': -1.29, 'lng': 36.82, 'speed': 50, 'heading': 0,
+                }])
+            # Live ingest keeps reusing the tiles until the refresh interval is up
+            self.assertEqual(self.get(params, at)['computed_tiles'], 0)
+        self.assertGreater(self.get(params, 1005)['computed_tiles'], 0)
+        self.assertEqual(self.get(params, 1006)['computed_tiles'], 0)
+
+    def test_raw_points_at_high_zoom(self):
+        data = self.client.get(self.url, {'zoom': 17, 'bbox': '36.819,-1.291,36.821,-1.289'}).json()
+        self.assertEqual(len(data['points']), 20)
+
+    def test_oversized_bbox_rejected(self):
+        response = self.client.get(self.url, {'zoom': 18, 'bbox': '36.0,-2.0,37.0,-1.0'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_bbox_rejected(self):
+        for bbox in ('nan,nan,nan,nan', '36.80,nan,36.84,-1.28', '-inf,-1.30,inf,-1.28'):
+            response = self.client.get(self.url, {'zoom': 13, 'bbox': bbox})
+            self.assertEqual(response.status_code, 400)
+
+
+class RollingStatsTests(TestCase):
+    """Rolling windows expire old buckets and warm from stored history"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+
+    def test_windows_expire_independently(self):
+        registry = RollingStatsRegistry(bucket_seconds=5)
+        now = timezone.now().timestamp() + 3600  # past any seeded history
+        registry.stats(0, '1m', at=now)
+        registry.record(0, [10, 20, 30], at=now)
+
+        self.assertEqual(registry.stats(0, '1m', at=now + 30).count, 3)
+        self.assertEqual(registry.stats(0, '1m', at=now + 90).count, 0)
+        self.assertEqual(registry.stats(0, '5m', at=now + 90).count, 3)
+        self.assertEqual(registry.stats(0, '1h', at=now + 7200).count, 0)
+
+    def test_warms_from_history(self):
+        registry = RollingStatsRegistry(bucket_seconds=5)
+        simulation = self.simulations[0]
+        stats = registry.stats(simulation.id, '5m')
+        self.assertEqual(stats.count, 20)
+        self.assertAlmostEqual(stats.avg_speed, 19.5)
+
+    def test_refreshes_from_history(self):
+        registry = RollingStatsRegistry(bucket_seconds=5, refresh_seconds=60)
+        simulation = self.simulations[1]
+        now = timezone.now().timestamp()
+        self.assertEqual(registry.stats(simulation.id, '1h', at=now).count, 20)
+        # Ingested by another worker: only a rebuild from history sees it
+        Vehicle.objects.create(simulation=simulation, vehicle_id='W0', vehicle_type='car',
+                               lat=-1.29, lng=36.82, speed=50, heading=0)
+        self.assertEqual(registry.stats(simulation.id, '1h', at=now + 30).count, 20)
+        self.assertEqual(registry.stats(simulation.id, '1h', at=now + 61).count, 21)
+
+    def test_history_read_without_lock(self):
+        registry = RollingStatsRegistry(bucket_seconds=5)
+        now = timezone.now().timestamp() + 3600  # past any seeded history
+        registry.stats(0, '1m', at=now)
+        registry.record(0, [10, 30], at=now)
+
+        def history(simulation_id, since):
+            # Another simulation's readers and writers go ahead meanwhile
+            self.assertTrue(registry._lock.acquire(blocking=False))
+            registry._lock.release()
+            registry.record(0, [20], at=now)
+            return [(now, 1, 50.0, 2500.0)]
+
+        with mock.patch('core.rolling_stats._history_buckets', history):
+            self.assertEqual(registry.stats(1, '1m', at=now).count, 1)
+        self.assertEqual(registry.stats(0, '1m', at=now).avg_speed, 20)
+
+    def test_mean_and_std(self):
+        registry = RollingStatsRegistry(window_seconds={'1m': 60}, bucket_seconds=5)
+        now = timezone.now().timestamp() + 3600  # past any seeded history
+        registry.stats(0, '1m', at=now)
+        registry.record(0, [10, 20, 30], at=now)
+        stats = registry.stats(0, '1m', at=now)
+        self.assertAlmostEqual(stats.avg_speed, 20)
+        self.assertAlmostEqual(stats.std_speed, (200 / 3) ** 0.5)
+
+    def test_scenario_congestion_thresholds(self):
+        scenario = self.simulations[0].scenario
+        self.assertEqual(scenario.congestion_level(20), 'MEDIUM')
+        scenario.parameters = '{"congestion_thresholds": {"high": 25}}'
+        self.assertEqual(scenario.congestion_level(20), 'HIGH')
+        self.assertEqual(scenario.congestion_level(35), 'LOW')
+
+
+class PollingApiTests(TestCase):
+    """Polling endpoints answer 304 when nothing changed and deltas after a cursor"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+
+    def test_vehicles_not_modified(self):
+        url = reverse('api_vehicles_latest')
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['vehicles']), 100)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_vehicle_delta(self):
+        url = reverse('api_vehicles_latest')
+        first = self.client.get(url)
+        cursor = first.json()['cursor']
+        self.assertEqual(self.client.get(url, {'since': cursor}).json()['vehicles'], [])
+
+        upsert_vehicle_states(self.simulations[0], [{
+            'vehicle_id': 'V0', 'vehicle_type': 'bus',
+            'lat': -1.3, 'lng': 36.8, 'speed': 5, 'heading': 0,
+        }])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        delta = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual([v['vehicle_type'] for v in delta['vehicles']], ['bus'])
+        self.assertEqual(self.client.get(url, {'since': delta['cursor']}).json()['vehicles'], [])
+
+    def test_simulation_delta(self):
+        url = reverse('api_active_simulations')
+        first = self.client.get(url)
+        data = first.json()
+        self.assertEqual(len(data['simulations']), 3)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        running = Simulation.objects.get(id=data['simulations'][0]['id'])
+        running.status = 'completed'
+        running.save()
+        delta = self.client.get(url, {'since': data['cursor']}).json()
+        self.assertEqual(delta['simulations'], [])
+        self.assertEqual(delta['removed'], [running.id])
+
+    def test_bad_cursor(self):
+        for url in (reverse('api_active_simulations'), reverse('api_vehicles_latest')):
+            for since in ('nope', '99999999999999999999-1', '1-99999999999999999999'):
+                self.assertEqual(self.client.get(url, {'since': since}).status_code, 400)
+
+
+class VehicleIngestTests(TestCase):
+    """Single and batch vehicle endpoints validate alike and write in one transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = seed_query_plan_data()[2]
+
+    def test_single_vehicle(self):
+        url = reverse('api_add_vehicle', args=[self.simulation.id])
+        response = self.client.post(url, json.dumps({'id': 'N1', 'type': 'bus', 'lat': -1.3, 'lng': 36.8, 'speed': 12}),
+                                    content_type='application/json')
+        vehicle = Vehicle.objects.get(id=response.json()['vehicle_id'])
+        self.assertEqual((vehicle.vehicle_id, vehicle.vehicle_type), ('N1', 'bus'))
+        self.assertEqual(VehicleState.objects.get(simulation=self.simulation, vehicle_id='N1').speed, 12)
+
+        before = Vehicle.objects.count()
+        for body in [json.dumps({'id': 'N2', 'lat': 91}), json.dumps({'id': 'N2', 'type': 'tram'}), '{nope']:
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Vehicle.objects.count(), before)
+        self.assertFalse(VehicleState.objects.filter(vehicle_id='N2').exists())
+
+    def test_columnar_history_follows_commit(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        sample = {'vehicle_id': 'C0', 'vehicle_type': 'car', 'lat': -1.3, 'lng': 36.8, 'speed': 5.0, 'heading': 0.0}
+        with self.settings(TRAJECTORY_BACKEND='columnar', TRAJECTORY_ROOT=root.name):
+            with self.assertRaises(RuntimeError), self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    store_vehicles(self.simulation, [sample])
+                    raise RuntimeError('rejected after the upsert')
+            self.assertEqual(len(TrajectoryStore(self.simulation.id)), 0)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                store_vehicles(self.simulation, [sample])
+            self.assertEqual(len(TrajectoryStore(self.simulation.id)), 1)
+
+    def post_batch(self, body, content_type='application/json'):
+        return self.client.post(reverse('api_add_vehicles_batch', args=[self.simulation.id]), body,
+                                content_type=content_type)
+
+    def test_batch(self):
+        vehicles = [{'id': f'B{i}', 'type': 'car', 'lat': -1.3, 'lng': 36.8, 'speed': i, 'heading': 90} for i in range(3)]
+        response = self.post_batch(json.dumps({'vehicles': vehicles}))
+        self.assertEqual(response.json(), {'status': 'success', 'received': 3, 'created': 3, 'errors': []})
+        self.assertEqual(VehicleState.objects.filter(simulation=self.simulation, vehicle_id__startswith='B').count(), 3)
+
+    def test_batch_partial_errors(self):
+        body = '\n'.join([
+            json.dumps({'id': 'P0', 'speed': 5}),
+            '{"id": "P1", "speed": Infinity}',
+            json.dumps({'id': 'P2', 'heading': 400}),
+            json.dumps({'id': 'P3', 'lat': 'north'}),
+        ])
+        data = self.post_batch(body, 'application/x-ndjson').json()
+        self.assertEqual((data['status'], data['created']), ('partial', 1))
+        self.assertEqual([(e['index'], list(e['errors'])) for e in data['errors']],
+                         [(1, ['speed']), (2, ['heading']), (3, ['lat'])])
+
+        response = self.post_batch(json.dumps([{'id': 'P4', 'type': 'tram'}]))
+        self.assertEqual((response.status_code, response.json()['status']), (400, 'error'))
+
+    def test_batch_limit(self):
+        with mock.patch('core.views.MAX_VEHICLES_PER_REQUEST', 2):
+            response = self.post_batch(json.dumps([{'id': f'L{i}'} for i in range(3)]))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Vehicle.objects.filter(vehicle_id__startswith='L').exists())
+
+    def test_malformed_payload(self):
+        for body in ['[{"id": "M0"', '{"vehicles": {"id": "M0"}}', b'\xff\xfe']:
+            with self.assertRaises(PayloadError):
+                parse_vehicle_payload(body)
+            self.assertEqual(self.post_batch(body).status_code, 400)
+        self.assertEqual(parse_vehicle_payload('{"id": "M0"}\n\n{"id": "M1"}', 'application/x-ndjson'),
+                         [{'id': 'M0'}, {'id': 'M1'}])
+
+
+class ProgressBufferTests(TestCase):
+    """Buffered progress reaches the database without a later update, and state is dropped"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = seed_query_plan_data()[2]
+
+    def update(self, buffer, now, data):
+        with mock.patch('core.progress_buffer.time.monotonic', return_value=now):
+            return buffer.update(self.simulation, data)
+
+    def flush_due(self, buffer, now):
+        with mock.patch('core.progress_buffer.time.monotonic', return_value=now):
+            buffer.flush_due()
+
+    def test_last_update_flushed_at_deadline(self):
+        buffer = ProgressBuffer(flush_interval=5, background=False)
+        self.assertTrue(self.update(buffer, 100, {'progress': 10}))
+        self.assertFalse(self.update(buffer, 101, {'progress': 20}))
+
+        self.flush_due(buffer, 103)
+        self.simulation.refresh_from_db()
+        self.assertEqual(self.simulation.progress, 10)
+        self.flush_due(buffer, 106)
+        self.simulation.refresh_from_db()
+        self.assertEqual(self.simulation.progress, 20)
+        self.assertEqual(buffer.pending(self.simulation.id), {})
+
+        # Write times older than the interval are forgotten
+        self.flush_due(buffer, 120)
+        self.assertEqual(buffer._last_flush, {})
+
+    def test_timer_scheduled_for_buffered_update(self):
+        buffer = ProgressBuffer(flush_interval=60)
+        self.update(buffer, 100, {'progress': 10})
+        self.assertIsNone(buffer._timer)
+        self.update(buffer, 101, {'progress': 20})
+        self.addCleanup(buffer._timer.cancel)
+        self.assertTrue(buffer._timer.daemon)
+
+    def test_finish_drops_state(self):
+        buffer = ProgressBuffer(flush_interval=5, background=False)
+        self.update(buffer, 100, {'progress': 10})
+        self.update(buffer, 101, {'progress': 90})
+        self.assertTrue(self.update(buffer, 102, {'status': 'completed'}))
+        self.simulation.refresh_from_db()
+        self.assertEqual((self.simulation.status, self.simulation.progress), ('completed', 90))
+        self.assertEqual((buffer._pending, buffer._last_flush, buffer._logged_step), ({}, {}, {}))
+
+
+@override_settings(SSE_POLL_INTERVAL=0.01)
+class LiveFeedTests(TestCase):
+    """The event stream sends vehicle states committed after the cursor passed their timestamp"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = seed_query_plan_data()[2]
+
+    def late_commit(self):
+        # A state stamped a second before the newest one, visible only now
+        newest = VehicleState.objects.filter(simulation=self.simulation).latest('updated_at').updated_at
+        VehicleState.objects.filter(simulation=self.simulation, vehicle_id='V0').update(
+            lat=1.5, updated_at=newest - timedelta(seconds=1)
+        )
+
+    async def test_events(self):
+        response = await self.async_client.get(reverse('api_simulation_events', args=[self.simulation.id]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        async def event():
+            lines = (await anext(events)).decode().splitlines()
+            fields = dict(line.split(': ', 1) for line in lines if line and not line.startswith(':'))
+            return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+        self.assertEqual(await event(), (None, None))  # retry
+        name, progress = await event()
+        self.assertEqual((name, progress['status']), ('progress', 'running'))
+        name, vehicles = await event()
+        self.assertEqual((name, len(vehicles)), ('vehicles', 20))
+
+        await sync_to_async(self.late_commit)()
+        name, vehicles = await event()
+        self.assertEqual((name, [(v['vehicle_id'], v['lat']) for v in vehicles]), ('vehicles', [('V0', 1.5)]))
+
+        await Simulation.objects.filter(id=self.simulation.id).aupdate(status='completed')
+        self.assertEqual((await event())[0], 'progress')
+        self.assertEqual(await event(), ('end', {'reason': 'completed'}))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+
+class MetricsSummaryTests(TestCase):
+    """Metric summaries take one query however many simulations and types"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+
+    def test_single_query(self):
+        ids = [simulation.id for simulation in self.simulations]
+        with self.assertNumQueries(1):
+            summaries = summarize(ids)
+        self.assertEqual(len(summaries), len(ids))
+        self.assertEqual(summaries[ids[0]]['delay'], {'avg': 12, 'sum': 60, 'min': 10, 'max': 14, 'count': 5})
+
+    def test_results_view_uses_baseline_statistic(self):
+        simulation = next(sim for sim in self.simulations if sim.status == 'running')
+        self.client.get(reverse('results', args=[simulation.id]))
+        result = Result.objects.get(simulation=simulation)
+        self.assertEqual(result.avg_travel_time, 12)
+        self.assertEqual(result.baseline_avg_travel_time, 12)
+        self.assertEqual(result.total_delay, 60)
+        self.assertEqual(result.baseline_total_delay, 60)
+        self.assertEqual(result.delay_reduction, 0)
+
+
+class ResultTotalsTests(TestCase):
+    """Results follow incoming metrics and match a rebuild from scratch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.baseline = next(sim for sim in cls.simulations if sim.algorithm == 'baseline')
+        cls.ai = next(sim for sim in cls.simulations if sim.scenario_id == cls.baseline.scenario_id
+                      and sim.algorithm == 'rl_optimized')
+
+    def finish(self, simulation):
+        simulation.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            simulation.save(update_fields=['status'])
+
+    def test_results_refreshed_when_run_stops(self):
+        Metric.objects.create(simulation=self.ai, metric_type='delay', value=40, unit='hours')
+        self.assertEqual(Result.objects.get(simulation=self.ai).baseline_total_delay, 120)
+        self.assertEqual(rebuild(fix=False)[1], [])
+        self.finish(self.ai)
+        result = Result.objects.get(simulation=self.ai)
+        self.assertEqual(result.total_delay, 100)
+        self.assertEqual(result.baseline_total_delay, 60)
+        self.assertAlmostEqual(result.delay_reduction, -200 / 3)
+
+    def test_baseline_refresh_updates_dependent_results(self):
+        Metric.objects.create(simulation=self.baseline, metric_type='travel_time', value=24, unit='min')
+        self.finish(self.baseline)
+        result = Result.objects.get(simulation=self.ai)
+        self.assertEqual(result.baseline_avg_travel_time, 14)  # (60 + 24) / 6
+        self.assertAlmostEqual(result.improvement_travel_time, 200 / 14)
+
+    def test_running_simulation_gets_no_result(self):
+        running = next(sim for sim in self.simulations if sim.status == 'running')
+        Metric.objects.create(simulation=running, metric_type='delay', value=40, unit='hours')
+        self.assertFalse(Result.objects.filter(simulation=running).exists())
+
+    def test_results_page_follows_running_metrics(self):
+        running = next(sim for sim in self.simulations if sim.status == 'running')
+        url = reverse('results', args=[running.id])
+        self.assertEqual(self.client.get(url).context['result'].total_delay, 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.create(simulation=running, metric_type='delay', value=400, unit='hours')
+        self.assertEqual(self.client.get(url).context['result'].total_delay, 460)
+
+        # Nothing new: the Result is left alone
+        updated_at = Result.objects.get(simulation=running).updated_at
+        self.client.get(url)
+        self.assertEqual(Result.objects.get(simulation=running).updated_at, updated_at)
+
+    def test_delete_recounts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.filter(simulation=self.ai, metric_type='fuel', value=14).delete()
+        self.assertEqual(Result.objects.get(simulation=self.ai).fuel_consumed, 46)
+        self.assertEqual(rebuild(fix=False)[1], [])
+
+    def test_delete_recounts_once_per_simulation(self):
+        def delete(**lookups):
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    Metric.objects.filter(simulation=self.ai, **lookups).delete()
+            return len(queries)
+
+        # One row or several of a type: the same recount
+        self.assertEqual(delete(metric_type='fuel', value=14), delete(metric_type='delay', value__gte=11))
+
+
+class BaselineTests(TestCase):
+    """Each scenario resolves to one cached, deterministic baseline run"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.baseline = next(sim for sim in cls.simulations if sim.algorithm == 'baseline')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached(self):
+        baseline = get_baseline(self.baseline.scenario_id)
+        self.assertEqual(baseline.id, self.baseline.id)
+        self.assertEqual(baseline.summary['delay']['sum'], 60)
+        with self.assertNumQueries(0):
+            get_baseline(self.baseline.scenario_id)
+
+    def test_newer_baseline_replaces(self):
+        get_baseline(self.baseline.scenario_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = Simulation.objects.create(
+                name='Rerun', scenario_id=self.baseline.scenario_id, algorithm='baseline',
+                created_by=self.baseline.created_by, status='completed',
+            )
+        self.assertEqual(get_baseline(self.baseline.scenario_id).id, newer.id)
+
+
+class ComparisonMatrixTests(TestCase):
+    """All-pairs improvements of a scenario's completed simulations, cached"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.ai = next(sim for sim in cls.simulations if sim.algorithm == 'rl_optimized')
+        cls.url = reverse('api_comparison_matrix', args=[cls.ai.scenario_id])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_matrix(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(len(data['simulations']), 2)  # the running hybrid is left out
+        self.assertEqual(data['values']['delay'], [12, 12])
+        self.assertEqual(data['improvement']['delay'], [[0, 0], [0, 0]])
+        self.assertEqual(data['algorithm_mean_improvement']['speed'], {'baseline': 0, 'rl_optimized': 0})
+        with self.assertNumQueries(1):  # just the scenario lookup
+            self.client.get(self.url)
+
+    def test_new_metric_rebuilds(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.create(simulation=self.ai, metric_type='speed', value=24, unit='km/h')
+        data = self.client.get(self.url).json()
+        column = [sim['id'] for sim in data['simulations']].index(self.ai.id)
+        baseline = 1 - column
+        # Speed is better higher; the average is now 14 against the baseline's 12
+        self.assertAlmostEqual(data['improvement']['speed'][baseline][column], 100 * 2 / 12)
+        self.assertLess(data['improvement']['speed'][column][baseline], 0)
+
+
+class SignificanceTests(TestCase):
+    """Bootstrap intervals and permutation p-values for comparisons"""
+
+    def test_clear_and_no_difference(self):
+        baseline = [10, 11, 12, 13, 14] * 4
+        shifted = compare_samples(baseline, [value - 5 for value in baseline], seed=1)
+        self.assertLess(shifted['p_value'], 0.01)
+        low, high = shifted['improvement_ci']
+        self.assertTrue(0 < low < 5 / 12 * 100 < high)
+        self.assertEqual(compare_samples(baseline, baseline, seed=1)['p_value'], 1)
+        self.assertIsNone(compare_samples([1], [2]))
+
+    def test_large_samples_get_fewer_resamples(self):
+        with self.settings(SIGNIFICANCE_MAX_DRAWS=200_000):
+            result = compare_samples(range(1, 501), range(1, 501), count=2000, seed=1)
+        self.assertEqual(result['resamples'], 200)
+
+    def test_large_samples_use_welch(self):
+        rng = np.random.default_rng(1)
+        baseline = rng.normal(100, 10, 10_000)
+        result = compare_samples(baseline, rng.normal(99, 10, 10_000))
+        self.assertEqual((result['method'], result['resamples']), ('welch', None))
+        self.assertLess(result['p_value'], 1e-6)
+        low, high = result['improvement_ci']
+        self.assertTrue(0 < low < 1 < high < 2)
+        self.assertEqual(compare_samples(baseline, baseline)['p_value'], 1)
+
+    def test_comparison_view(self):
+        simulations = seed_query_plan_data()
+        baseline, ai = simulations[0], simulations[1]
+        self.client.post(reverse('comparison'), {
+            'baseline': baseline.id, 'ai_simulation': ai.id, 'statistical_analysis': 'on',
+        })
+        data = Comparison.objects.get().comparison_data
+        self.assertEqual(data['delay']['significance']['samples'], [5, 5])
+        self.assertEqual(data['delay']['significance']['p_value'], 1)
+
+        # Cached until the scenario's metrics change
+        post = {'baseline': baseline.id, 'ai_simulation': ai.id, 'statistical_analysis': 'on'}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('comparison'), post)
+        self.assertFalse([query for query in queries if 'core_metric' in query['sql'] and 'AVG' not in query['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.create(simulation=ai, metric_type='delay', value=99, unit='hours')
+        self.client.post(reverse('comparison'), post)
+        data = Comparison.objects.get().comparison_data
+        self.assertEqual(data['delay']['significance']['samples'], [5, 6])
+
+        # Running simulations' metrics move the key too
+        running = simulations[2]
+        post = {'baseline': baseline.id, 'ai_simulation': running.id, 'statistical_analysis': 'on'}
+        self.client.post(reverse('comparison'), post)
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.create(simulation=running, metric_type='delay', value=99, unit='hours')
+        self.client.post(reverse('comparison'), post)
+        data = Comparison.objects.get(ai_simulation=running).comparison_data
+        self.assertEqual(data['delay']['significance']['samples'], [5, 6])
+
+
+class ScenarioStatsTests(TestCase):
+    """Scenario statistics come from one grouped query and are cached"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.running = next(sim for sim in cls.simulations if sim.status == 'running')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_one_query_then_cached(self):
+        scenario_ids = list(Scenario.objects.values_list('id', flat=True))
+        with self.assertNumQueries(1):
+            stats = get_scenario_stats(scenario_ids)
+        self.assertEqual(len(stats), 3)
+        stat = stats[self.running.scenario_id]
+        self.assertEqual(
+            (stat['total_simulations'], stat['completed_simulations'], stat['running_simulations'], stat['failed_simulations']),
+            (3, 2, 1, 0)
+        )
+        self.assertEqual(stat['best_improvement'], 20)
+        with self.assertNumQueries(0):
+            get_scenario_stats(scenario_ids)
+        # The list page: scenarios plus the cached statistics
+        with self.assertNumQueries(1):
+            self.client.get(reverse('scenario_list'))
+
+    def test_status_change_invalidates(self):
+        get_scenario_stats([self.running.scenario_id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.running.status = 'failed'
+            self.running.save(update_fields=['status'])
+        stat = get_scenario_stats([self.running.scenario_id])[self.running.scenario_id]
+        self.assertEqual((stat['running_simulations'], stat['failed_simulations']), (0, 1))
+
+
+class KeysetPaginationTests(TestCase):
+    """Pages are (created_at, id) ranges reachable in both directions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_query_plan_data()
+        # Identical timestamps must still page by id
+        Simulation.objects.update(created_at=timezone.now())
+
+    def page(self, **params):
+        request = RequestFactory().get('/', params)
+        return paginate(request, Simulation.objects.all(), 4, count_key='test')
+
+    def test_walk_forward_and_back(self):
+        newest = list(Simulation.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        first = self.page()
+        self.assertEqual([sim.id for sim in first], newest[:4])
+        self.assertFalse(first.has_previous)
+        second = self.page(after=first.next_cursor)
+        self.assertEqual([sim.id for sim in second], newest[4:8])
+        third = self.page(after=second.next_cursor)
+        self.assertEqual([sim.id for sim in third], newest[8:])
+        self.assertFalse(third.has_next)
+        back = self.page(before=third.previous_cursor)
+        self.assertEqual([sim.id for sim in back], newest[4:8])
+        self.assertTrue(back.has_previous)
+        self.assertEqual(self.page(before=back.previous_cursor).object_list, first.object_list)
+        self.assertEqual(first.count, 9)
+
+    def test_bad_cursor_starts_over(self):
+        self.assertEqual(len(self.page(after='nonsense')), 4)
+        self.assertEqual(len(self.page(after='99999999999999999999-1')), 4)
+        self.assertEqual(len(self.page(before='1-99999999999999999999')), 4)
+        self.client.force_login(User.objects.get(username='planner'))
+        response = self.client.get(reverse('results_list'), {'after': '99999999999999999999-1'})
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricSeriesTests(TestCase):
+    """Metric series are downsampled to the requested size and cached"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = seed_query_plan_data()[0]
+        start = timezone.now() - timedelta(hours=1)
+        Metric.objects.bulk_create([
+            Metric(simulation=cls.simulation, metric_type='congestion', value=1000 if i == 700 else i % 50,
+                   unit='%', timestamp=start + timedelta(seconds=i))
+            for i in range(1000)
+        ])
+        cls.url = reverse('api_metric_series', args=[cls.simulation.id, 'congestion'])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_downsampled_and_cached(self):
+        data = self.client.get(self.url, {'points': 100}).json()
+        self.assertEqual((len(data['t']), len(data['v']), data['raw_count']), (100, 100, 1005))
+        self.assertEqual(data['t'], sorted(data['t']))
+        self.assertIn(1000, data['v'])  # the spike survives
+        with self.assertNumQueries(1):  # just the simulation lookup
+            self.client.get(self.url, {'points': 100})
+
+    def test_new_metric_invalidates(self):
+        self.client.get(self.url, {'points': 2000})
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.create(simulation=self.simulation, metric_type='congestion', value=1, unit='%')
+        self.assertEqual(self.client.get(self.url, {'points': 2000}).json()['raw_count'], 1006)
+
+    def test_unknown_type(self):
+        response = self.client.get(reverse('api_metric_series', args=[self.simulation.id, 'nonsense']))
+        self.assertEqual(response.status_code, 400)
+
+
+class TrainingCurveTests(TestCase):
+    """Training curves are appended per epoch and read by range and stride"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = seed_query_plan_data()[1]
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = self.settings(TRAINING_CURVE_ROOT=root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_append_and_read(self):
+        url = reverse('api_update_simulation', args=[self.simulation.id])
+        for epoch in range(10):
+            self.client.post(url, json.dumps({'curves': {'training_loss': 1 / (epoch + 1)}}),
+                             content_type='application/json')
+        store = CurveStore(self.simulation.id)
+        self.assertEqual(store.epochs('training_loss'), 10)
+        self.assertEqual(store.read('training_loss', 2, 8, 3).tolist(), [0.3333333432674408, 0.1666666716337204])
+
+        data = self.client.get(reverse('api_training_curves', args=[self.simulation.id]), {'step': 5}).json()
+        self.assertEqual(data['epochs']['training_loss'], 10)
+        self.assertEqual(data['curves']['training_loss'], [1.0, 0.1666666716337204])
+        self.assertEqual(data['curves']['validation_loss'], [])
+        self.assertEqual(len(Result.objects.get(simulation=self.simulation).training_loss), 10)
+
+    def test_append_after_torn_tail(self):
+        store = CurveStore(self.simulation.id)
+        store.append('training_loss', [0.5, 0.25])
+        with open(store.path / 'training_loss.f32', 'ab') as fh:
+            fh.write(b'\x01\x02')  # half a value from an interrupted append
+        self.assertEqual(store.epochs('training_loss'), 2)
+        store.append('training_loss', 0.125)
+        self.assertEqual(store.read('training_loss').tolist(), [0.5, 0.25, 0.125])
+
+    def test_unknown_curve(self):
+        response = self.client.post(reverse('api_update_simulation', args=[self.simulation.id]),
+                                    json.dumps({'curves': {'reward': 1}}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_values_append_nothing(self):
+        url = reverse('api_update_simulation', args=[self.simulation.id])
+        for values in ['high', None, [0.5, None], {'loss': 1}, True, 1e39]:
+            response = self.client.post(url, json.dumps({'curves': {'training_loss': 0.5, 'validation_loss': values}}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, '{"curves": {"training_loss": NaN}}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CurveStore(self.simulation.id).epochs('training_loss'), 0)
+
+
+class MetricRollupTests(TestCase):
+    """Minute and hour rollups follow new metrics and match a rebuild"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+
+    def rollups(self):
+        return sorted(MetricRollup.objects.values_list(
+            'simulation_id', 'metric_type', 'resolution', 'bucket', 'count', 'sum', 'min', 'max'
+        ))
+
+    def test_bucketed_matches_raw(self):
+        buckets = bucketed('speed', timezone.now() - timedelta(hours=6))
+        self.assertEqual(sum(row['count'] for row in buckets), 45)
+        self.assertEqual(sum(row['sum'] for row in buckets), 45 * 12)
+        self.assertEqual(min(row['min'] for row in buckets), 10)
+
+    def test_ingest_matches_compaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for value in (3, 30):
+                Metric.objects.create(simulation=self.simulations[0], metric_type='speed', value=value, unit='km/h')
+        incremental = self.rollups()
+        self.assertEqual(compact_rollups(), len(incremental))
+        self.assertEqual(self.rollups(), incremental)
+        latest = MetricRollup.objects.filter(
+            simulation=self.simulations[0], metric_type='speed', resolution='minute'
+        ).latest('bucket')
+        self.assertEqual((latest.min, latest.max), (3, 30))
+
+
+    def test_edit_and_delete_rebuild_only_their_hours(self):
+        simulation = self.simulations[0]
+        metric = Metric.objects.filter(simulation=simulation, metric_type='speed').first()
+        other_hour = MetricRollup.objects.create(
+            simulation=simulation, metric_type='speed', resolution='hour',
+            bucket=floor_bucket(timezone.now() - timedelta(days=1), 'hour'), count=1, sum=1, min=1, max=1,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            metric.timestamp -= timedelta(hours=3)
+            metric.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.filter(simulation=simulation, metric_type='delay', value=14).delete()
+        # Untouched hours keep their rows, hand-made or not
+        self.assertTrue(MetricRollup.objects.filter(id=other_hour.id).exists())
+        other_hour.delete()
+        incremental = self.rollups()
+        compact_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+
+class CsvExportTests(TestCase):
+    """CSV exports stream metrics and, on request, the trajectory history"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = next(sim for sim in seed_query_plan_data() if sim.status == 'completed')
+        cls.url = reverse('export_csv', args=[cls.simulation.id])
+
+    def test_streamed_with_stored_summary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.get(simulation=self.simulation).save()
+        result = Result.objects.get(simulation=self.simulation)
+        self.assertEqual(len(result.csv_data.splitlines()), 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+            content = b''.join(response.streaming_content).decode()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        lines = content.splitlines()
+        self.assertTrue(content.startswith(result.csv_data))
+        self.assertEqual(lines[0], 'Metric,Value,Unit,Baseline Value,Improvement %,Timestamp')
+        self.assertEqual(lines.count('Detailed Metrics'), 1)
+        self.assertEqual(len(lines), 5 + 3 + 30)
+        self.assertNotIn('Vehicle Trajectories', lines)
+
+    def test_summary_etag_follows_metric_writes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Metric.objects.create(simulation=self.simulation, metric_type='delay', value=99, unit='hours')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('99.00', b''.join(response.streaming_content).decode())
+
+    async def test_streamed_under_asgi(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await self.async_client.get(self.url, {'vehicles': '1'})
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertFalse([w for w in caught if 'StreamingHttpResponse' in str(w.message)])
+        self.assertGreater(len(chunks), 2)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(lines) - lines.index('Vehicle Trajectories') - 2, 20)
+
+    def test_vehicles_gzipped(self):
+        response = self.client.get(self.url, {'vehicles': '1', 'gzip': '1'})
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        start = lines.index('Vehicle Trajectories')
+        self.assertEqual(len(lines) - start - 2, 20)
+        self.assertTrue(lines[start + 2].startswith('V'))
+
+
+class TrajectoryStoreTests(TestCase):
+    """Columnar trajectories read back by vehicle and range, and survive torn appends"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.store = TrajectoryStore(1, root=root.name)
+        self.start = timezone.now().replace(microsecond=0)
+
+    def samples(self, count, offset=0):
+        return [
+            {'vehicle_id': f'V{i % 3}', 'vehicle_type': 'car', 'lat': -1.0, 'lng': 36.0,
+             'speed': float(offset + i), 'heading': 90.0, 'timestamp': self.start + timedelta(seconds=offset + i)}
+            for i in range(count)
+        ]
+
+    def test_append_and_read(self):
+        self.assertEqual(self.store.append(self.samples(10)), 10)
+        self.assertEqual(len(self.store), 10)
+        self.assertEqual([s.speed for s in self.store.latest(3)], [9.0, 8.0, 7.0])
+        self.assertEqual([s.speed for s in self.store.query(vehicle_id='V1', newest_first=False)], [1.0, 4.0, 7.0])
+
+    def test_range(self):
+        self.store.append(self.samples(10))
+        rows = self.store.query(start=self.start + timedelta(seconds=2), end=self.start + timedelta(seconds=5),
+                                newest_first=False)
+        self.assertEqual([s.speed for s in rows], [2.0, 3.0, 4.0])
+        chunked = self.store.iter_samples(chunk_size=3, start=self.start + timedelta(seconds=2))
+        self.assertEqual([s.row for s in chunked], list(range(2, 10)))
+
+    def test_torn_append(self):
+        self.store.append(self.samples(5))
+        # A crash mid-append: some columns got a row, one got half of one
+        for name in ('vehicle', 'timestamp', 'lat'):
+            with open(self.store.path / FILE_NAMES[name], 'ab') as fh:
+                fh.write(b'\x01' * 10)
+        self.assertEqual(len(self.store), 5)
+
+        self.store.append(self.samples(3, offset=5))
+        self.assertEqual(len(self.store), 8)
+        self.assertEqual([s.speed for s in self.store.iter_samples(chunk_size=3)], [float(i) for i in range(8)])
+        self.assertEqual([s.vehicle_id for s in self.store.latest(2)], ['V2', 'V1'])
+
+
+class ColumnarExportTests(TestCase):
+    """Columnar exports load back as typed arrays without parsing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = next(sim for sim in seed_query_plan_data() if sim.status == 'completed')
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+
+    def test_directory_round_trip(self):
+        path = f'{self.root}/export'
+        call_command('export_columnar', self.simulation.id, output=path, stdout=io.StringIO())
+        export = load_columnar(path)
+        self.assertIsInstance(export['metrics.value'], np.memmap)
+        self.assertEqual(len(export['metrics.value']), 30)
+        self.assertEqual(set(export.decoded('metrics.metric_type', 'metric_types')), {
+            'travel_time', 'delay', 'fuel', 'emissions', 'speed', 'congestion'
+        })
+        self.assertEqual(export['vehicles.speed'].dtype, np.float32)
+        self.assertEqual(export.strings('vehicle_ids'), [f'V{i}' for i in range(20)])
+        self.assertEqual(export.strings('logs.message')[0], 'Step 0')
+        self.assertEqual(export.manifest['result']['avg_travel_time'], 40)
+
+    def test_npz_download(self):
+        response = self.client.get(reverse('export_npz', args=[self.simulation.id]))
+        path = f'{self.root}/download.npz'
+        with open(path, 'wb') as fh:
+            fh.write(b''.join(response.streaming_content))
+        export = load_columnar(path)
+        self.assertEqual(export.manifest['simulation']['id'], self.simulation.id)
+        self.assertEqual(float(export['metrics.value'].mean()), 12)
+
+
+class PdfReportTests(TestCase):
+    """Reports are served from MEDIA_ROOT until their Result changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulation = next(sim for sim in seed_query_plan_data() if sim.status == 'completed')
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media = override_settings(MEDIA_ROOT=root.name, TRAINING_CURVE_ROOT=f'{root.name}/curves')
+        media.enable()
+        self.addCleanup(media.disable)
+        self.result = Result.objects.get(simulation=self.simulation)
+        self.url = reverse('export_pdf', args=[self.simulation.id])
+
+    def store_report(self, content=b'%PDF-1.4 cached'):
+        name = pdf_reports.report_name(self.result)
+        path = pdf_reports.report_file(name)
+        path.parent.mkdir(parents=True)
+        path.write_bytes(content)
+        Result.objects.filter(id=self.result.id).update(pdf_report_path=name)
+        self.result.refresh_from_db()
+        return path
+
+    def test_current_report_is_served(self):
+        self.store_report()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 cached')
+
+    def test_changed_result_makes_report_stale(self):
+        self.store_report()
+        self.result.save()
+        self.assertIsNone(pdf_reports.cached_report(self.result))
+        if not pdf_reports.available():
+            response = self.client.get(self.url)
+            self.assertRedirects(response, reverse('results', args=[self.simulation.id]))
+
+    def test_appended_curve_makes_report_stale(self):
+        self.store_report()
+        self.client.post(reverse('api_update_simulation', args=[self.simulation.id]),
+                         json.dumps({'curves': {'training_loss': 0.5}}), content_type='application/json')
+        self.result.refresh_from_db()
+        self.assertIsNone(pdf_reports.cached_report(self.result))
+
+    def test_report_removed_with_result(self):
+        path = self.store_report()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.result.delete()
+        self.assertFalse(path.exists())
+
+    @unittest.skipUnless(pdf_reports.available(), 'matplotlib is not installed')
+    def test_generate_replaces_previous_version(self):
+        old = self.store_report()
+        self.result.save()
+        name = pdf_reports.generate(self.result.id)
+        self.result.refresh_from_db()
+        self.assertEqual(self.result.pdf_report_path, name)
+        self.assertTrue(pdf_reports.report_file(name).read_bytes().startswith(b'%PDF'))
+        self.assertFalse(old.exists())
+
+
+@override_settings(BULK_EXPORT_WORKERS=1)
+class BulkExportTests(TestCase):
+    """Bulk exports stream one CSV per selected simulation inside a ZIP"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.simulations = seed_query_plan_data()
+        cls.scenario_id = cls.simulations[0].scenario_id
+
+    def test_scenario_archive(self):
+        response = self.client.get(reverse('export_bulk'), {'scenario': self.scenario_id})
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        results = Result.objects.filter(simulation__scenario_id=self.scenario_id).select_related('simulation')
+        self.assertEqual(len(archive.namelist()), len(results))
+        for result in results:
+            content = archive.read(bulk_export.member_name(result.simulation)).decode()
+            export = self.client.get(reverse('export_csv', args=[result.simulation_id]))
+            self.assertEqual(content, b''.join(export.streaming_content).decode())
+
+    async def test_streamed_under_asgi(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await self.async_client.get(reverse('export_bulk'), {'vehicles': '1'})
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertFalse([w for w in caught if 'StreamingHttpResponse' in str(w.message)])
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertEqual(len(archive.namelist()), 6)
+        self.assertGreater(len(chunks), len(archive.namelist()))
+
+    def test_export_writes_nothing(self):
+        Result.objects.update(csv_data='', csv_hash='')
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(self.client.get(reverse('export_bulk')).streaming_content)
+        self.assertFalse([query for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))])
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse('export_bulk'), {'start': '16/10/2026'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_filters_by_algorithm(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = f'{root}/baselines.zip'
+            call_command('export_bulk', algorithm='baseline', output=path, stdout=io.StringIO())
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(len(archive.namelist()), 3)
+
+    def test_parallel_members_keep_order(self):
+        def chunks(i):
+            for j in range(bulk_export.BUFFER_CHUNKS * 3):
+                yield f'{i}:{j}\n'
+
+        members = ((f'{i}.csv', lambda i=i: chunks(i)) for i in range(6))
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(
+            bulk_export.zip_chunks(bulk_export.parallel_members(members, 3))
+        )))
+        self.assertEqual(archive.namelist(), [f'{i}.csv' for i in range(6)])
+        self.assertEqual(archive.read('4.csv').decode(), ''.join(chunks(4)))
+
+    def test_parallel_member_errors_surface(self):
+        def failing():
+            yield 'partial\n'
+            raise ValueError('boom')
+
+        members = bulk_export.parallel_members([('a.csv', failing)], 2)
+        name, chunks = next(members)
+        with self.assertRaisesMessage(ValueError, 'boom'):
+            list(chunks)
+        members.close()
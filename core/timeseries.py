@@ -0,0 +1,96 @@
+"""
+Downsampled metric time series for charts.
+
+A (simulation, metric type) series is reduced server-side with
+Largest-Triangle-Three-Buckets to at most the number of points a chart
+asks for, so the payload does not grow with the length of the run.
+Downsampled series are cached per resolution under the simulation's
+``metric_series`` version, which every Metric write bumps.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from . import cache_versions
+from .models import Metric
+from .trajectory_store import to_micros
+
+CACHE_PREFIX = 'metric_series'
+VERSION_NAMESPACE = 'metric_series'
+
+DEFAULT_POINTS = 500
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+
+def cache_timeout():
+    return getattr(settings, 'METRIC_SERIES_CACHE_TIMEOUT', 3600)
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the ``threshold`` points Largest-Triangle-Three-Buckets keeps
+    from the series ``(x, y)`` (x ascending). The first and last points are
+    always kept; each bucket in between keeps the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n)
+
+    # Bucket boundaries over the inner points, and every bucket's average
+    # (the "third point" of the triangle) computed up front
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    lengths = ends - starts
+    averages_x = np.add.reduceat(x[:n - 1], starts) / lengths
+    averages_y = np.add.reduceat(y[:n - 1], starts) / lengths
+    # The last bucket looks ahead to the final point
+    next_x = np.append(averages_x[1:], x[-1])
+    next_y = np.append(averages_y[1:], y[-1])
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(len(starts)):
+        start, end = starts[bucket], ends[bucket]
+        bx, by = x[start:end], y[start:end]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (by - y[previous])
+            - (x[previous] - bx) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def _load(simulation_id, metric_type):
+    rows = list(Metric.objects.filter(
+        simulation_id=simulation_id, metric_type=metric_type
+    ).order_by('timestamp').values_list('timestamp', 'value'))
+    times = np.fromiter((to_micros(timestamp) for timestamp, _ in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((value for _, value in rows), dtype=float, count=len(rows))
+    return times, values
+
+
+def get_series(simulation_id, metric_type, points=DEFAULT_POINTS):
+    """{'t': [epoch ms], 'v': [values], 'raw_count': n}, at most ``points`` long"""
+    points = max(MIN_POINTS, min(points, MAX_POINTS))
+    version = cache_versions.get(VERSION_NAMESPACE, simulation_id)
+    key = f'{CACHE_PREFIX}:{simulation_id}:{metric_type}:{points}:{version}'
+    series = cache.get(key)
+    if series is None:
+        times, values = _load(simulation_id, metric_type)
+        kept = lttb(times.astype(float), values, points)
+        series = {
+            't': (times[kept] // 1000).tolist(),
+            'v': values[kept].tolist(),
+            'raw_count': len(times),
+        }
+        cache.set(key, series, timeout=cache_timeout())
+    return series
+
+
+def invalidate(simulation_id):
+    cache_versions.bump_on_commit(VERSION_NAMESPACE, simulation_id)
@@ -0,0 +1,383 @@
+"""
+Append-only columnar storage for vehicle trajectories.
+
+Each simulation gets a directory under ``TRAJECTORY_ROOT`` holding one raw
+binary file per column plus two small JSON dictionaries:
+
+    vehicle.i32     index into vehicles.json
+    timestamp.i64   microseconds since the Unix epoch (UTC)
+    lat.f32, lng.f32, speed.f32, heading.f32
+    type.u8         index into meta.json["types"]
+    vehicles.json   vehicle_id strings, position == index
+    meta.json       type dictionary and whether timestamps are sorted
+
+Rows are appended with plain binary writes and read back through
+``numpy.memmap``, so queries only page in the columns they touch.
+"""
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Vehicle
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+COLUMNS = {
+    'vehicle': np.dtype('<i4'),
+    'timestamp': np.dtype('<i8'),
+    'lat': np.dtype('<f4'),
+    'lng': np.dtype('<f4'),
+    'speed': np.dtype('<f4'),
+    'heading': np.dtype('<f4'),
+    'type': np.dtype('u1'),
+}
+
+FILE_NAMES = {name: f'{name}.{dtype.kind}{dtype.itemsize * 8}' for name, dtype in COLUMNS.items()}
+
+VEHICLE_TYPES = [choice for choice, _ in Vehicle.VEHICLE_TYPES]
+VEHICLE_TYPE_LABELS = dict(Vehicle.VEHICLE_TYPES)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def trajectory_root():
+    return Path(getattr(settings, 'TRAJECTORY_ROOT', settings.BASE_DIR / 'trajectories'))
+
+
+def columnar_enabled():
+    """True when new trajectory samples should go to the columnar store"""
+    return getattr(settings, 'TRAJECTORY_BACKEND', 'orm') == 'columnar'
+
+
+def to_micros(value):
+    """Convert an aware datetime to integer microseconds since the epoch"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(value):
+    return datetime.fromtimestamp(int(value) / 1_000_000, tz=dt_timezone.utc)
+
+
+class TrajectorySample:
+    """One trajectory row, shaped like a Vehicle for templates and exports"""
+    __slots__ = ('row', 'vehicle_id', 'vehicle_type', 'lat', 'lng', 'speed', 'heading', 'timestamp')
+
+    def __init__(self, row, vehicle_id, vehicle_type, lat, lng, speed, heading, timestamp):
+        self.row = row
+        self.vehicle_id = vehicle_id
+        self.vehicle_type = vehicle_type
+        self.lat = lat
+        self.lng = lng
+        self.speed = speed
+        self.heading = heading
+        self.timestamp = timestamp
+
+    def get_vehicle_type_display(self):
+        return VEHICLE_TYPE_LABELS.get(self.vehicle_type, self.vehicle_type)
+
+    def __str__(self):
+        return f"{self.vehicle_id} ({self.get_vehicle_type_display()})"
+
+
+class TrajectoryStore:
+    """Columnar trajectory files for one simulation"""
+
+    def __init__(self, simulation_id, root=None):
+        self.simulation_id = simulation_id
+        self.path = Path(root or trajectory_root()) / f'simulation_{simulation_id}'
+        self._vehicle_ids = None
+        self._meta = None
+
+    # ------------------------------------------------------------------
+    # Dictionaries
+    # ------------------------------------------------------------------
+
+    def _read_json(self, name, default):
+        try:
+            with open(self.path / name, encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name, data):
+        tmp = self.path / f'{name}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        os.replace(tmp, self.path / name)
+
+    @property
+    def vehicle_ids(self):
+        if self._vehicle_ids is None:
+            self._vehicle_ids = self._read_json('vehicles.json', [])
+        return self._vehicle_ids
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            self._meta = self._read_json('meta.json', {'types': VEHICLE_TYPES, 'sorted': True})
+        return self._meta
+
+    def vehicle_index(self, vehicle_id):
+        try:
+            return self.vehicle_ids.index(vehicle_id)
+        except ValueError:
+            return None
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _locked(self):
+        with _locks_guard:
+            lock = _locks.setdefault(self.path, threading.Lock())
+        with lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self.path / '.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, samples):
+        """
+        Append cleaned samples (dicts with vehicle_id, vehicle_type, lat, lng,
+        speed, heading and an optional timestamp). Returns rows written.
+        """
+        if not samples:
+            return 0
+
+        now = to_micros(timezone.now())
+        with self._locked():
+            # Another process may have appended since we last looked
+            self._vehicle_ids = None
+            self._meta = None
+            vehicle_ids = self.vehicle_ids
+            known_vehicles = len(vehicle_ids)
+            lookup = {vehicle_id: index for index, vehicle_id in enumerate(vehicle_ids)}
+            types = self.meta['types']
+
+            vehicle_col = np.empty(len(samples), dtype=COLUMNS['vehicle'])
+            type_col = np.empty(len(samples), dtype=COLUMNS['type'])
+            timestamps = np.empty(len(samples), dtype=COLUMNS['timestamp'])
+            for i, sample in enumerate(samples):
+                index = lookup.get(sample['vehicle_id'])
+                if index is None:
+                    index = lookup[sample['vehicle_id']] = len(vehicle_ids)
+                    vehicle_ids.append(sample['vehicle_id'])
+                vehicle_col[i] = index
+                type_col[i] = types.index(sample['vehicle_type'])
+                timestamp = sample.get('timestamp')
+                timestamps[i] = to_micros(timestamp) if timestamp else now
+
+            columns = {
+                'vehicle': vehicle_col,
+                'type': type_col,
+                'timestamp': timestamps,
+            }
+            for name in ('lat', 'lng', 'speed', 'heading'):
+                columns[name] = np.fromiter(
+                    (sample[name] for sample in samples), dtype=COLUMNS[name], count=len(samples)
+                )
+
+            # Track whether timestamps stay sorted so range queries can bisect
+            previous = len(self)
+            self._truncate(previous)
+            sorted_ = self.meta.get('sorted', True) and bool(np.all(np.diff(timestamps) >= 0))
+            if sorted_ and previous:
+                sorted_ = int(self._column('timestamp', previous)[-1]) <= int(timestamps[0])
+
+            # Dictionaries first: rows never reference an unknown vehicle
+            if len(vehicle_ids) != known_vehicles:
+                self._write_json('vehicles.json', vehicle_ids)
+            if sorted_ != self.meta.get('sorted', True) or not (self.path / 'meta.json').exists():
+                self.meta['sorted'] = sorted_
+                self._write_json('meta.json', self.meta)
+
+            for name, values in columns.items():
+                with open(self.path / FILE_NAMES[name], 'ab') as fh:
+                    values.tofile(fh)
+
+        return len(samples)
+
+    def _truncate(self, length):
+        """Cut every column to ``length`` rows, dropping the tail of a torn append"""
+        for name, dtype in COLUMNS.items():
+            path = self.path / FILE_NAMES[name]
+            try:
+                if os.path.getsize(path) != length * dtype.itemsize:
+                    os.truncate(path, length * dtype.itemsize)
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        # A crash mid-append can leave columns of different lengths; only
+        # rows present in every column count.
+        lengths = []
+        for name, dtype in COLUMNS.items():
+            try:
+                lengths.append(os.path.getsize(self.path / FILE_NAMES[name]) // dtype.itemsize)
+            except FileNotFoundError:
+                return 0
+        return min(lengths)
+
+    def exists(self):
+        return len(self) > 0
+
+    def _column(self, name, length=None):
+        length = len(self) if length is None else length
+        if length == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self.path / FILE_NAMES[name], dtype=COLUMNS[name], mode='r', shape=(length,))
+
+    def column(self, name):
+        """Read-only memory-mapped view of one column"""
+        return self._column(name)
+
+    def _bounds(self, length, start=None, end=None):
+        """
+        ``(lo, hi)`` row range of a [start, end) time range found by
+        bisecting sorted timestamps, or None when they are unsorted.
+        """
+        lo, hi = 0, length
+        if start is None and end is None:
+            return lo, hi
+        if not self.meta.get('sorted', True):
+            return None
+        timestamps = self._column('timestamp', length)
+        if start is not None:
+            lo = int(np.searchsorted(timestamps, to_micros(start), side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(timestamps, to_micros(end), side='left'))
+        return lo, hi
+
+    def select(self, vehicle_id=None, start=None, end=None):
+        """
+        Row indices matching a vehicle and/or a [start, end) time range,
+        in storage (append) order.
+        """
+        length = len(self)
+        bounds = self._bounds(length, start, end)
+        lo, hi = bounds or (0, length)
+
+        mask = None
+        if bounds is None:
+            window = self._column('timestamp', length)
+            mask = np.ones(length, dtype=bool)
+            if start is not None:
+                mask &= window >= to_micros(start)
+            if end is not None:
+                mask &= window < to_micros(end)
+
+        if vehicle_id is not None:
+            index = self.vehicle_index(vehicle_id)
+            if index is None:
+                return np.empty(0, dtype=np.int64)
+            matches = self._column('vehicle', length)[lo:hi] == index
+            mask = matches if mask is None else mask & matches
+
+        if mask is None:
+            return np.arange(lo, hi, dtype=np.int64)
+        return np.flatnonzero(mask) + lo
+
+    def arrays(self, rows=None, columns=None):
+        """Dict of column arrays for ``rows`` (all rows when None)"""
+        length = len(self)
+        result = {}
+        for name in columns or COLUMNS:
+            column = self._column(name, length)
+            result[name] = np.asarray(column if rows is None else column[rows])
+        return result
+
+    def samples(self, rows):
+        """Materialize ``rows`` as TrajectorySample objects"""
+        data = self.arrays(rows)
+        vehicle_ids = self.vehicle_ids
+        types = self.meta['types']
+        return [
+            TrajectorySample(
+                row=int(row),
+                vehicle_id=vehicle_ids[data['vehicle'][i]],
+                vehicle_type=types[data['type'][i]],
+                lat=float(data['lat'][i]),
+                lng=float(data['lng'][i]),
+                speed=float(data['speed'][i]),
+                heading=float(data['heading'][i]),
+                timestamp=from_micros(data['timestamp'][i]),
+            )
+            for i, row in enumerate(rows)
+        ]
+
+    def query(self, vehicle_id=None, start=None, end=None, limit=None, newest_first=True):
+        """Samples for a vehicle and/or time range, newest first by default"""
+        rows = self.select(vehicle_id=vehicle_id, start=start, end=end)
+        if newest_first:
+            rows = rows[::-1]
+        if limit is not None:
+            rows = rows[:limit]
+        return self.samples(rows)
+
+    def latest(self, limit=100):
+        """The most recently appended samples, newest first"""
+        length = len(self)
+        rows = np.arange(length - 1, max(length - limit, 0) - 1, -1, dtype=np.int64)
+        return self.samples(rows)
+
+    def iter_samples(self, chunk_size=50000, vehicle_id=None, start=None, end=None):
+        """Yield samples in append order, mapping one chunk at a time"""
+        bounds = self._bounds(len(self), start, end) if vehicle_id is None else None
+        if bounds is not None:
+            # A plain row range: walk it without materializing every index
+            lo, hi = bounds
+            for offset in range(lo, hi, chunk_size):
+                yield from self.samples(np.arange(offset, min(offset + chunk_size, hi), dtype=np.int64))
+            return
+        rows = self.select(vehicle_id=vehicle_id, start=start, end=end)
+        for offset in range(0, len(rows), chunk_size):
+            yield from self.samples(rows[offset:offset + chunk_size])
+
+    def delete(self):
+        """Remove all trajectory files for this simulation"""
+        if not self.path.exists():
+            return
+        with self._locked():
+            for name in list(FILE_NAMES.values()) + ['vehicles.json', 'meta.json']:
+                try:
+                    os.remove(self.path / name)
+                except FileNotFoundError:
+                    pass
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._vehicle_ids = None
+        self._meta = None
+
+
+def recent_vehicle_samples(simulation, limit=100):
+    """Latest trajectory samples for a simulation from whichever backend holds them"""
+    store = TrajectoryStore(simulation.id)
+    if store.exists():
+        return store.latest(limit)
+    return Vehicle.objects.filter(simulation=simulation).order_by('-timestamp')[:limit]
@@ -31,10 +31,20 @@ urlpatterns = [
     
     # Export
     path('export/csv/<int:simulation_id>/', views.export_csv_view, name='export_csv'),
+    path('export/npz/<int:simulation_id>/', views.export_npz_view, name='export_npz'),
     path('export/pdf/<int:simulation_id>/', views.export_pdf_view, name='export_pdf'),
+    path('export/bulk/', views.export_bulk_view, name='export_bulk'),
 
     # API endpoints
     path('api/simulation/<int:simulation_id>/update/', views.api_update_simulation, name='api_update_simulation'),
     path('api/simulation/<int:simulation_id>/add-vehicle/', views.api_add_vehicle, name='api_add_vehicle'),
+    path('api/simulation/<int:simulation_id>/add-vehicles/', views.api_add_vehicles_batch, name='api_add_vehicles_batch'),
+    path('api/simulation/<int:simulation_id>/map/', views.api_vehicle_map, name='api_vehicle_map'),
+    path('api/simulation/<int:simulation_id>/curves/', views.api_training_curves, name='api_training_curves'),
+    path('api/simulation/<int:simulation_id>/series/<str:metric_type>/', views.api_metric_series, name='api_metric_series'),
+    path('api/simulation/<int:simulation_id>/events/', views.api_simulation_events, name='api_simulation_events'),
+    path('api/scenario/<int:scenario_id>/comparison-matrix/', views.api_comparison_matrix, name='api_comparison_matrix'),
+    path('api/vehicles/latest/', views.api_vehicles_latest, name='api_vehicles_latest'),
+    path('api/simulations/active/', views.api_active_simulations, name='api_active_simulations'),
     path('create-admin/', views.create_admin_user, name='create_admin'),
 ]
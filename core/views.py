@@ -1,170 +1,56 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
-from django.core.paginator import Paginator
-from django.db.models import Avg, Sum, Count, Q, FloatField, F, ExpressionWrapper, DurationField
+from django.views.decorators.http import condition
+from django.db.models import Avg, Sum, Count, Max, Q, FloatField, F, ExpressionWrapper, DurationField
 from django.db.models.functions import TruncHour, TruncMinute
 import json
-import csv
+import tempfile
 from datetime import datetime, timedelta
 from django.utils import timezone
 import random
 from .models import (
     Scenario, Simulation, Vehicle, Metric, 
-    Result, SimulationLog, Comparison
+    Result, SimulationLog, Comparison, VehicleState
 )
 from .forms import SimulationForm, ScenarioForm
+from .progress_buffer import progress_buffer
+from .dashboard_snapshot import get_snapshot as get_dashboard_snapshot
+from .live_feed import Cursor, simulation_event_stream
+from .trajectory_store import recent_vehicle_samples
+from .map_grid import grid_for_bbox
+from .deltas import ChangeCursor, changed_since, make_etag
+from .metrics_summary import summarize, stat
+from .result_totals import refresh_results
+from .baselines import get_baseline
+from .comparison_matrix import get_matrix as get_comparison_matrix
+from .significance import compare_simulations
+from .scenario_stats import get_stats as get_scenario_stats
+from .keyset import paginate
+from .timeseries import DEFAULT_POINTS, get_series
+from .curve_store import CURVES, CurveStore, clean_values
+from . import csv_export, pdf_reports
+from .csv_export import simulation_csv
+from .streaming import streaming_response
+from .columnar_export import write_npz
+from .bulk_export import export_archive, select_simulations
+from .ingest import (
+    PayloadError, MAX_VEHICLES_PER_REQUEST,
+    parse_vehicle_payload, ingest_vehicles, store_vehicles, validate_vehicle_sample
+)
 
 def dashboard_view(request):
     """Main dashboard with simulation controls and live visualization"""
-    # Get active simulations
-    active_simulations = Simulation.objects.filter(status='running').order_by('-created_at')[:5]
-    
-    # Get recent simulations
-    recent_simulations = Simulation.objects.select_related('scenario').order_by('-created_at')[:10]
-    
-    # Get scenarios for dropdown
-    scenarios = Scenario.objects.filter(is_active=True)
-    
-    # Calculate real metrics from database
-    time_labels = []
-    speed_data = []
-    
-    # Get real metrics from last 6 hours
-    six_hours_ago = timezone.now() - timedelta(hours=6)
-    
-    # Try to get actual metrics data
-    metrics = Metric.objects.filter(
-        metric_type='speed',
-        timestamp__gte=six_hours_ago
-    ).annotate(
-        hour=TruncHour('timestamp')
-    ).values('hour').annotate(
-        avg_speed=Avg('value')
-    ).order_by('hour')[:6]
-    
-    if metrics.exists():
-        for metric in metrics:
-            hour_time = metric['hour'].strftime('%H:%M')
-            time_labels.append(hour_time)
-            speed_data.append(float(metric['avg_speed']))
-    else:
-        # Fallback to realistic data based on time of day
-        now = timezone.now()
-        for i in range(6, 0, -1):
-            time = now - timedelta(hours=i)
-            time_labels.append(time.strftime('%H:%M'))
-            
-            # Generate realistic speed based on Kenyan traffic patterns
-            hour = time.hour
-            if 7 <= hour <= 9 or 16 <= hour <= 18:  # Peak hours
-                speed = random.uniform(15, 25)
-            elif 10 <= hour <= 15:  # Midday
-                speed = random.uniform(30, 45)
-            else:  # Off-peak
-                speed = random.uniform(45, 60)
-            speed_data.append(speed)
-    
-    # Get real-time traffic statistics
-    if active_simulations.exists():
-        # Get vehicles for the most recent active simulation
-        active_sim = active_simulations.first()
-        
-        # Get vehicle count
-        vehicle_count = Vehicle.objects.filter(simulation=active_sim).count()
-        
-        # Get average speed
-        avg_speed_result = Vehicle.objects.filter(
-            simulation=active_sim,
-            timestamp__gte=timezone.now() - timedelta(minutes=5)
-        ).aggregate(avg_speed=Avg('speed'))
-        avg_speed = avg_speed_result['avg_speed'] or 0
-        
-        # Get congestion level based on average speed
-        if avg_speed < 15:
-            congestion_level = 'HIGH'
-        elif avg_speed < 30:
-            congestion_level = 'MEDIUM'
-        else:
-            congestion_level = 'LOW'
-            
-        # Get latest delay from metrics
-        latest_delay = Metric.objects.filter(
-            simulation=active_sim,
-            metric_type='delay'
-        ).order_by('-timestamp').first()
-        
-        avg_delay = f"{latest_delay.value:.0f} min" if latest_delay else "N/A"
-        
-    else:
-        # Use aggregated data from recent completed simulations
-        vehicle_count = Vehicle.objects.filter(
-            timestamp__gte=timezone.now() - timedelta(hours=1)
-        ).count()
-        
-        recent_vehicles = Vehicle.objects.filter(
-            timestamp__gte=timezone.now() - timedelta(minutes=30)
-        )
-        if recent_vehicles.exists():
-            avg_speed_result = recent_vehicles.aggregate(avg_speed=Avg('speed'))
-            avg_speed = avg_speed_result['avg_speed'] or 32.5
-        else:
-            avg_speed = 32.5
-            
-        congestion_level = 'MEDIUM'
-        avg_delay = '45 min'
-    
-    # Get real key findings from completed simulations with results
-    key_findings = []
-    
-    # Get best performing AI simulations
-    best_results = Result.objects.select_related('simulation').filter(
-        simulation__algorithm__in=['rl_optimized', 'ga_optimized', 'hybrid']
-    ).order_by('-improvement_travel_time')[:3]
-    
-    if best_results.exists():
-        for result in best_results:
-            if result.improvement_travel_time > 20:
-                key_findings.append({
-                    'title': 'Travel Time Reduction',
-                    'description': f'{result.simulation.get_algorithm_display()} reduced average travel time by {result.improvement_travel_time:.1f}%',
-                    'improvement': result.improvement_travel_time
-                })
-            if result.fuel_saving > 20:
-                key_findings.append({
-                    'title': 'Fuel Savings',
-                    'description': f'{result.simulation.get_algorithm_display()} reduced fuel consumption by {result.fuel_saving:.1f}%',
-                    'improvement': result.fuel_saving
-                })
-            if result.emissions_reduction > 20:
-                key_findings.append({
-                    'title': 'Emissions Reduction',
-                    'description': f'{result.simulation.get_algorithm_display()} reduced CO₂ emissions by {result.emissions_reduction:.1f}%',
-                    'improvement': result.emissions_reduction
-                })
-    else:
-        # Fallback to default findings if no real results yet
-        key_findings = [
-            {'title': 'Travel Time Reduction', 'description': 'AI optimization reduces average travel time by 28%', 'improvement': 28},
-            {'title': 'Fuel Savings', 'description': 'Reduced fuel consumption by 29% in peak hours', 'improvement': 29},
-            {'title': 'Emissions Reduction', 'description': 'CO₂ emissions reduced by 27% through optimized routing', 'improvement': 27},
-        ]
+    # Every number comes from the precomputed snapshot; only sections
+    # invalidated since the last load are rebuilt
+    snapshot = get_dashboard_snapshot()
     
     context = {
         'title': 'MATAFITI - Traffic Simulation Dashboard',
         'project_name': 'MATAFITI Traffic AI',
-        'active_simulations': active_simulations,
-        'recent_simulations': recent_simulations,
-        'scenarios': scenarios,
-        'time_labels': json.dumps(time_labels),
-        'speed_data': json.dumps(speed_data),
-        'key_findings': key_findings,
-        'vehicle_count': vehicle_count,
-        'avg_speed': avg_speed,
-        'congestion_level': congestion_level,
-        'avg_delay': avg_delay,
+        **snapshot,
         'now': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
     }
     return render(request, 'core/dashboard.html', context)
@@ -220,59 +106,13 @@ def results_view(request, simulation_id=None):
     if simulation_id:
         simulation = get_object_or_404(Simulation.objects.select_related('scenario'), id=simulation_id)
         
-        # Get actual results
-        try:
+        # Results are computed when a run stops. New metrics only update the
+        # running totals, so for a run still going (or one that never
+        # finished) the Result is built from those totals on every view
+        result = Result.objects.filter(simulation=simulation).first()
+        if result is None or simulation.status == 'running':
+            refresh_results(simulation)
             result = Result.objects.get(simulation=simulation)
-        except Result.DoesNotExist:
-            # Calculate real metrics from simulation data
-            metrics = Metric.objects.filter(simulation=simulation)
-            
-            # Try to get baseline for comparison
-            baseline_simulation = Simulation.objects.filter(
-                scenario=simulation.scenario,
-                algorithm='baseline',
-                status='completed'
-            ).first()
-            
-            baseline_metrics = {}
-            if baseline_simulation:
-                baseline_metrics_data = Metric.objects.filter(simulation=baseline_simulation)
-                for metric in baseline_metrics_data:
-                    baseline_metrics[metric.metric_type] = metric.value
-            
-            # Calculate improvements
-            avg_travel_time = metrics.filter(metric_type='travel_time').aggregate(avg=Avg('value'))['avg'] or 0
-            baseline_avg_travel_time = baseline_metrics.get('travel_time', avg_travel_time * 1.4)
-            improvement_travel_time = ((baseline_avg_travel_time - avg_travel_time) / baseline_avg_travel_time * 100) if baseline_avg_travel_time > 0 else 0
-            
-            total_delay = metrics.filter(metric_type='delay').aggregate(total=Sum('value'))['total'] or 0
-            baseline_total_delay = baseline_metrics.get('delay', total_delay * 1.4)
-            delay_reduction = ((baseline_total_delay - total_delay) / baseline_total_delay * 100) if baseline_total_delay > 0 else 0
-            
-            fuel_consumed = metrics.filter(metric_type='fuel').aggregate(total=Sum('value'))['total'] or 0
-            baseline_fuel_consumed = baseline_metrics.get('fuel', fuel_consumed * 1.4)
-            fuel_saving = ((baseline_fuel_consumed - fuel_consumed) / baseline_fuel_consumed * 100) if baseline_fuel_consumed > 0 else 0
-            
-            co2_emissions = metrics.filter(metric_type='emissions').aggregate(total=Sum('value'))['total'] or 0
-            baseline_co2_emissions = baseline_metrics.get('emissions', co2_emissions * 1.4)
-            emissions_reduction = ((baseline_co2_emissions - co2_emissions) / baseline_co2_emissions * 100) if baseline_co2_emissions > 0 else 0
-            
-            # Create result object
-            result = Result.objects.create(
-                simulation=simulation,
-                avg_travel_time=avg_travel_time,
-                baseline_avg_travel_time=baseline_avg_travel_time,
-                improvement_travel_time=improvement_travel_time,
-                total_delay=total_delay,
-                baseline_total_delay=baseline_total_delay,
-                delay_reduction=delay_reduction,
-                fuel_consumed=fuel_consumed,
-                baseline_fuel_consumed=baseline_fuel_consumed,
-                fuel_saving=fuel_saving,
-                co2_emissions=co2_emissions,
-                baseline_co2_emissions=baseline_co2_emissions,
-                emissions_reduction=emissions_reduction,
-            )
         
         context = {
             'title': f'Results: {simulation.name}',
@@ -298,13 +138,9 @@ def results_view(request, simulation_id=None):
         }
         return render(request, 'core/results.html', context)
     else:
-        # List all results with real data
-        all_results = Result.objects.select_related('simulation__scenario').order_by('-created_at')
-        
-        # Pagination
-        paginator = Paginator(all_results, 10)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        # List all results with real data, newest first, by keyset
+        all_results = Result.objects.select_related('simulation__scenario')
+        page_obj = paginate(request, all_results, 10, count_key='keyset_count:results')
         
         context = {
             'title': 'All Simulation Results',
@@ -318,30 +154,17 @@ def ai_experiment_view(request, experiment_id=None):
     if experiment_id:
         experiment = get_object_or_404(Simulation, id=experiment_id)
         
-        # Get real metrics for the experiment
-        experiment_metrics = Metric.objects.filter(simulation=experiment)
-        
-        # Get baseline metrics for the same scenario
-        baseline_simulation = Simulation.objects.filter(
-            scenario=experiment.scenario,
-            algorithm='baseline',
-            status='completed'
-        ).first()
+        # Get baseline metrics for the same scenario (cached per scenario)
+        baseline = get_baseline(experiment.scenario_id)
+        baseline_simulation = baseline.simulation if baseline else None
         
         if baseline_simulation:
-            baseline_metrics_data = Metric.objects.filter(simulation=baseline_simulation)
-            
             # Prepare data for comparison
             metric_types = ['travel_time', 'delay', 'fuel', 'emissions']
-            baseline_metrics = []
-            ai_metrics = []
+            summary = summarize([experiment.id], metric_types)[experiment.id]
             
-            for metric_type in metric_types:
-                baseline_value = baseline_metrics_data.filter(metric_type=metric_type).aggregate(avg=Avg('value'))['avg'] or 0
-                ai_value = experiment_metrics.filter(metric_type=metric_type).aggregate(avg=Avg('value'))['avg'] or 0
-                
-                baseline_metrics.append(float(baseline_value))
-                ai_metrics.append(float(ai_value))
+            baseline_metrics = [float(stat(baseline.summary, t, 'avg', 0)) for t in metric_types]
+            ai_metrics = [float(stat(summary, t, 'avg', 0)) for t in metric_types]
         else:
             # Use realistic estimates if no baseline
             baseline_metrics = [
@@ -368,23 +191,24 @@ def ai_experiment_view(request, experiment_id=None):
         return render(request, 'core/ai_experiment.html', context)
     else:
         # List all AI experiments with real data
-        ai_experiments = Simulation.objects.select_related('scenario').exclude(
-            algorithm='baseline'
-        ).order_by('-created_at')
+        ai_experiments = Simulation.objects.select_related('scenario').exclude(algorithm='baseline')
+        page_obj = paginate(request, ai_experiments, 20, count_key='keyset_count:experiments')
         
         context = {
             'title': 'AI Experiments',
             'project_name': 'MATAFITI Traffic AI',
-            'experiments': ai_experiments,
+            'experiments': page_obj,
+            'page_obj': page_obj,
         }
         return render(request, 'core/experiment_list.html', context)
 
 def simulation_detail_view(request, simulation_id):
     """Detailed view of a simulation"""
     simulation = get_object_or_404(Simulation.objects.select_related('scenario', 'created_by'), id=simulation_id)
+    progress_buffer.apply_pending(simulation)
     
     # Get related data
-    vehicles = Vehicle.objects.filter(simulation=simulation).order_by('-timestamp')[:100]
+    vehicles = recent_vehicle_samples(simulation, 100)
     metrics = Metric.objects.filter(simulation=simulation)
     logs = SimulationLog.objects.filter(simulation=simulation).order_by('-timestamp')[:50]
     
@@ -409,6 +233,8 @@ def simulation_detail_view(request, simulation_id):
         'logs': logs,
         'result': result,
         'progress_percentage': progress_percentage,
+        # Live feed resumes after the newest log already on the page
+        'live_cursor': str(Cursor(log_id=max((log.id for log in logs), default=0))),
     }
     return render(request, 'core/simulation_detail.html', context)
 
@@ -437,24 +263,17 @@ def scenario_list_view(request):
     """List all scenarios"""
     scenarios = Scenario.objects.select_related('created_by').filter(is_active=True).order_by('-created_at')
     
-    # Get statistics for each scenario
-    scenario_stats = []
-    for scenario in scenarios:
-        simulation_count = Simulation.objects.filter(scenario=scenario).count()
-        completed_count = Simulation.objects.filter(scenario=scenario, status='completed').count()
-        
-        scenario_stats.append({
-            'scenario': scenario,
-            'total_simulations': simulation_count,
-            'completed_simulations': completed_count,
-        })
+    # Statistics for all scenarios: cached, misses filled by one grouped query
+    scenarios = list(scenarios)
+    stats = get_scenario_stats(scenario.id for scenario in scenarios)
+    scenario_stats = [{'scenario': scenario, **stats[scenario.id]} for scenario in scenarios]
     
-    # Calculate totals
-    total_scenarios = scenarios.count()
-    active_scenarios = scenarios.filter(is_active=True).count()
+    # Calculate totals (only active scenarios are listed)
+    total_scenarios = len(scenarios)
+    active_scenarios = total_scenarios
     
     # Count unique city locations from scenario types
-    city_locations = scenarios.values_list('scenario_type', flat=True).distinct().count()
+    city_locations = len({scenario.scenario_type for scenario in scenarios})
     
     context = {
         'title': 'Available Scenarios',
@@ -508,14 +327,19 @@ def comparison_view(request):
             ai_simulation=ai_simulation
         )
         
-        # Update comparison data with real metrics
-        baseline_metrics = Metric.objects.filter(simulation=baseline)
-        ai_metrics = Metric.objects.filter(simulation=ai_simulation)
+        # Update comparison data with real metrics (one grouped query)
+        metric_types = ['travel_time', 'delay', 'fuel', 'emissions', 'speed', 'congestion']
+        summaries = summarize([baseline.id, ai_simulation.id])
+        
+        # Optional: confidence intervals and p-values from the raw samples
+        significance = None
+        if request.POST.get('statistical_analysis'):
+            significance = compare_simulations(baseline, ai_simulation, metric_types)
         
         comparison_data = {}
-        for metric_type in ['travel_time', 'delay', 'fuel', 'emissions', 'speed', 'congestion']:
-            baseline_value = baseline_metrics.filter(metric_type=metric_type).aggregate(avg=Avg('value'))['avg']
-            ai_value = ai_metrics.filter(metric_type=metric_type).aggregate(avg=Avg('value'))['avg']
+        for metric_type in metric_types:
+            baseline_value = stat(summaries[baseline.id], metric_type, 'avg')
+            ai_value = stat(summaries[ai_simulation.id], metric_type, 'avg')
             
             if baseline_value and ai_value:
                 improvement = ((baseline_value - ai_value) / baseline_value * 100)
@@ -525,6 +349,8 @@ def comparison_view(request):
                     'improvement': float(improvement),
                     'unit': 'min' if metric_type == 'travel_time' else 'hours' if metric_type == 'delay' else 'liters' if metric_type == 'fuel' else 'kg' if metric_type == 'emissions' else 'km/h' if metric_type == 'speed' else '%'
                 }
+                if significance is not None:
+                    comparison_data[metric_type]['significance'] = significance[metric_type]
         
         comparison.comparison_data = comparison_data
         comparison.save()
@@ -564,6 +390,17 @@ def comparison_detail_view(request, comparison_id):
     }
     return render(request, 'core/comparison_detail.html', context)
 
+def _export_csv_etag(request, simulation_id):
+    # Trajectory exports have no cheap version to compare against
+    if request.GET.get('vehicles') == '1':
+        return None
+    result = Result.objects.select_related('simulation').filter(simulation_id=simulation_id).first()
+    if result is None:
+        return None
+    _, csv_hash = csv_export.summary(result.simulation, result)
+    return make_etag(csv_hash, csv_export.metrics_version(simulation_id), request.GET.get('gzip') == '1')
+
+@condition(etag_func=_export_csv_etag)
 def export_csv_view(request, simulation_id):
     """Export simulation results as CSV"""
     simulation = get_object_or_404(Simulation, id=simulation_id)
@@ -575,70 +412,51 @@ def export_csv_view(request, simulation_id):
         messages.error(request, "No results available for export!")
         return redirect('results', simulation_id=simulation_id)
     
-    # Get all metrics
-    metrics = Metric.objects.filter(simulation=simulation)
-    
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="simulation_{simulation.id}_results.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Write header
-    writer.writerow(['Metric', 'Value', 'Unit', 'Baseline Value', 'Improvement %', 'Timestamp'])
-    
-    # Write result data
-    writer.writerow([
-        'Average Travel Time',
-        f"{result.avg_travel_time:.1f}",
-        'min',
-        f"{result.baseline_avg_travel_time:.1f}",
-        f"{result.improvement_travel_time:.1f}%",
-        simulation.completed_at.strftime('%Y-%m-%d %H:%M:%S') if simulation.completed_at else 'N/A'
-    ])
-    
-    writer.writerow([
-        'Total Delay',
-        f"{result.total_delay:.1f}",
-        'hours',
-        f"{result.baseline_total_delay:.1f}",
-        f"{result.delay_reduction:.1f}%",
-        simulation.completed_at.strftime('%Y-%m-%d %H:%M:%S') if simulation.completed_at else 'N/A'
-    ])
-    
-    writer.writerow([
-        'Fuel Consumption',
-        f"{result.fuel_consumed:.1f}",
-        'liters',
-        f"{result.baseline_fuel_consumed:.1f}",
-        f"{result.fuel_saving:.1f}%",
-        simulation.completed_at.strftime('%Y-%m-%d %H:%M:%S') if simulation.completed_at else 'N/A'
-    ])
-    
-    writer.writerow([
-        'CO2 Emissions',
-        f"{result.co2_emissions:.1f}",
-        'kg',
-        f"{result.baseline_co2_emissions:.1f}",
-        f"{result.emissions_reduction:.1f}%",
-        simulation.completed_at.strftime('%Y-%m-%d %H:%M:%S') if simulation.completed_at else 'N/A'
-    ])
-    
-    # Write detailed metrics
-    writer.writerow([])  # Empty row
-    writer.writerow(['Detailed Metrics'])
-    writer.writerow(['Metric Type', 'Value', 'Unit', 'Timestamp'])
-    
-    for metric in metrics:
-        writer.writerow([
-            metric.get_metric_type_display(),
-            f"{metric.value:.2f}",
-            metric.unit,
-            metric.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
+    # Streamed: ?vehicles=1 adds the full trajectory history, ?gzip=1 compresses it
+    vehicles = request.GET.get('vehicles') == '1'
+    compress = request.GET.get('gzip') == '1'
+    
+    filename = f"simulation_{simulation.id}_{'export' if vehicles else 'results'}.csv"
+    response = streaming_response(
+        request,
+        simulation_csv(simulation, result, vehicles=vehicles, compress=compress),
+        content_type='application/gzip' if compress else 'text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}{".gz" if compress else ""}"'
     return response
 
+def export_bulk_view(request):
+    """Export many simulations as one streamed ZIP, filtered by scenario, algorithm and date"""
+    # ?scenario=<id>&algorithm=<name>&start=YYYY-MM-DD&end=YYYY-MM-DD, plus ?vehicles=1
+    try:
+        scenario_id = int(request.GET['scenario']) if request.GET.get('scenario') else None
+        start, end = (
+            datetime.strptime(request.GET[name], '%Y-%m-%d').date() if request.GET.get(name) else None
+            for name in ('start', 'end')
+        )
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'scenario must be an id and start/end YYYY-MM-DD dates'}, status=400)
+    
+    simulations = select_simulations(scenario_id, request.GET.get('algorithm'), start, end)
+    response = streaming_response(
+        request,
+        export_archive(simulations, vehicles=request.GET.get('vehicles') == '1'),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="simulations_{timezone.now():%Y%m%d_%H%M%S}.zip"'
+    return response
+
+def export_npz_view(request, simulation_id):
+    """Export simulation data as typed columnar arrays in a compressed .npz"""
+    simulation = get_object_or_404(Simulation, id=simulation_id)
+    
+    # Spooled to a temporary file: zip needs a seekable target
+    export = tempfile.TemporaryFile()
+    write_npz(simulation, export)
+    export.seek(0)
+    return FileResponse(export, as_attachment=True, filename=f'simulation_{simulation.id}.npz',
+                        content_type='application/octet-stream')
+
 def export_pdf_view(request, simulation_id):
     """Export simulation results as PDF"""
     simulation = get_object_or_404(Simulation, id=simulation_id)
@@ -646,11 +464,25 @@ def export_pdf_view(request, simulation_id):
     # Check if result exists
     try:
         result = Result.objects.get(simulation=simulation)
-        messages.info(request, f"PDF export for {simulation.name} will be implemented soon!")
-        return redirect('results', simulation_id=simulation_id)
     except Result.DoesNotExist:
         messages.error(request, "No results available for export!")
         return redirect('results', simulation_id=simulation_id)
+    
+    # Rendered once per Result version; later downloads get the stored file
+    report = pdf_reports.cached_report(result)
+    if report is not None:
+        return FileResponse(open(report, 'rb'), as_attachment=True,
+                            filename=f'simulation_{simulation.id}_report.pdf',
+                            content_type='application/pdf')
+    
+    if not pdf_reports.available():
+        messages.error(request, "PDF reports need matplotlib, which is not installed on this server.")
+        return redirect('results', simulation_id=simulation_id)
+    
+    # Rendering takes seconds, so it runs in the background
+    pdf_reports.schedule(result)
+    messages.info(request, f"The PDF report for {simulation.name} is being generated. Try the download again in a moment.")
+    return redirect('results', simulation_id=simulation_id)
 
 @csrf_exempt
 def api_update_simulation(request, simulation_id):
@@ -660,38 +492,27 @@ def api_update_simulation(request, simulation_id):
         
         data = json.loads(request.body)
         
-        # Update simulation progress
-        if 'progress' in data:
-            simulation.progress = data['progress']
-        
-        if 'current_epoch' in data:
-            simulation.current_epoch = data['current_epoch']
-        
-        if 'current_loss' in data:
-            simulation.current_loss = data['current_loss']
-        
-        if 'current_accuracy' in data:
-            simulation.current_accuracy = data['current_accuracy']
-        
-        if 'status' in data:
-            simulation.status = data['status']
-            
-            # Update timestamps
-            if data['status'] == 'completed' and not simulation.completed_at:
-                simulation.completed_at = timezone.now()
-            elif data['status'] == 'running' and not simulation.started_at:
-                simulation.started_at = timezone.now()
+        # Training curves: {'training_loss': value or [values], ...}, appended per epoch
+        curves = data.get('curves') or {}
+        if not isinstance(curves, dict):
+            return JsonResponse({'status': 'error', 'message': 'curves must be an object'}, status=400)
+        unknown = set(curves) - set(CURVES)
+        if unknown:
+            return JsonResponse({'status': 'error', 'message': f'Unknown training curves: {sorted(unknown)}'}, status=400)
+        # Every curve is checked before any is appended, so a bad one leaves the files alone
+        try:
+            curves = {curve: clean_values(values) for curve, values in curves.items()}
+        except ValueError as exc:
+            return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+        store = CurveStore(simulation.id)
+        for curve, values in curves.items():
+            store.append(curve, values)
         
-        simulation.save()
+        # Progress is coalesced in memory; status changes are written immediately
+        written = progress_buffer.update(simulation, data)
+        progress = data.get('progress', simulation.progress)
         
-        # Log the update
-        SimulationLog.objects.create(
-            simulation=simulation,
-            log_level='info',
-            message=f"Simulation progress updated: {simulation.progress}%"
-        )
-        
-        return JsonResponse({'status': 'success', 'progress': simulation.progress})
+        return JsonResponse({'status': 'success', 'progress': progress, 'buffered': not written})
     
     return JsonResponse({'status': 'error', 'message': 'Invalid request'})
 
@@ -701,31 +522,95 @@ def api_add_vehicle(request, simulation_id):
     if request.method == 'POST':
         simulation = get_object_or_404(Simulation, id=simulation_id)
         
-        data = json.loads(request.body)
-        
-        # Create vehicle record
-        vehicle = Vehicle.objects.create(
-            simulation=simulation,
-            vehicle_id=data.get('id', 'unknown'),
-            vehicle_type=data.get('type', 'car'),
-            lat=data.get('lat', 0),
-            lng=data.get('lng', 0),
-            speed=data.get('speed', 0),
-            heading=data.get('heading', 0)
-        )
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+        
+        # Same validation and single transaction as the batch endpoint
+        sample, errors = validate_vehicle_sample(data)
+        if errors:
+            return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+        vehicles = store_vehicles(simulation, [sample])
+        
+        # With the columnar store there is no row id to return
+        return JsonResponse({'status': 'success', 'vehicle_id': vehicles[0].id if vehicles else None})
+
+    return JsonResponse({'status': 'error', 'message': 'Invalid request'})
+
+@csrf_exempt
+def api_add_vehicles_batch(request, simulation_id):
+    """API endpoint to add many vehicle samples (JSON array or NDJSON) in one request"""
+    if request.method == 'POST':
+        simulation = get_object_or_404(Simulation, id=simulation_id)
+
+        try:
+            samples = parse_vehicle_payload(request.body, request.content_type or '')
+        except PayloadError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+        if len(samples) > MAX_VEHICLES_PER_REQUEST:
+            return JsonResponse({
+                'status': 'error',
+                'message': f'Too many vehicles in one request (max {MAX_VEHICLES_PER_REQUEST})'
+            }, status=413)
+
+        created, errors = ingest_vehicles(simulation, samples)
+
+        return JsonResponse({
+            'status': 'success' if not errors else ('partial' if created else 'error'),
+            'received': len(samples),
+            'created': created,
+            'errors': errors,
+        }, status=200 if created or not errors else 400)
 
-        return JsonResponse({'status': 'success', 'vehicle_id': vehicle.id})
-    
     return JsonResponse({'status': 'error', 'message': 'Invalid request'})
 
+# Vehicles count as live for this long after their last reported state
+LIVE_VEHICLE_WINDOW = timedelta(minutes=5)
+# Rows returned by a full response / by one ?since= delta
+LATEST_VEHICLES_LIMIT = 100
+DELTA_LIMIT = 2000
+
+def _live_vehicle_states():
+    return VehicleState.objects.filter(updated_at__gte=timezone.now() - LIVE_VEHICLE_WINDOW)
+
+def _vehicles_latest_version(request):
+    # Any write moves the newest updated_at; vehicles ageing out of the window change the count
+    if not hasattr(request, '_vehicles_latest_version'):
+        request._vehicles_latest_version = _live_vehicle_states().aggregate(
+            latest=Max('updated_at'), total=Count('id')
+        )
+    return request._vehicles_latest_version
+
+def _vehicles_latest_etag(request):
+    version = _vehicles_latest_version(request)
+    return make_etag(version['latest'], version['total'], request.GET.get('since', ''))
+
+def _vehicles_latest_last_modified(request):
+    return _vehicles_latest_version(request)['latest']
+
+@condition(etag_func=_vehicles_latest_etag, last_modified_func=_vehicles_latest_last_modified)
 def api_vehicles_latest(request):
-    """API endpoint to get latest vehicles"""
-    # Get vehicles from last 5 minutes
-    five_minutes_ago = timezone.now() - timedelta(minutes=5)
+    """API endpoint to get latest vehicles, or only those changed since a cursor"""
+    states = _live_vehicle_states()
     
-    vehicles = Vehicle.objects.filter(
-        timestamp__gte=five_minutes_ago
-    ).select_related('simulation').order_by('-timestamp')[:100]
+    since = request.GET.get('since')
+    if since:
+        try:
+            cursor = ChangeCursor.parse(since)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        # Oldest change first, so the last row is the next cursor
+        vehicles = list(changed_since(states, cursor).select_related('simulation')[:DELTA_LIMIT + 1])
+        has_more = len(vehicles) > DELTA_LIMIT
+        vehicles = vehicles[:DELTA_LIMIT]
+        if vehicles:
+            cursor = ChangeCursor.for_row(vehicles[-1].updated_at, vehicles[-1].id)
+    else:
+        vehicles = list(states.select_related('simulation').order_by('-updated_at', '-id')[:LATEST_VEHICLES_LIMIT])
+        has_more = False
+        cursor = ChangeCursor.for_row(vehicles[0].updated_at, vehicles[0].id) if vehicles else ChangeCursor()
     
     vehicles_data = []
     for vehicle in vehicles:
@@ -737,30 +622,138 @@ def api_vehicles_latest(request):
             'lng': vehicle.lng,
             'speed': vehicle.speed,
             'heading': vehicle.heading,
-            'timestamp': vehicle.timestamp.isoformat(),
+            'timestamp': vehicle.updated_at.isoformat(),
             'simulation_name': vehicle.simulation.name if vehicle.simulation else 'Unknown'
         })
     
     # Calculate summary statistics
-    if vehicles.exists():
-        avg_speed = vehicles.aggregate(avg=Avg('speed'))['avg'] or 0
-        vehicle_count = vehicles.count()
-    else:
-        avg_speed = 0
-        vehicle_count = 0
+    summary = states.aggregate(total=Count('id'), avg=Avg('speed'))
     
     return JsonResponse({
         'vehicles': vehicles_data,
+        'delta': bool(since),
+        'has_more': has_more,
+        'cursor': str(cursor),
         'summary': {
-            'total_vehicles': vehicle_count,
-            'avg_speed': avg_speed,
+            'total_vehicles': summary['total'],
+            'avg_speed': summary['avg'] or 0,
             'timestamp': timezone.now().isoformat()
         }
     })
 
+def api_vehicle_map(request, simulation_id):
+    """API endpoint for vehicles aggregated into map grid cells"""
+    simulation = get_object_or_404(Simulation.objects.select_related('scenario'), id=simulation_id)
+    
+    # bbox uses Leaflet's toBBoxString() order: west,south,east,north
+    try:
+        zoom = int(request.GET.get('zoom', 13))
+        west, south, east, north = (float(v) for v in request.GET['bbox'].split(','))
+    except (KeyError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'zoom and bbox=west,south,east,north are required'}, status=400)
+    
+    try:
+        grid = grid_for_bbox(simulation, zoom, south, west, north, east)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    return JsonResponse({'status': 'success', **grid})
+
+def api_training_curves(request, simulation_id):
+    """API endpoint for training curves, optionally an epoch range (?start=&stop=) and stride (?step=)"""
+    simulation = get_object_or_404(Simulation, id=simulation_id)
+    try:
+        start, stop, step = (
+            int(request.GET[name]) if request.GET.get(name) else None
+            for name in ('start', 'stop', 'step')
+        )
+        if step is not None and step < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'start and stop must be integers and step a positive integer'}, status=400)
+    
+    store = CurveStore(simulation.id)
+    return JsonResponse({
+        'status': 'success',
+        'simulation_id': simulation.id,
+        'epochs': {curve: store.epochs(curve) for curve in CURVES},
+        'curves': {curve: values.tolist() for curve, values in store.read_all(start, stop, step).items()},
+    })
+
+def api_metric_series(request, simulation_id, metric_type):
+    """API endpoint for a metric's time series, downsampled for charts"""
+    simulation = get_object_or_404(Simulation, id=simulation_id)
+    if metric_type not in dict(Metric.METRIC_TYPES):
+        return JsonResponse({'status': 'error', 'message': f'Unknown metric type: {metric_type}'}, status=400)
+    try:
+        points = int(request.GET.get('points', DEFAULT_POINTS))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'points must be an integer'}, status=400)
+    
+    series = get_series(simulation.id, metric_type, points)
+    return JsonResponse({'status': 'success', 'simulation_id': simulation.id, 'metric_type': metric_type, **series})
+
+def api_comparison_matrix(request, scenario_id):
+    """API endpoint for the pairwise comparison of a scenario's completed simulations"""
+    scenario = get_object_or_404(Scenario, id=scenario_id)
+    return JsonResponse({'status': 'success', **get_comparison_matrix(scenario.id)})
+
+async def api_simulation_events(request, simulation_id):
+    """Server-Sent Events stream of vehicle deltas, progress and new logs"""
+    if not await Simulation.objects.filter(id=simulation_id).aexists():
+        raise Http404("Simulation not found")
+    
+    # Browsers resend the last event id on reconnect; pages can pass ?cursor=
+    cursor = Cursor.parse(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    
+    response = StreamingHttpResponse(
+        simulation_event_stream(simulation_id, cursor),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+    return response
+
+def _simulations_version(request):
+    # Every save moves the newest updated_at; deleting a running simulation changes the count
+    if not hasattr(request, '_simulations_version'):
+        # Two index-only queries; a filtered Count next to Max would scan the table
+        request._simulations_version = {
+            'latest': Simulation.objects.aggregate(latest=Max('updated_at'))['latest'],
+            'running': Simulation.objects.filter(status='running').count(),
+        }
+    return request._simulations_version
+
+def _active_simulations_etag(request):
+    version = _simulations_version(request)
+    return make_etag(version['latest'], version['running'], request.GET.get('since', ''))
+
+def _active_simulations_last_modified(request):
+    return _simulations_version(request)['latest']
+
+@condition(etag_func=_active_simulations_etag, last_modified_func=_active_simulations_last_modified)
 def api_active_simulations(request):
-    """API endpoint to get active simulations"""
-    active_simulations = Simulation.objects.filter(status='running').order_by('-created_at')
+    """API endpoint to get active simulations, or only those changed since a cursor"""
+    since = request.GET.get('since')
+    if since:
+        try:
+            cursor = ChangeCursor.parse(since)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        changed = list(changed_since(Simulation.objects.all(), cursor)[:DELTA_LIMIT + 1])
+        has_more = len(changed) > DELTA_LIMIT
+        changed = changed[:DELTA_LIMIT]
+        if changed:
+            cursor = ChangeCursor.for_row(changed[-1].updated_at, changed[-1].id)
+        active_simulations = [sim for sim in changed if sim.status == 'running']
+        # Simulations that stopped running (or changed while not running)
+        removed = [sim.id for sim in changed if sim.status != 'running']
+    else:
+        active_simulations = Simulation.objects.filter(status='running').order_by('-created_at')
+        latest = Simulation.objects.order_by('-updated_at', '-id').only('id', 'updated_at').first()
+        cursor = ChangeCursor.for_row(latest.updated_at, latest.id) if latest else ChangeCursor()
+        has_more = False
+        removed = []
     
     simulations_data = []
     for sim in active_simulations:
@@ -774,7 +767,13 @@ def api_active_simulations(request):
             'algorithm': sim.get_algorithm_display()
         })
     
-    return JsonResponse(simulations_data, safe=False)
+    return JsonResponse({
+        'simulations': simulations_data,
+        'removed': removed,
+        'delta': bool(since),
+        'has_more': has_more,
+        'cursor': str(cursor),
+    })
 
 # TO ADD ADMIN
 from django.contrib.auth.models import User
@@ -134,3 +134,101 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Simulation progress updates (core.progress_buffer)
+# Seconds between database writes of coalesced progress; 0 writes every update
+SIMULATION_PROGRESS_FLUSH_INTERVAL = 5.0
+# Write a "progress updated" log line each time progress crosses this many percent
+SIMULATION_PROGRESS_LOG_STEP = 10
+
+# Vehicle trajectory storage (core.trajectory_store)
+# 'orm' stores each sample as a Vehicle row; 'columnar' appends to
+# memory-mapped per-simulation column files under TRAJECTORY_ROOT
+TRAJECTORY_BACKEND = 'orm'
+TRAJECTORY_ROOT = BASE_DIR / 'trajectories'
+
+# Training curves (core.curve_store)
+# One append-only float32 file per curve under TRAINING_CURVE_ROOT
+TRAINING_CURVE_ROOT = BASE_DIR / 'training_curves'
+
+# Caching
+# Per-process memory cache. Point this at a shared backend (Redis,
+# Memcached, database) to share precomputed data across gunicorn workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Dashboard snapshot (core.dashboard_snapshot)
+# Seconds a cached dashboard section may be served before it is rebuilt,
+# even when no invalidating write has been seen
+DASHBOARD_SNAPSHOT_MAX_AGE = 30
+
+# Live simulation feed (core.live_feed), served over ASGI
+# Seconds between database polls for new vehicle states, progress and logs
+SSE_POLL_INTERVAL = 1.0
+# Seconds of silence before a heartbeat comment keeps the connection open
+SSE_HEARTBEAT_INTERVAL = 15.0
+# Seconds before the cursor reread on every poll, for vehicle states whose
+# transaction committed after a later-stamped one was already sent
+SSE_VEHICLE_OVERLAP = 2.0
+
+# Map grid (core.map_grid)
+# Seconds an aggregated map tile stays cached; ingestion invalidates
+# tiles sooner by bumping the simulation's vehicle-state version
+MAP_GRID_CACHE_TIMEOUT = 300
+# Seconds tiles may lag behind ingestion; bounds how often they are recomputed
+MAP_GRID_REFRESH_SECONDS = 5
+
+# Rolling traffic statistics (core.rolling_stats)
+# Window name -> length in seconds; the dashboard reads '5m' and '1h'
+ROLLING_STATS_WINDOWS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600}
+# Width of one ring-buffer bucket in seconds
+ROLLING_STATS_BUCKET_SECONDS = 5
+# Seconds between rebuilds of a process's windows from stored history, so
+# workers that don't ingest a simulation still pick up its samples
+ROLLING_STATS_REFRESH_SECONDS = 60
+
+# Scenario baselines (core.baselines)
+# Seconds a resolved baseline and its metric summary stay cached; saving a
+# baseline run or its metrics drops the entry sooner
+BASELINE_CACHE_TIMEOUT = 3600
+
+# Comparison matrix (core.comparison_matrix)
+# Seconds a scenario's all-pairs matrix stays cached; completing, deleting
+# or adding metrics to one of its simulations rebuilds it sooner
+COMPARISON_MATRIX_CACHE_TIMEOUT = 3600
+
+# Comparison significance tests (core.significance)
+# Bootstrap resamples and permutations per metric comparison
+SIGNIFICANCE_RESAMPLES = 2000
+# Most values one test may draw; large samples get fewer resamples (at least 100)
+SIGNIFICANCE_MAX_DRAWS = 2_000_000
+# Samples per side from which Welch's test replaces resampling
+SIGNIFICANCE_NORMAL_THRESHOLD = 1000
+# Seconds a comparison's tests stay cached; new metrics replace them sooner
+SIGNIFICANCE_CACHE_TIMEOUT = 3600
+
+# Scenario statistics (core.scenario_stats)
+# Seconds a scenario's simulation counts stay cached; status changes and
+# Result writes drop the entry sooner
+SCENARIO_STATS_CACHE_TIMEOUT = 3600
+
+# Keyset pagination (core.keyset)
+# Seconds the total shown above a paginated list may lag behind
+KEYSET_COUNT_CACHE_TIMEOUT = 60
+
+# Metric time series (core.timeseries)
+# Seconds a downsampled series stays cached; new metrics for the
+# simulation replace it sooner
+METRIC_SERIES_CACHE_TIMEOUT = 3600
+
+# PDF reports (core.pdf_reports)
+# Reports are rendered off the request path by this many worker threads
+# and stored under MEDIA_ROOT/reports until their Result changes
+PDF_REPORT_WORKERS = 2
+
+# Bulk ZIP export (core.bulk_export)
+# Simulations generated in parallel ahead of the one being written
+BULK_EXPORT_WORKERS = 4